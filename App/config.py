@@ -15,5 +15,76 @@ def load_config(app, overrides):
     app.config["JWT_COOKIE_SECURE"] = True
     app.config["JWT_COOKIE_CSRF_PROTECT"] = False
     app.config['FLASK_ADMIN_SWATCH'] = 'darkly'
+    # Tunables below keep any value set in custom_config.py or FLASK_* env vars
+    # Connection pool per process (ignored for SQLite); SQLALCHEMY_ENGINE_OPTIONS entries take precedence
+    app.config.setdefault('SQLALCHEMY_POOL_SIZE', 5)
+    app.config.setdefault('SQLALCHEMY_MAX_OVERFLOW', 10)
+    app.config.setdefault('SQLALCHEMY_POOL_TIMEOUT', 10.0)
+    app.config.setdefault('SQLALCHEMY_POOL_RECYCLE', 1800)
+    app.config.setdefault('SQLALCHEMY_POOL_PRE_PING', True)
+    # None: most recently used connection first under gevent workers, oldest first otherwise
+    app.config.setdefault('SQLALCHEMY_POOL_LIFO', None)
+    # Seconds before PostgreSQL cancels a statement; None leaves the server default
+    app.config.setdefault('SQLALCHEMY_STATEMENT_TIMEOUT', None)
+    app.config.setdefault('STREET_INDEX_REFRESH_SECONDS', 5.0)
+    # How often each worker checks its street index against the whole catalog
+    app.config.setdefault('STREET_INDEX_RECONCILE_SECONDS', 300.0)
+    app.config.setdefault('LOCATION_WRITE_BEHIND', False)
+    app.config.setdefault('LOCATION_FLUSH_INTERVAL', 1.0)
+    app.config.setdefault('LOCATION_MAX_STALENESS', 5.0)
+    app.config.setdefault('LOCATION_HISTORY_FLUSH_RECORDS', 500)
+    app.config.setdefault('LOCATION_HISTORY_RETENTION_DAYS', 30)
+    app.config.setdefault('PAGE_SIZE_DEFAULT', 100)
+    app.config.setdefault('PAGE_SIZE_MAX', 1000)
+    app.config.setdefault('STREAM_CHUNK_SIZE', 500)
+    app.config.setdefault('LOCATION_STREAM_QUEUE_SIZE', 16)
+    app.config.setdefault('LOCATION_STREAM_HEARTBEAT', 15.0)
+    # Any werkzeug method string, cost included; stored hashes are upgraded on the next login
+    app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hashing processes per worker; 0 hashes inline on the request thread
+    app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+    # Per-worker cache of the user behind each JWT; 0 disables it
+    app.config.setdefault('IDENTITY_CACHE_SIZE', 10000)
+    app.config.setdefault('IDENTITY_CACHE_TTL', 60.0)
+    # Side of a nearest-driver grid cell in degrees (0.01 is about 1.1 km)
+    app.config.setdefault('DRIVER_GRID_CELL_DEGREES', 0.01)
+    # Drivers whose last ping is older than this many seconds are not offered; 0 disables
+    app.config.setdefault('NEAREST_DRIVER_MAX_AGE', 900)
+    app.config.setdefault('NEAREST_DRIVERS_MAX', 100)
+    # Seconds a route plan may spend on 2-opt improvement, and plans kept per worker
+    app.config.setdefault('ROUTE_PLAN_TIME_BUDGET', 0.2)
+    app.config.setdefault('ROUTE_CACHE_SIZE', 1000)
+    # Assumed van speed and time spent at each stop when estimating arrivals
+    app.config.setdefault('ETA_SPEED_KMH', 25.0)
+    app.config.setdefault('ETA_DWELL_SECONDS', 60.0)
+    # Longest a worker remembers that a driver has no running schedule before checking again
+    app.config.setdefault('ETA_OFF_DUTY_TTL', 60.0)
+    # Geocoding backends tried in order (registered names or "module:Class"), and the gazetteer CSV
+    app.config.setdefault('GEOCODER_BACKENDS', ['gazetteer'])
+    app.config.setdefault('GEOCODER_GAZETTEER_PATH', None)
+    # Normalized addresses kept per worker in front of the geocoded_address table
+    app.config.setdefault('GEOCODER_CACHE_SIZE', 10000)
+    # Background geocoding runs once this many addresses wait or every this many seconds; 0 geocodes inline
+    app.config.setdefault('GEOCODE_BATCH_SIZE', 100)
+    app.config.setdefault('GEOCODE_BATCH_INTERVAL', 1.0)
+    # flask worker: messages claimed per batch, how long a claim lasts, and retry backoff in seconds
+    app.config.setdefault('OUTBOX_BATCH_SIZE', 100)
+    app.config.setdefault('OUTBOX_LEASE_SECONDS', 60.0)
+    app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 8)
+    app.config.setdefault('OUTBOX_BACKOFF_BASE', 2.0)
+    app.config.setdefault('OUTBOX_BACKOFF_MAX', 600.0)
+    app.config.setdefault('OUTBOX_POLL_INTERVAL', 1.0)
+    # Proposals one /api/schedules/validate request may check, and the longest schedule it accepts in hours
+    app.config.setdefault('SCHEDULE_VALIDATE_MAX_ITEMS', 500)
+    app.config.setdefault('SCHEDULE_MAX_SPAN_HOURS', 24)
+    # Longest a worker serves cached upcoming schedules without re-reading them
+    app.config.setdefault('UPCOMING_SCHEDULES_TTL', 60.0)
+    # Statements at least this slow are logged with their fingerprint
+    app.config.setdefault('SQL_SLOW_QUERY_SECONDS', 0.5)
+    # Directory where each worker writes its metrics so /metrics covers all of them; unset reports one worker
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_WRITE_INTERVAL', 5.0)
+    # Directory of Unix sockets shared by the workers on one host; unset keeps pub/sub in-process
+    app.config.setdefault('WORKER_RELAY_DIR', None)
     for key in overrides:
         app.config[key] = overrides[key]
\ No newline at end of file
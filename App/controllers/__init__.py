@@ -1,16 +1,21 @@
-from .user import UserController, create_user, get_all_users, get_all_users_json
+from .user import UserController, create_user, get_all_users, get_all_users_json, get_user, get_user_by_username, update_user
 from .stop_request import StopRequestController, create_stop_request, get_stop_requests_by_resident
+from .street import StreetController
 from .schedule import ScheduleController
 from .location import LocationController
+from .seed import SeedController
+from .geocoding import GeocodingController
 from .initialize import initialize
-from .auth import login, logout  # if present
+from .auth import login, logout, setup_jwt, add_auth_context
 
 
 # Since there are multiple init files, we define __all__ here to specify what is imported
 __all__ = [
     "UserController", "create_user", "get_all_users", "get_all_users_json",
+    "get_user", "get_user_by_username", "update_user",
     "StopRequestController", "create_stop_request", "get_stop_requests_by_resident",
-    "ScheduleController", "LocationController",
+    "StreetController", "ScheduleController", "LocationController", "SeedController",
+    "GeocodingController",
     "initialize",
-    "login", "logout"
+    "login", "logout", "setup_jwt", "add_auth_context"
 ]
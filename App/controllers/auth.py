@@ -1,17 +1,71 @@
-from flask_jwt_extended import create_access_token, jwt_required, JWTManager, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import create_access_token, jwt_required, JWTManager, verify_jwt_in_request, unset_jwt_cookies
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from flask import current_app, g, request
 
 from App.models import User
 from App.database import db
+from App.controllers.identity_cache import get_identity_cache
 
-def login(username, password):
+def check_credentials(username, password):
+  """Return the user if the password matches, upgrading an outdated stored hash"""
   result = db.session.execute(db.select(User).filter_by(username=username))
   user = result.scalar_one_or_none()
-  if user and user.check_password(password):
+  if not user or not user.check_password(password):
+    return None
+  try:
+    if user.upgrade_password(password):
+      db.session.commit()
+  except Exception:
+    # A failed upgrade must not fail the login; the old hash still works
+    db.session.rollback()
+  return user
+
+
+def login(username, password):
+  user = check_credentials(username, password)
+  if user:
     # Store ONLY the user id as a string in JWT 'sub'
     return create_access_token(identity=str(user.id))
   return None
 
 
+def logout(response):
+  unset_jwt_cookies(response)
+  return response
+
+
+# Per-request auth state on flask.g; flask_jwt_extended's own is only read through its API
+REQUEST_AUTH_KEYS = ("_auth_user", "_auth_lookups")
+
+
+def load_user(user_id):
+  """Look a user up at most once per request (through the identity cache)"""
+  lookups = g.setdefault("_auth_lookups", {})
+  if user_id not in lookups:
+    lookups[user_id] = get_identity_cache(current_app).get(user_id)
+  return lookups[user_id]
+
+
+def request_has_token():
+  """Cheap check for an access token where flask_jwt_extended would look for one"""
+  config = current_app.config
+  return config["JWT_HEADER_NAME"] in request.headers or config["JWT_ACCESS_COOKIE_NAME"] in request.cookies
+
+
+def resolve_current_user():
+  """The user behind this request's JWT, or None; the token is decoded at most once per request"""
+  if "_auth_user" not in g:
+    g._auth_user = None
+    if request_has_token():
+      # Not verified yet by @jwt_required; a valid token sets g._auth_user in user_lookup_callback
+      try:
+        verify_jwt_in_request(optional=True)
+      except (JWTExtendedException, PyJWTError):
+        pass  # expired, malformed or unknown-user token: treat as anonymous
+  return g._auth_user
+
+
 def setup_jwt(app):
   jwt = JWTManager(app)
 
@@ -30,7 +84,9 @@ def setup_jwt(app):
       user_id = int(identity)
     except (TypeError, ValueError):
       return None
-    return db.session.get(User, user_id)
+    # Runs once a token has been verified (by @jwt_required or resolve_current_user)
+    g._auth_user = load_user(user_id)
+    return g._auth_user
 
   return jwt
 
@@ -39,14 +95,11 @@ def setup_jwt(app):
 def add_auth_context(app):
   @app.context_processor
   def inject_user():
-      try:
-          verify_jwt_in_request()
-          identity = get_jwt_identity()
-          user_id = int(identity) if identity is not None else None
-          current_user = db.session.get(User, user_id) if user_id is not None else None
-          is_authenticated = current_user is not None
-      except Exception as e:
-          print(e)
-          is_authenticated = False
-          current_user = None
-      return dict(is_authenticated=is_authenticated, current_user=current_user)
\ No newline at end of file
+      current_user = resolve_current_user()
+      return dict(is_authenticated=current_user is not None, current_user=current_user)
+
+  @app.teardown_request
+  def forget_request_auth(exc):
+      # g outlives the request when an app context was pushed beforehand (CLI, tests)
+      for key in REQUEST_AUTH_KEYS:
+          g.pop(key, None)
@@ -0,0 +1,170 @@
+from App.models import Driver, DriverStatus
+from App.database import db
+from App.controllers.relay import get_relay
+from App.controllers.geo import haversine_km
+from datetime import timezone
+from threading import Lock
+import math, time
+import numpy as np
+
+RELAY_CHANNEL = "driver-grid"
+
+KM_PER_DEGREE = math.pi * 6371.0088 / 180
+
+
+def epoch(moment):
+    """Unix time of a naive UTC datetime"""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+class DriverGrid:
+    """
+    Uniform lat/lon grid of where every available driver last pinged from.
+
+    A nearest query walks square rings of cells out from the query's cell,
+    computing haversine distances for the candidates found so far in one
+    NumPy pass, and stops once the k-th closest is nearer than anything an
+    unvisited ring could hold. Every worker keeps its own grid, updated
+    through the worker relay on each ping and status change. Longitude
+    does not wrap at the antimeridian.
+    """
+
+    def __init__(self, relay, cell_degrees=0.01):
+        self.relay = relay
+        self.cell_degrees = cell_degrees
+        self.cells = {}          # (row, col) -> {driver id: (lat, lon, pinged at)}
+        self.positions = {}      # driver id -> cell
+        self.lock = Lock()
+        self.loaded = False
+        self.seen = set()        # drivers updated by messages before load(), which are newer than the table
+        relay.subscribe(RELAY_CHANNEL, self._apply)
+
+    def publish(self, driver_id, lat, lon, status, pinged_at):
+        """Tell every worker's grid where a driver is and whether they're available"""
+        self.relay.publish(RELAY_CHANNEL, {
+            "driver_id": driver_id, "lat": lat, "lon": lon,
+            "status": status.value if status else None, "at": epoch(pinged_at) if pinged_at else None
+        })
+
+    def load(self):
+        """Fill the grid from the driver table the first time it is queried in this worker"""
+        if self.loaded:
+            return
+        rows = db.session.execute(db.select(
+            Driver.id, Driver.current_lat, Driver.current_lon, Driver.location_updated_at
+        ).where(Driver.current_status == DriverStatus.AVAILABLE, Driver.current_lat.isnot(None))).all()
+        with self.lock:
+            if self.loaded:
+                return
+            for driver_id, lat, lon, updated_at in rows:
+                if driver_id not in self.seen:
+                    self._place(driver_id, lat, lon, epoch(updated_at) if updated_at else 0.0)
+            self.loaded = True
+            self.seen.clear()
+
+    def nearest(self, lat, lon, k=5, max_km=None, max_age=None):
+        """Up to k (driver id, distance km, lat, lon, pinged at) tuples, closest first"""
+        self.load()
+        row, col = self._cell(lat, lon)
+        cutoff = time.time() - max_age if max_age else None
+        ids, lats, lons, pinged = [], [], [], []
+        visited = 0
+        ring = 0
+        with self.lock:
+            total = len(self.positions)
+            while visited < total:
+                if ring and 8 * ring >= len(self.cells):
+                    # Sparse grid: scanning every occupied cell beats walking more empty rings
+                    ids, lats, lons, pinged = [], [], [], []
+                    self._collect(self.cells.values(), cutoff, ids, lats, lons, pinged)
+                    break
+                buckets = [self.cells[cell] for cell in self._ring(row, col, ring) if cell in self.cells]
+                visited += sum(len(bucket) for bucket in buckets)
+                self._collect(buckets, cutoff, ids, lats, lons, pinged)
+                # Anything in a ring not yet visited is at least this far away
+                bound = self._ring_distance_km(lat, ring)
+                if max_km is not None and bound > max_km:
+                    break
+                if len(ids) >= k:
+                    distances = haversine_km(lat, lon, np.array(lats), np.array(lons))
+                    if np.partition(distances, k - 1)[k - 1] <= bound:
+                        break
+                ring += 1
+        if not ids:
+            return []
+        distances = haversine_km(lat, lon, np.array(lats), np.array(lons))
+        order = np.argsort(distances, kind="stable")[:k]
+        return [
+            (ids[i], float(distances[i]), lats[i], lons[i], pinged[i])
+            for i in order.tolist()
+            if max_km is None or distances[i] <= max_km
+        ]
+
+    @staticmethod
+    def _collect(buckets, cutoff, ids, lats, lons, pinged):
+        for bucket in buckets:
+            for driver_id, (lat, lon, at) in bucket.items():
+                if cutoff is None or at >= cutoff:
+                    ids.append(driver_id)
+                    lats.append(lat)
+                    lons.append(lon)
+                    pinged.append(at)
+
+    def _apply(self, message):
+        driver_id, lat, lon = message["driver_id"], message["lat"], message["lon"]
+        with self.lock:
+            if not self.loaded:
+                self.seen.add(driver_id)
+            if lat is None or message["status"] != DriverStatus.AVAILABLE.value:
+                self._remove(driver_id)
+            else:
+                self._place(driver_id, lat, lon, message["at"] or 0.0)
+
+    def _place(self, driver_id, lat, lon, pinged_at):
+        cell = self._cell(lat, lon)
+        if self.positions.get(driver_id) != cell:
+            self._remove(driver_id)
+            self.positions[driver_id] = cell
+        self.cells.setdefault(cell, {})[driver_id] = (lat, lon, pinged_at)
+
+    def _remove(self, driver_id):
+        cell = self.positions.pop(driver_id, None)
+        if cell is not None:
+            bucket = self.cells[cell]
+            del bucket[driver_id]
+            if not bucket:
+                del self.cells[cell]
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    @staticmethod
+    def _ring(row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for dr in range(-ring, ring + 1):
+            if abs(dr) == ring:
+                for dc in range(-ring, ring + 1):
+                    yield row + dr, col + dc
+            else:
+                yield row + dr, col - ring
+                yield row + dr, col + ring
+
+    def _ring_distance_km(self, lat, ring):
+        # Cells beyond this ring are at least `ring` whole cells away along one axis; a
+        # longitude cell is narrowest at the highest latitude those cells reach
+        edge = min(abs(lat) + (ring + 1) * self.cell_degrees, 89.9)
+        return 0.995 * ring * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(edge))
+
+    def stats(self):
+        with self.lock:
+            return {"drivers": len(self.positions), "cells": len(self.cells), "loaded": self.loaded}
+
+
+def get_driver_grid(app):
+    grid = app.extensions.get("driver_grid")
+    if grid is None:
+        grid = DriverGrid(get_relay(app), app.config["DRIVER_GRID_CELL_DEGREES"])
+        app.extensions["driver_grid"] = grid
+    return grid
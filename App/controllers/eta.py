@@ -0,0 +1,231 @@
+from App.models import DriverSchedule
+from App.database import db
+from App.controllers.relay import get_relay
+from App.controllers.geo import haversine_km
+from App.controllers.route_planner import walk_from
+from App.controllers.driver_index import epoch
+from datetime import timedelta
+from threading import Lock
+import time
+import numpy as np
+
+RELAY_CHANNEL = "schedule-eta"
+
+
+def active_schedule(driver_id, now):
+    """(schedule id, ends at) of the driver's schedule running at now, or None"""
+    # Schedules never overlap, so only the latest one started can be running
+    row = db.session.execute(
+        db.select(DriverSchedule.id, DriverSchedule.scheduled_end_time)
+        .where(DriverSchedule.driver_id == driver_id, DriverSchedule.scheduled_start_time <= now)
+        .order_by(DriverSchedule.scheduled_start_time.desc())
+        .limit(1)
+    ).first()
+    if row is None or row[1] <= now:
+        return None
+    return row[0], row[1]
+
+
+def next_schedule_start(driver_id, now):
+    """When the driver's next schedule after now starts, or None"""
+    return db.session.execute(
+        db.select(db.func.min(DriverSchedule.scheduled_start_time))
+        .where(DriverSchedule.driver_id == driver_id, DriverSchedule.scheduled_start_time > now)
+    ).scalar()
+
+
+class StopRoute:
+    """
+    A schedule's confirmed, located stops in visiting order, as arrays.
+    The plan has no fixed start: it is walked from whichever end is nearer
+    (lat, lon), the driver's position when the route is built.
+    """
+
+    def __init__(self, plan, lat, lon):
+        stops = plan["stops"]
+        flip, legs = walk_from((lat, lon), [stop["lat"] for stop in stops], [stop["lon"] for stop in stops])
+        stops = stops[::-1] if flip else stops
+        self.stop_ids = [stop["stop_request_id"] for stop in stops]
+        self.resident_ids = [stop["resident_id"] for stop in stops]
+        self.lats = np.array([stop["lat"] for stop in stops], dtype=float)
+        self.lons = np.array([stop["lon"] for stop in stops], dtype=float)
+        # Leg i is stop i to stop i + 1; offsets are route km from the first stop to each stop
+        self.legs = np.array(legs[1:], dtype=float)
+        self.offsets = np.concatenate(([0.0], np.cumsum(self.legs))) if stops else np.zeros(0)
+
+    def next_stop(self, lat, lon):
+        """Index of the first stop not yet passed from (lat, lon)"""
+        distances = haversine_km(lat, lon, self.lats, self.lons)
+        # Stop i is behind the van once it is nearer stop i + 1 than stop i is
+        passed = np.nonzero(distances[1:] < self.legs)[0]
+        return int(passed[-1]) + 1 if len(passed) else 0
+
+    def price(self, lat, lon, at, speed_kmh, dwell_seconds):
+        """[resident id, stop id, position, distance km, arrival epoch] for each stop still ahead"""
+        if not self.stop_ids:
+            return []
+        first = self.next_stop(lat, lon)
+        lead = haversine_km(lat, lon, self.lats[first:first + 1], self.lons[first:first + 1])[0]
+        distances = lead + self.offsets[first:] - self.offsets[first]
+        arrivals = at + distances / speed_kmh * 3600.0 + np.arange(len(distances)) * dwell_seconds
+        return [
+            [resident_id, stop_id, position, round(distance, 3), round(arrival, 1)]
+            for position, (resident_id, stop_id, distance, arrival) in enumerate(
+                zip(self.resident_ids[first:], self.stop_ids[first:], distances.tolist(), arrivals.tolist())
+            )
+        ]
+
+
+class EtaBoard:
+    """
+    Arrival estimates for every stop of every running schedule.
+
+    Each driver ping is published through the worker relay as is, so a
+    ping costs no route work. ETAs are priced when they are read, from the
+    latest ping and the schedule's route plan, which the reading worker
+    builds on first use and keeps until a stop request on the schedule
+    changes. Stops the van has already passed are skipped; the rest are
+    priced from the next one: the straight-line distance to it plus each
+    stop's route km after it, at speed_kmh, plus dwell_seconds for every
+    stop served before. The priced table is kept until the next ping. A
+    driver found off duty is remembered as such until their next schedule
+    starts or off_duty_ttl seconds pass, so their pings don't query;
+    creating a schedule forgets that.
+    """
+
+    def __init__(self, relay, speed_kmh=25.0, dwell_seconds=60.0, off_duty_ttl=60.0):
+        self.relay = relay
+        self.speed_kmh = speed_kmh
+        self.dwell_seconds = dwell_seconds
+        self.off_duty_ttl = off_duty_ttl
+        self.routes = {}   # schedule id -> StopRoute, built in this worker
+        self.forgotten = {}   # schedule id -> times forgotten, so a route built across a forget isn't kept
+        self.active = {}   # driver id -> (schedule id, ends at) running, or (None, until) while off duty
+        self.drivers_forgotten = {}   # driver id -> times forgotten, like forgotten for schedules
+        self.pings = {}   # schedule id -> {"driver_id", "lat", "lon", "pinged_at", "ends_at"}, the latest ping
+        self.tables = {}   # schedule id -> {"driver_id", "computed_at", "ends_at", "stops": {resident id: row}}
+        self.lock = Lock()
+        self.computed = 0
+        relay.subscribe(RELAY_CHANNEL, self._apply)
+
+    def running(self, driver_id, now):
+        """(schedule id, ends at) the driver is running now, or None; remembered until it ends"""
+        with self.lock:
+            cached = self.active.get(driver_id)
+            generation = self.drivers_forgotten.get(driver_id, 0)
+        if cached is not None and cached[1] > now:
+            return cached if cached[0] is not None else None
+        found = active_schedule(driver_id, now)
+        entry = found
+        if found is None:
+            until = now + timedelta(seconds=self.off_duty_ttl)
+            starts = next_schedule_start(driver_id, now)
+            entry = (None, min(until, starts) if starts else until)
+        with self.lock:
+            # A schedule created while this was looked up may make the answer wrong; don't keep it
+            if self.drivers_forgotten.get(driver_id, 0) == generation:
+                self.active[driver_id] = entry
+        return found
+
+    def refresh(self, driver_id, lat, lon, pinged_at):
+        """
+        Publish a ping of the driver's running schedule to every worker, which
+        reprice its ETAs on their next read. Returns the schedule id, or None
+        when the driver isn't on a schedule.
+        """
+        running = self.running(driver_id, pinged_at)
+        if running is None:
+            return None
+        schedule_id, ends_at = running
+        self.relay.publish(RELAY_CHANNEL, {
+            "schedule_id": schedule_id, "driver_id": driver_id, "lat": lat, "lon": lon,
+            "pinged_at": epoch(pinged_at), "ends_at": epoch(ends_at)
+        })
+        return schedule_id
+
+    def forget(self, schedule_ids):
+        """Drop routes and ETAs of schedules whose stops changed, on every worker"""
+        for schedule_id in schedule_ids:
+            self.relay.publish(RELAY_CHANNEL, {"schedule_id": schedule_id, "forget": True})
+
+    def forget_drivers(self, driver_ids):
+        """Drop what is known about the drivers' running schedules, on every worker"""
+        driver_ids = sorted(set(driver_ids))
+        if driver_ids:
+            self.relay.publish(RELAY_CHANNEL, {"drivers": driver_ids})
+
+    def table(self, schedule_id, plan_route):
+        """
+        The schedule's ETA table as of its latest ping (its "stops" are keyed
+        by resident id), or None; plan_route(schedule_id) gives the route plan
+        when this worker doesn't have it yet.
+        """
+        with self.lock:
+            ping = self.pings.get(schedule_id)
+            table = self.tables.get(schedule_id)
+            route = self.routes.get(schedule_id)
+            generation = self.forgotten.get(schedule_id, 0)
+        if ping is None or ping["ends_at"] <= time.time():
+            return None
+        if table is not None and table["computed_at"] == ping["pinged_at"]:
+            return table
+        if route is None:
+            route = StopRoute(plan_route(schedule_id), ping["lat"], ping["lon"])
+        table = {
+            "driver_id": ping["driver_id"],
+            "computed_at": ping["pinged_at"],
+            "ends_at": ping["ends_at"],
+            "stops": {
+                resident_id: {"stop_request_id": stop_id, "position": position,
+                              "distance_km": distance, "eta": arrival}
+                for resident_id, stop_id, position, distance, arrival in route.price(
+                    ping["lat"], ping["lon"], ping["pinged_at"], self.speed_kmh, self.dwell_seconds
+                )
+            }
+        }
+        with self.lock:
+            # A stop request changed while this was priced: answer with it, but keep neither
+            if self.forgotten.get(schedule_id, 0) == generation:
+                self.routes[schedule_id] = route
+                if self.pings.get(schedule_id) is ping:
+                    self.tables[schedule_id] = table
+            self.computed += 1
+        return table
+
+    def _apply(self, message):
+        if "drivers" in message:
+            with self.lock:
+                for driver_id in message["drivers"]:
+                    self.drivers_forgotten[driver_id] = self.drivers_forgotten.get(driver_id, 0) + 1
+                    self.active.pop(driver_id, None)
+            return
+        schedule_id = message["schedule_id"]
+        with self.lock:
+            if message.get("forget"):
+                self.forgotten[schedule_id] = self.forgotten.get(schedule_id, 0) + 1
+                self.routes.pop(schedule_id, None)
+                self.pings.pop(schedule_id, None)
+                self.tables.pop(schedule_id, None)
+                return
+            now = time.time()
+            for expired in [s for s, ping in self.pings.items() if ping["ends_at"] <= now]:
+                del self.pings[expired]
+                self.tables.pop(expired, None)
+                self.routes.pop(expired, None)
+                self.forgotten.pop(expired, None)
+            self.pings[schedule_id] = message
+
+    def stats(self):
+        with self.lock:
+            return {"schedules": len(self.pings), "routes": len(self.routes), "computed": self.computed}
+
+
+def get_eta_board(app):
+    board = app.extensions.get("eta_board")
+    if board is None:
+        board = EtaBoard(
+            get_relay(app), app.config["ETA_SPEED_KMH"], app.config["ETA_DWELL_SECONDS"],
+            app.config["ETA_OFF_DUTY_TTL"]
+        )
+        app.extensions["eta_board"] = board
+    return board
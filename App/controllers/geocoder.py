@@ -0,0 +1,312 @@
+from App.models import GeocodedAddress
+from App.database import db
+from App.controllers.geo import parse_coordinates
+from App.controllers.location_buffer import register_flushable
+from collections import OrderedDict
+from datetime import datetime
+from importlib import import_module
+from sqlalchemy.dialects import postgresql, sqlite
+from threading import Event, Lock, Thread
+import csv, logging
+
+logger = logging.getLogger(__name__)
+
+geocoded_table = GeocodedAddress.__table__
+
+
+class GazetteerBackend:
+    """
+    Offline backend: a CSV file with address, lat and lon columns.
+
+    Addresses are matched on their normalized form; one that isn't listed
+    falls back to its street (the address without a leading house number)
+    if the gazetteer has that.
+    """
+
+    name = "gazetteer"
+
+    def __init__(self, path):
+        self.path = path
+        self.places = {}
+        if path:
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    self.places[GeocodedAddress.normalize(row["address"])] = (float(row["lat"]), float(row["lon"]))
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["GEOCODER_GAZETTEER_PATH"])
+
+    def geocode(self, addresses):
+        """{normalized address: (lat, lon)} for the normalized addresses this backend can place"""
+        found = {}
+        for address in addresses:
+            place = self.places.get(address)
+            if place is None:
+                words = address.split()
+                if len(words) > 1 and words[0].isdigit():
+                    place = self.places.get(" ".join(words[1:]))
+            if place is not None:
+                found[address] = place
+        return found
+
+
+BACKENDS = {"gazetteer": GazetteerBackend}
+
+
+def load_backend(spec, config):
+    """A registered backend name, or "package.module:Class" for anything with from_config and geocode"""
+    if spec in BACKENDS:
+        backend = BACKENDS[spec]
+    else:
+        module, _, attribute = spec.partition(":")
+        backend = getattr(import_module(module), attribute)
+    return backend.from_config(config)
+
+
+class Geocoder:
+    """
+    Address to (lat, lon) through a two-tier cache in front of the backends.
+
+    "lat,lon" literals are answered directly. Other addresses are looked up
+    by normalized form in an in-process LRU, then the geocoded_address
+    table, and only then offered to each backend in turn, in one batch.
+    Results, including addresses nobody could place, go into both tiers.
+    """
+
+    def __init__(self, backends, cache_size=10000):
+        self.backends = backends
+        self.cache_size = cache_size
+        self.cache = OrderedDict()   # normalized address -> (lat, lon) or None
+        self.lock = Lock()
+        self.hits = 0
+        self.stored = 0
+        self.geocoded = 0
+
+    def lookup_many(self, addresses, store=True):
+        """
+        {address: (lat, lon) or None} for every address given. With store,
+        newly geocoded addresses are written to the table and the session
+        committed; without it they are only cached in this worker.
+        """
+        results, keys = {}, {}
+        for address in addresses:
+            coordinates = parse_coordinates(address)
+            if coordinates or not address:
+                results[address] = coordinates
+            else:
+                keys.setdefault(GeocodedAddress.normalize(address), []).append(address)
+
+        found, missing = self._cached(keys)
+        if missing:
+            stored = self._stored(missing)
+            found.update(stored)
+            missing = [key for key in missing if key not in stored]
+        if missing:
+            geocoded, sources = self._geocode(missing)
+            found.update(geocoded)
+            if store and geocoded:
+                self._store(geocoded, sources)
+        for key, originals in keys.items():
+            for address in originals:
+                results[address] = found.get(key)
+        return results
+
+    def lookup(self, address, store=True):
+        return self.lookup_many([address], store)[address]
+
+    def forget_missing(self):
+        """Let addresses nobody could place be tried again (after the backends gained data)"""
+        with self.lock:
+            for key in [key for key, place in self.cache.items() if place is None]:
+                del self.cache[key]
+        deleted = db.session.execute(geocoded_table.delete().where(geocoded_table.c.lat.is_(None))).rowcount
+        db.session.commit()
+        return deleted
+
+    def _cached(self, keys):
+        found, missing = {}, []
+        with self.lock:
+            for key in keys:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    found[key] = self.cache[key]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+        return found, missing
+
+    def _stored(self, keys):
+        stored = {}
+        for i in range(0, len(keys), 500):
+            rows = db.session.execute(
+                db.select(GeocodedAddress.normalized_address, GeocodedAddress.lat, GeocodedAddress.lon)
+                .where(GeocodedAddress.normalized_address.in_(keys[i:i + 500]))
+            ).all()
+            for key, lat, lon in rows:
+                stored[key] = (lat, lon) if lat is not None else None
+        self.stored += len(stored)
+        self._cache(stored)
+        return stored
+
+    def _geocode(self, keys):
+        """
+        ({key: (lat, lon) or None}, {key: backend name}) for the keys the backends
+        answered. A key is only a miss if no backend failed while it was still
+        unplaced; keys caught in a failure are left out so they aren't cached.
+        """
+        results, sources = {}, {}
+        remaining = list(keys)
+        unanswered = set()
+        for backend in self.backends:
+            if not remaining:
+                break
+            try:
+                placed = backend.geocode(remaining)
+            except Exception:
+                logger.exception("Geocoding backend %s failed", backend.name)
+                unanswered.update(remaining)
+                continue
+            for key, place in placed.items():
+                results[key] = place
+                sources[key] = backend.name
+            remaining = [key for key in remaining if key not in placed]
+        self.geocoded += len(results)
+        results.update((key, None) for key in remaining if key not in unanswered)
+        self._cache(results)
+        return results, sources
+
+    def _store(self, results, sources):
+        now = datetime.utcnow()
+        rows = [
+            {"normalized_address": key, "lat": place[0] if place else None, "lon": place[1] if place else None,
+             "source": sources.get(key), "geocoded_at": now}
+            for key, place in results.items()
+        ]
+        # Another worker may have stored some of these first; theirs stand
+        if db.engine.dialect.name == "postgresql":
+            stmt = postgresql.insert(geocoded_table).on_conflict_do_nothing()
+        else:
+            stmt = sqlite.insert(geocoded_table).on_conflict_do_nothing()
+        try:
+            db.session.execute(stmt, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Failed to store %d geocoded addresses", len(rows))
+
+    def _cache(self, places):
+        with self.lock:
+            for key, place in places.items():
+                self.cache[key] = place
+                self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def stats(self):
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "stored": self.stored,
+            "geocoded": self.geocoded,
+            "backends": [backend.name for backend in self.backends]
+        }
+
+
+class GeocodeQueue:
+    """
+    Geocodes addresses in the background, in batches, so creating or
+    editing a resident never waits on a backend. A batch runs when
+    batch_size addresses are waiting or batch_interval seconds pass; a
+    batch_interval of 0 geocodes inline on submit instead.
+    """
+
+    def __init__(self, app, geocoder, batch_size=100, batch_interval=1.0):
+        self.app = app
+        self.geocoder = geocoder
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.pending = set()
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.stopped = Event()
+        self.thread = None
+        self.processed = 0
+        register_flushable(self)
+
+    def submit(self, addresses):
+        with self.lock:
+            self.pending.update(a for a in addresses if a)
+            full = len(self.pending) >= self.batch_size
+        if not self.batch_interval:
+            self.drain()
+            return
+        self.start()
+        if full:
+            self.wakeup.set()
+
+    def drain(self):
+        """Geocode everything waiting now; returns how many addresses were processed"""
+        processed = 0
+        while True:
+            with self.lock:
+                batch = [self.pending.pop() for _ in range(min(self.batch_size, len(self.pending)))]
+            if not batch:
+                return processed
+            try:
+                with self.app.app_context():
+                    self.geocoder.lookup_many(batch)
+            except Exception:
+                logger.exception("Failed to geocode %d addresses", len(batch))
+                return processed
+            processed += len(batch)
+            self.processed += len(batch)
+
+    def start(self):
+        """Start the batching thread if it isn't running (lazily, so it starts after a fork)"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopped.clear()
+            self.thread = Thread(target=self._run, name="geocoder", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.batch_interval)
+            self.wakeup.clear()
+            self.drain()
+
+    def close(self):
+        """Stop the thread and geocode whatever is still waiting"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=self.batch_interval + 5)
+        self.drain()
+
+
+def get_geocoder(app):
+    geocoder = app.extensions.get("geocoder")
+    if geocoder is None:
+        specs = app.config["GEOCODER_BACKENDS"]
+        if isinstance(specs, str):
+            specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+        backends = [load_backend(spec, app.config) for spec in specs]
+        geocoder = Geocoder(backends, app.config["GEOCODER_CACHE_SIZE"])
+        app.extensions["geocoder"] = geocoder
+    return geocoder
+
+
+def get_geocode_queue(app):
+    queue = app.extensions.get("geocode_queue")
+    if queue is None:
+        # The queue outlives the request (its thread, the exit drain), so it keeps the app itself, not a proxy
+        app = getattr(app, "_get_current_object", lambda: app)()
+        queue = GeocodeQueue(
+            app, get_geocoder(app), app.config["GEOCODE_BATCH_SIZE"], app.config["GEOCODE_BATCH_INTERVAL"]
+        )
+        app.extensions["geocode_queue"] = queue
+    return queue
@@ -0,0 +1,55 @@
+from App.models import Resident
+from App.database import db
+from App.controllers.geocoder import get_geocoder, get_geocode_queue
+from flask import current_app
+
+
+class GeocodingController:
+    @staticmethod
+    def locate(address, store=True):
+        """(lat, lon) of an address, or None when no backend can place it"""
+        return get_geocoder(current_app).lookup(address, store)
+
+    @staticmethod
+    def locate_many(addresses, store=True):
+        """{address: (lat, lon) or None} in one pass over the caches and backends"""
+        return get_geocoder(current_app).lookup_many(addresses, store)
+
+    @staticmethod
+    def enqueue(addresses):
+        """Geocode addresses in the background so they are cached before anyone asks"""
+        get_geocode_queue(current_app).submit(addresses)
+
+    @staticmethod
+    def backfill(chunk_size=500, retry_missing=False):
+        """Geocode every resident's home address, chunk_size residents at a time"""
+        geocoder = get_geocoder(current_app)
+        report = {"residents": 0, "addresses": 0, "located": 0, "unlocated": 0}
+        try:
+            if retry_missing:
+                report["forgotten"] = geocoder.forget_missing()
+            after_id = 0
+            while True:
+                rows = db.session.execute(
+                    db.select(Resident.id, Resident.home_address)
+                    .where(Resident.id > after_id).order_by(Resident.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                places = geocoder.lookup_many({address for _, address in rows if address})
+                report["residents"] += len(rows)
+                report["addresses"] += len(places)
+                report["located"] += sum(1 for place in places.values() if place)
+                report["unlocated"] += sum(1 for place in places.values() if not place)
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error geocoding addresses: {str(e)}"
+        return report, f"Geocoded {report['addresses']} addresses of {report['residents']} residents"
+
+    @staticmethod
+    def stats():
+        """Cache and backend counters for this worker"""
+        stats = get_geocoder(current_app).stats()
+        stats["queued"] = len(get_geocode_queue(current_app).pending)
+        return stats
@@ -0,0 +1,156 @@
+from App.models import Driver
+from App.database import db
+from App.controllers.relay import get_relay
+from App.controllers.serialization import users as user_table
+from collections import OrderedDict
+from threading import Lock
+import time
+
+RELAY_CHANNEL = "identity-invalidate"
+
+
+class UserSnapshot:
+    """Detached, read-only copy of the identity columns of a user"""
+
+    __slots__ = ("id", "username", "email", "name", "user_type")
+
+    def __init__(self, id, username, email, name, user_type):
+        for field, value in zip(self.__slots__, (id, username, email, name, user_type)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserSnapshot is read-only")
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.id} {self.username}>"
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "email": self.email,
+            "name": self.name,
+            "user_type": self.user_type.value
+        }
+
+
+class DriverProfile:
+    """Detached, read-only copy of what a location ping needs to know about its driver"""
+
+    __slots__ = ("id", "name", "vehicle_type", "license_plate", "current_status")
+
+    def __init__(self, id, name, vehicle_type, license_plate, current_status):
+        for field, value in zip(self.__slots__, (id, name, vehicle_type, license_plate, current_status)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DriverProfile is read-only")
+
+    def __repr__(self):
+        return f"<DriverProfile {self.id} {self.name}>"
+
+
+snapshot_statement = db.select(
+    user_table.c.id, user_table.c.username, user_table.c.email, user_table.c.name, user_table.c.user_type
+)
+
+
+def load_snapshot(user_id):
+    """Read a user's identity columns straight from the base table (no subtype join)"""
+    row = db.session.execute(snapshot_statement.where(user_table.c.id == user_id)).first()
+    return UserSnapshot(*row) if row else None
+
+
+def load_driver_profile(driver_id):
+    row = db.session.execute(
+        db.select(Driver.id, Driver.name, Driver.vehicle_type, Driver.license_plate, Driver.current_status)
+        .where(Driver.id == driver_id)
+    ).first()
+    return DriverProfile(*row) if row else None
+
+
+class IdentityCache:
+    """
+    Bounded LRU of UserSnapshots keyed by user id, each kept for at most ttl seconds.
+
+    Invalidations go through the worker relay so a change made in one
+    worker evicts the entry in every worker; the TTL bounds staleness if
+    a relay message is ever lost.
+    """
+
+    def __init__(self, relay, max_size=10000, ttl=60.0):
+        self.relay = relay
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()    # user id -> (snapshot, expires_at)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        relay.subscribe(RELAY_CHANNEL, self._evict)
+
+    def get(self, user_id, load=load_snapshot):
+        """Cached snapshot for user_id, loading (and caching) it on a miss"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            invalidations = self.invalidations
+        snapshot = load(user_id)
+        if snapshot is not None and self.max_size:
+            with self.lock:
+                if self.invalidations != invalidations:
+                    return snapshot  # may have been read before a concurrent change; don't cache it
+                self.entries[user_id] = (snapshot, now + self.ttl)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return snapshot
+
+    def invalidate(self, user_id):
+        """Drop user_id from this cache and from every other worker's"""
+        self.relay.publish(RELAY_CHANNEL, {"user_id": user_id})
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _evict(self, message):
+        with self.lock:
+            self.entries.pop(message["user_id"], None)
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+def get_identity_cache(app):
+    cache = app.extensions.get("identity_cache")
+    if cache is None:
+        cache = IdentityCache(get_relay(app), app.config["IDENTITY_CACHE_SIZE"], app.config["IDENTITY_CACHE_TTL"])
+        app.extensions["identity_cache"] = cache
+    return cache
+
+
+def get_driver_profiles(app):
+    """Per-worker DriverProfiles, evicted by the same invalidations as the identity cache"""
+    cache = app.extensions.get("driver_profiles")
+    if cache is None:
+        cache = IdentityCache(get_relay(app), app.config["IDENTITY_CACHE_SIZE"], app.config["IDENTITY_CACHE_TTL"])
+        app.extensions["driver_profiles"] = cache
+    return cache
@@ -1,37 +1,213 @@
-from App.models import Driver
+from App.models import Driver, DriverStatus
 from App.database import db
-from datetime import datetime
+from App.controllers.location_buffer import LocationWriteBuffer, location_event
+from App.controllers.location_history import LocationHistory
+from App.controllers.location_hub import get_location_hub
+from App.controllers.driver_index import get_driver_grid
+from App.controllers.eta import get_eta_board
+from App.controllers.outbox import emit
+from App.controllers.geo import parse_coordinates
+from App.controllers.identity_cache import get_identity_cache, get_driver_profiles, load_driver_profile
+from datetime import datetime, timedelta
+from flask import current_app
+import logging
+
+logger = logging.getLogger(__name__)
 
 class LocationController:
+    @staticmethod
+    def get_write_buffer():
+        """Get this app's write-behind buffer, or None when LOCATION_WRITE_BEHIND is off"""
+        if not current_app.config["LOCATION_WRITE_BEHIND"]:
+            return None
+        buffer = current_app.extensions.get("location_buffer")
+        if buffer is None:
+            buffer = LocationWriteBuffer(
+                current_app._get_current_object(),
+                flush_interval=current_app.config["LOCATION_FLUSH_INTERVAL"],
+                max_staleness=current_app.config["LOCATION_MAX_STALENESS"]
+            )
+            current_app.extensions["location_buffer"] = buffer
+        return buffer
+
+    @staticmethod
+    def get_history():
+        """Get this app's location history store"""
+        history = current_app.extensions.get("location_history")
+        if history is None:
+            history = LocationHistory(
+                current_app._get_current_object(),
+                flush_records=current_app.config["LOCATION_HISTORY_FLUSH_RECORDS"],
+                flush_interval=current_app.config["LOCATION_FLUSH_INTERVAL"],
+                max_staleness=current_app.config["LOCATION_MAX_STALENESS"]
+            )
+            current_app.extensions["location_history"] = history
+        return history
+
     @staticmethod
     def update_driver_location(driver_id, location_string):
         """Update driver's current location"""
         try:
-            driver = db.session.get(Driver, driver_id)
+            buffer = LocationController.get_write_buffer()
+            # Write-behind pings don't touch the database: the driver comes from the per-worker profile cache
+            if buffer:
+                driver = get_driver_profiles(current_app).get(driver_id, load_driver_profile)
+            else:
+                driver = db.session.get(Driver, driver_id)
             if not driver:
                 return None, "Driver not found"
-            
-            driver.current_location = location_string
-            driver.location_updated_at = datetime.utcnow()
-            db.session.commit()
+
+            updated_at = datetime.utcnow()
+            coordinates = parse_coordinates(location_string)
+            if coordinates:
+                LocationController.get_history().record(driver.id, coordinates[0], coordinates[1], updated_at)
+
+            lat, lon = coordinates or (None, None)
+            if buffer:
+                # Write-behind: the flusher persists it
+                buffer.record(driver.id, location_string, updated_at, coordinates)
+            else:
+                driver.current_location = location_string
+                driver.location_updated_at = updated_at
+                driver.current_lat, driver.current_lon = lat, lon
+                emit("driver.location_updated", location_event(driver.id, location_string, updated_at, lat, lon))
+                db.session.commit()
+
+            get_location_hub(current_app).publish(
+                driver.id, LocationController.location_json(driver, location_string, updated_at)
+            )
+            get_driver_grid(current_app).publish(driver.id, lat, lon, driver.current_status, updated_at)
+            if coordinates:
+                LocationController.refresh_etas(driver.id, lat, lon, updated_at)
             return driver, "Driver location updated successfully"
-            
+
         except Exception as e:
             db.session.rollback()
             return None, f"Error updating driver location: {str(e)}"
 
+    @staticmethod
+    def refresh_etas(driver_id, lat, lon, pinged_at):
+        """Hand a ping to the driver's running schedule's ETAs; returns the schedule id or None"""
+        try:
+            return get_eta_board(current_app).refresh(driver_id, lat, lon, pinged_at)
+        except Exception:
+            # The ping itself is already stored; stale ETAs beat failing it
+            logger.exception("Failed to refresh ETAs for driver %s", driver_id)
+            return None
+
+    @staticmethod
+    def update_driver_status(driver_id, status):
+        """Set a driver's status; only available drivers are offered by get_nearest_drivers"""
+        try:
+            status = DriverStatus(status.value if isinstance(status, DriverStatus) else status)
+        except ValueError:
+            return None, f"Invalid status, expected one of: {', '.join(s.value for s in DriverStatus)}"
+        try:
+            driver = db.session.get(Driver, driver_id)
+            if not driver:
+                return None, "Driver not found"
+            driver.current_status = status
+            db.session.commit()
+            get_identity_cache(current_app).invalidate(driver.id)   # also evicts the driver's cached profile
+            get_driver_grid(current_app).publish(
+                driver.id, driver.current_lat, driver.current_lon, status, driver.location_updated_at
+            )
+            return driver, f"Driver status set to {status.value}"
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error updating driver status: {str(e)}"
+
+    @staticmethod
+    def get_nearest_drivers(lat, lon, k=5, max_km=None):
+        """The k available drivers closest to (lat, lon) by their last ping, from this worker's grid"""
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None, "Coordinates out of range"
+        if not 1 <= k <= current_app.config["NEAREST_DRIVERS_MAX"]:
+            return None, f"k must be between 1 and {current_app.config['NEAREST_DRIVERS_MAX']}"
+        found = get_driver_grid(current_app).nearest(
+            lat, lon, k, max_km=max_km, max_age=current_app.config["NEAREST_DRIVER_MAX_AGE"]
+        )
+        drivers = [
+            {
+                'driver_id': driver_id,
+                'distance_km': round(distance, 3),
+                'lat': driver_lat,
+                'lon': driver_lon,
+                'location_updated_at': datetime.utcfromtimestamp(pinged_at).isoformat() if pinged_at else None
+            }
+            for driver_id, distance, driver_lat, driver_lon, pinged_at in found
+        ]
+        return drivers, f"{len(drivers)} drivers found"
+
     @staticmethod
     def get_driver_location(driver_id):
         """Get driver's current location"""
         driver = db.session.get(Driver, driver_id)
         if not driver:
             return None, "Driver not found"
-        
+
+        current_location, location_updated_at = driver.current_location, driver.location_updated_at
+        buffer = LocationController.get_write_buffer()
+        pending = buffer.get(driver.id) if buffer else None
+        if pending:
+            current_location, location_updated_at = pending
+
+        return LocationController.location_json(driver, current_location, location_updated_at), "Location retrieved successfully"
+
+    @staticmethod
+    def location_json(driver, current_location, location_updated_at):
+        """Location payload shared by lookups and live updates"""
         return {
             'driver_id': driver.id,
             'driver_name': driver.name,
-            'current_location': driver.current_location,
-            'location_updated_at': driver.location_updated_at.isoformat() if driver.location_updated_at else None,
+            'current_location': current_location,
+            'location_updated_at': location_updated_at.isoformat() if location_updated_at else None,
             'vehicle_type': driver.vehicle_type,
             'license_plate': driver.license_plate
-        }, "Location retrieved successfully"
\ No newline at end of file
+        }
+
+    @staticmethod
+    def subscribe(driver_id):
+        """Queue receiving every future location update for a driver, from any worker"""
+        return get_location_hub(current_app).subscribe(driver_id)
+
+    @staticmethod
+    def unsubscribe(driver_id, queue):
+        get_location_hub(current_app).unsubscribe(driver_id, queue)
+
+    @staticmethod
+    def flush_locations():
+        """Write any buffered pings now; returns how many drivers were written"""
+        buffer = LocationController.get_write_buffer()
+        LocationController.get_history().flush()
+        return buffer.flush() if buffer else 0
+
+    @staticmethod
+    def get_driver_trail(driver_id, start=None, end=None):
+        """Get a driver's recorded (lat, lon) pings between start and end (default: the last hour)"""
+        driver = db.session.get(Driver, driver_id)
+        if not driver:
+            return None, "Driver not found"
+        end = end or datetime.utcnow()
+        start = start or end - timedelta(hours=1)
+        if start > end:
+            return None, "Start of the window must be before its end"
+
+        seconds, lat, lon = LocationController.get_history().trail(driver.id, start, end)
+        trail = [
+            {
+                'timestamp': datetime.utcfromtimestamp(t).isoformat(),
+                'lat': round(float(la), 6),
+                'lon': round(float(lo), 6)
+            }
+            for t, la, lo in zip(seconds.tolist(), lat.tolist(), lon.tolist())
+        ]
+        return trail, f"{len(trail)} locations retrieved"
+
+    @staticmethod
+    def prune_history(retention_days=None):
+        """Drop location history partitions older than the retention window"""
+        if retention_days is None:
+            retention_days = current_app.config["LOCATION_HISTORY_RETENTION_DAYS"]
+        deleted = LocationController.get_history().prune(retention_days)
+        return deleted, f"Dropped {deleted} location history blocks older than {retention_days} days"
@@ -0,0 +1,174 @@
+from App.models import Driver
+from App.database import db
+from App.controllers.outbox import emit_many
+from sqlalchemy import bindparam, or_
+from threading import Event, Lock, Thread
+import atexit, logging, time, weakref
+
+logger = logging.getLogger(__name__)
+
+# Every live buffer in this process, so shutdown hooks can flush them all
+_flushables = weakref.WeakSet()
+
+
+def register_flushable(buffer):
+    """Track an object with a close() that must run before the worker exits"""
+    _flushables.add(buffer)
+
+
+def location_event(driver_id, location, updated_at, lat, lon):
+    """Outbox payload of a driver.location_updated message"""
+    return {"driver_id": driver_id, "location": location, "lat": lat, "lon": lon, "updated_at": updated_at.isoformat()}
+
+
+driver_table = Driver.__table__
+# A worker flushing an older ping must not overwrite a newer one another worker already wrote
+flush_statement = (
+    driver_table.update()
+    .where(
+        driver_table.c.id == bindparam("b_id"),
+        or_(driver_table.c.location_updated_at.is_(None), driver_table.c.location_updated_at < bindparam("b_updated_at"))
+    )
+    .values(
+        current_location=bindparam("b_location"), location_updated_at=bindparam("b_updated_at"),
+        current_lat=bindparam("b_lat"), current_lon=bindparam("b_lon")
+    )
+)
+
+
+class BackgroundFlusher:
+    """
+    Base for in-memory write buffers drained off the request path.
+
+    A daemon thread, started lazily on the first record(), calls flush()
+    every flush_interval seconds, or sooner when the oldest pending item
+    would otherwise wait longer than max_staleness or a subclass calls
+    wakeup.set(). Subclasses keep self.oldest (monotonic time of the
+    oldest unflushed item) and self.failed up to date in flush().
+    """
+
+    thread_name = "flusher"
+
+    def __init__(self, app, flush_interval=1.0, max_staleness=5.0):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.oldest = None           # monotonic time of the oldest unflushed item
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.stopped = Event()
+        self.thread = None
+        self.failed = False          # the last flush failed; wait a full interval before retrying
+        register_flushable(self)
+
+    def flush(self):
+        raise NotImplementedError
+
+    def start(self):
+        """Start the flusher thread if it isn't running (lazily, so it starts after a fork)"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopped.clear()
+            self.thread = Thread(target=self._run, name=self.thread_name, daemon=True)
+            self.thread.start()
+
+    def next_flush_in(self):
+        """Seconds until the next flush is due: the interval, or sooner if the oldest item would go stale"""
+        with self.lock:
+            if self.oldest is None or self.failed:
+                return self.flush_interval
+            remaining = self.max_staleness - (time.monotonic() - self.oldest)
+        return max(0.0, min(self.flush_interval, remaining))
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.next_flush_in())
+            self.wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write out whatever is still pending"""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+class LocationWriteBuffer(BackgroundFlusher):
+    """
+    Latest-wins, write-behind buffer for driver location pings.
+
+    Pings are held in memory keyed by driver id (a newer ping replaces the
+    older one) and a background flusher writes everything pending as a
+    single executemany UPDATE every flush_interval seconds, or sooner when
+    the oldest pending ping would otherwise wait longer than max_staleness.
+    """
+
+    thread_name = "location-flusher"
+
+    def __init__(self, app, flush_interval=1.0, max_staleness=5.0):
+        super().__init__(app, flush_interval, max_staleness)
+        self.pending = {}            # driver id -> (location, updated_at, lat, lon)
+        self.flushed = 0
+
+    def record(self, driver_id, location, updated_at, coordinates=None):
+        """Buffer a ping, replacing any unflushed ping for the same driver"""
+        lat, lon = coordinates or (None, None)
+        with self.lock:
+            self.pending[driver_id] = (location, updated_at, lat, lon)
+            now = time.monotonic()
+            if self.oldest is None:
+                self.oldest = now
+            stale = now - self.oldest >= self.max_staleness
+        self.start()
+        if stale:
+            self.wakeup.set()
+
+    def get(self, driver_id):
+        """Unflushed (location, updated_at) for a driver, or None"""
+        pending = self.pending.get(driver_id)
+        return pending[:2] if pending else None
+
+    def flush(self):
+        """Write every pending ping to the database in one bulk UPDATE, with its outbox messages"""
+        with self.lock:
+            batch, oldest, self.pending, self.oldest = self.pending, self.oldest, {}, None
+        if not batch:
+            return 0
+        rows = [
+            {"b_id": driver_id, "b_location": location, "b_updated_at": updated_at, "b_lat": lat, "b_lon": lon}
+            for driver_id, (location, updated_at, lat, lon) in batch.items()
+        ]
+        try:
+            with self.app.app_context():
+                db.session.execute(flush_statement, rows)
+                emit_many("driver.location_updated", [
+                    location_event(driver_id, location, updated_at, lat, lon)
+                    for driver_id, (location, updated_at, lat, lon) in batch.items()
+                ])
+                db.session.commit()
+        except Exception:
+            logger.exception("Failed to flush %d driver locations", len(rows))
+            # Put the batch back unless a newer ping arrived in the meantime; it keeps its age
+            with self.lock:
+                for driver_id, value in batch.items():
+                    self.pending.setdefault(driver_id, value)
+                self.oldest = oldest if self.oldest is None else min(oldest, self.oldest)
+            self.failed = True
+            return 0
+        self.failed = False
+        self.flushed += len(rows)
+        return len(rows)
+
+
+def flush_location_buffers():
+    """Gracefully flush every buffer in this process (worker shutdown / interpreter exit)"""
+    for buffer in list(_flushables):
+        buffer.close()
+
+
+atexit.register(flush_location_buffers)
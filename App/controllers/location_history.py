@@ -0,0 +1,128 @@
+from App.models import LocationHistoryBlock
+from App.database import db
+from App.controllers.location_buffer import BackgroundFlusher
+from datetime import datetime, timedelta
+import logging, struct, time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+RECORD = struct.Struct("<Iff")
+RECORD_DTYPE = np.dtype([("offset_ms", "<u4"), ("lat", "<f4"), ("lon", "<f4")])
+
+
+def hour_of(timestamp):
+    """Hours since the epoch for a naive UTC datetime"""
+    return int((timestamp - EPOCH).total_seconds() // 3600)
+
+
+def decode_blocks(blocks):
+    """Vectorized decode of (hour, data) blocks into (epoch seconds, lat, lon) arrays"""
+    if not blocks:
+        empty = np.empty(0)
+        return empty, empty, empty
+    records = [np.frombuffer(data, dtype=RECORD_DTYPE) for _, data in blocks]
+    hours = np.repeat([hour for hour, _ in blocks], [len(r) for r in records])
+    records = np.concatenate(records)
+    seconds = hours * 3600.0 + records["offset_ms"] / 1000.0
+    return seconds, records["lat"].astype(np.float64), records["lon"].astype(np.float64)
+
+
+class LocationHistory(BackgroundFlusher):
+    """
+    Append-only location history, partitioned by driver and hour.
+
+    Pings are packed into per-(driver, hour) byte buffers in memory and
+    written out as LocationHistoryBlock rows by a background flusher, so
+    storage costs one row per driver per hour per flush rather than one
+    row per ping, and no request ever waits on the write. The flusher
+    runs early once flush_records records are pending. Pending records
+    are included when reading a trail.
+    """
+
+    thread_name = "location-history-flusher"
+
+    def __init__(self, app, flush_records=500, flush_interval=1.0, max_staleness=5.0):
+        super().__init__(app, flush_interval, max_staleness)
+        self.flush_records = flush_records
+        self.pending = {}        # (driver id, hour) -> bytearray of packed records
+        self.pending_records = 0
+
+    def record(self, driver_id, lat, lon, timestamp):
+        """Append one ping; the flusher writes it out, early once enough records have accumulated"""
+        seconds = (timestamp - EPOCH).total_seconds()
+        hour = int(seconds // 3600)
+        packed = RECORD.pack(int((seconds - hour * 3600) * 1000), lat, lon)
+        with self.lock:
+            self.pending.setdefault((driver_id, hour), bytearray()).extend(packed)
+            self.pending_records += 1
+            now = time.monotonic()
+            if self.oldest is None:
+                self.oldest = now
+            due = (self.pending_records >= self.flush_records
+                   or now - self.oldest >= self.max_staleness)
+        self.start()
+        if due:
+            self.wakeup.set()
+
+    def flush(self):
+        """Write every pending (driver, hour) buffer as a new block"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self.pending_records, self.oldest = 0, None
+        if not batch:
+            return 0
+        rows = [
+            {"driver_id": driver_id, "hour": hour, "record_count": len(data) // RECORD.size, "data": bytes(data)}
+            for (driver_id, hour), data in batch.items()
+        ]
+        try:
+            with self.app.app_context():
+                db.session.execute(db.insert(LocationHistoryBlock), rows)
+                db.session.commit()
+        except Exception:
+            logger.exception("Failed to write %d location history blocks", len(rows))
+            with self.lock:
+                for key, data in batch.items():
+                    # Older records go first so blocks stay in time order
+                    self.pending[key] = bytearray(data) + self.pending.get(key, bytearray())
+                    self.pending_records += len(data) // RECORD.size
+                if self.oldest is None:
+                    self.oldest = time.monotonic()
+            self.failed = True
+            return 0
+        self.failed = False
+        return len(rows)
+
+    def trail(self, driver_id, start, end):
+        """(epoch seconds, lat, lon) arrays for a driver between two naive UTC datetimes"""
+        first_hour, last_hour = hour_of(start), hour_of(end)
+        blocks = db.session.execute(
+            db.select(LocationHistoryBlock.hour, LocationHistoryBlock.data)
+            .where(
+                LocationHistoryBlock.driver_id == driver_id,
+                LocationHistoryBlock.hour.between(first_hour, last_hour)
+            )
+            .order_by(LocationHistoryBlock.hour, LocationHistoryBlock.id)
+        ).all()
+        blocks = [(hour, data) for hour, data in blocks]
+        with self.lock:
+            blocks.extend(
+                (hour, bytes(data)) for (pending_driver, hour), data in self.pending.items()
+                if pending_driver == driver_id and first_hour <= hour <= last_hour
+            )
+        seconds, lat, lon = decode_blocks(blocks)
+        order = np.argsort(seconds, kind="stable")
+        seconds, lat, lon = seconds[order], lat[order], lon[order]
+        mask = (seconds >= (start - EPOCH).total_seconds()) & (seconds <= (end - EPOCH).total_seconds())
+        return seconds[mask], lat[mask], lon[mask]
+
+    def prune(self, retention_days):
+        """Drop whole hourly partitions older than the retention window"""
+        cutoff = hour_of(datetime.utcnow() - timedelta(days=retention_days))
+        result = db.session.execute(
+            db.delete(LocationHistoryBlock).where(LocationHistoryBlock.hour < cutoff)
+        )
+        db.session.commit()
+        return result.rowcount
@@ -0,0 +1,84 @@
+from App.controllers.relay import get_relay
+from queue import Queue, Empty, Full
+from threading import Lock
+
+RELAY_CHANNEL = "driver-location"
+
+
+class LocationHub:
+    """
+    In-process publish/subscribe hub for live driver locations.
+
+    Each subscriber owns a small bounded queue; when a slow subscriber's
+    queue is full its oldest update is dropped, since only the latest
+    location matters. Publishing goes through the worker relay so
+    subscribers connected to other gunicorn workers get the update too.
+    """
+
+    def __init__(self, relay, queue_size=16):
+        self.relay = relay
+        self.queue_size = queue_size
+        self.subscribers = {}    # driver id -> set of queues
+        self.lock = Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        relay.subscribe(RELAY_CHANNEL, self._deliver)
+
+    def subscribe(self, driver_id):
+        """Register a new subscriber queue for a driver"""
+        self.relay.start()
+        queue = Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(driver_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, driver_id, queue):
+        with self.lock:
+            queues = self.subscribers.get(driver_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[driver_id]
+
+    def publish(self, driver_id, payload):
+        """Fan a location update out to subscribers in every worker"""
+        self.published += 1
+        self.relay.publish(RELAY_CHANNEL, {"driver_id": driver_id, "location": payload})
+
+    def _deliver(self, message):
+        with self.lock:
+            queues = list(self.subscribers.get(message["driver_id"], ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(message["location"])
+            except Full:
+                try:
+                    queue.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+                try:
+                    queue.put_nowait(message["location"])
+                except Full:
+                    self.dropped += 1
+                    continue
+            self.delivered += 1
+
+    def stats(self):
+        with self.lock:
+            subscribers = sum(len(queues) for queues in self.subscribers.values())
+        return {
+            "subscribers": subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+def get_location_hub(app):
+    hub = app.extensions.get("location_hub")
+    if hub is None:
+        hub = LocationHub(get_relay(app), app.config["LOCATION_STREAM_QUEUE_SIZE"])
+        app.extensions["location_hub"] = hub
+    return hub
@@ -0,0 +1,216 @@
+from App.models import OutboxMessage
+from App.database import db
+from App.instrumentation import get_metrics
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam
+from threading import Event
+import logging, os, random, socket, time, uuid
+
+logger = logging.getLogger(__name__)
+notifications = logging.getLogger("App.notifications")
+
+outbox_table = OutboxMessage.__table__
+
+HANDLERS = {}   # topic -> callable(payload) that performs the side effect
+
+retry_statement = (
+    outbox_table.update()
+    .where(outbox_table.c.id == bindparam("b_id"))
+    .values(
+        attempts=bindparam("b_attempts"), last_error=bindparam("b_error"), available_at=bindparam("b_available_at"),
+        failed_at=bindparam("b_failed_at"), leased_until=None, lease_owner=None
+    )
+)
+
+
+def handler(topic):
+    """Register the decorated func(payload) as the side effect of messages on topic"""
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def emit(topic, payload):
+    """Queue a side effect in the current session; it is stored (or dropped) by the caller's commit"""
+    db.session.add(OutboxMessage(topic, payload))
+
+
+def emit_many(topic, payloads):
+    """emit() for set-based writes: one executemany INSERT in the current transaction"""
+    if not payloads:
+        return
+    now = datetime.utcnow()
+    db.session.execute(outbox_table.insert(), [
+        {"topic": topic, "payload": payload, "created_at": now, "available_at": now, "attempts": 0}
+        for payload in payloads
+    ])
+
+
+@handler("stop_request.created")
+def notify_stop_requested(payload):
+    notifications.info("Resident %s requested a stop on schedule %s", payload["resident_id"], payload["schedule_id"])
+
+
+@handler("stop_request.status_changed")
+def notify_stop_status(payload):
+    notifications.info("Stop requests %s are now %s", payload["ids"], payload["status"])
+
+
+@handler("driver.location_updated")
+def notify_driver_moved(payload):
+    notifications.debug("Driver %s is at %s", payload["driver_id"], payload["location"])
+
+
+class OutboxWorker:
+    """
+    Delivers outbox messages in batches, outside any request.
+
+    A batch is claimed by leasing its rows (leased_until, lease_owner) in
+    one short transaction, so a worker that dies mid-batch only delays its
+    messages until the lease runs out. On PostgreSQL the claiming SELECT
+    uses FOR UPDATE SKIP LOCKED, so concurrent workers pass over each
+    other's rows instead of queueing on them; SQLite serializes writers
+    and relies on the lease alone. Delivered messages are deleted; a
+    failed one is retried after an exponential, jittered backoff until
+    max_attempts, then kept with failed_at set. Delivery is at least once.
+    """
+
+    def __init__(self, app, handlers=None, batch_size=100, lease_seconds=60.0, max_attempts=8,
+                 backoff_base=2.0, backoff_max=600.0):
+        self.app = app
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:64]
+        self.stopped = Event()
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def run(self, interval=1.0):
+        """Deliver batches until stop(); sleeps interval seconds whenever a batch comes back short"""
+        while not self.stopped.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                self.stopped.wait(interval)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run_once(self):
+        """Claim and deliver one batch; returns how many messages were claimed"""
+        with self.app.app_context():
+            metrics = get_metrics(self.app)
+            messages = self.claim()
+            delivered, retries = [], []
+            for message_id, topic, payload, attempts, created_at in messages:
+                started = time.perf_counter()
+                try:
+                    if topic not in self.handlers:
+                        raise LookupError(f"No handler for topic {topic}")
+                    self.handlers[topic](payload)
+                except Exception as e:
+                    db.session.rollback()
+                    retries.append((message_id, attempts + 1, f"{type(e).__name__}: {e}"))
+                    outcome = "failed" if attempts + 1 >= self.max_attempts else "retried"
+                else:
+                    delivered.append(message_id)
+                    outcome = "delivered"
+                    metrics.observe("outbox_lag_seconds", (datetime.utcnow() - created_at).total_seconds(), topic=topic)
+                metrics.observe("outbox_delivery_seconds", time.perf_counter() - started, topic=topic)
+                metrics.inc("outbox_messages_total", topic=topic, outcome=outcome)
+            self.settle(delivered, retries)
+        return len(messages)
+
+    def claim(self):
+        """Lease up to batch_size due messages; (id, topic, payload, attempts, created_at) rows"""
+        now = datetime.utcnow()
+        claimable = (
+            OutboxMessage.failed_at.is_(None),
+            OutboxMessage.available_at <= now,
+            db.or_(OutboxMessage.leased_until.is_(None), OutboxMessage.leased_until < now),
+        )
+        due = db.select(OutboxMessage.id).where(*claimable).order_by(OutboxMessage.id).limit(self.batch_size)
+        if db.engine.dialect.name == "postgresql":
+            due = due.with_for_update(skip_locked=True)
+        try:
+            ids = db.session.execute(due).scalars().all()
+            if ids:
+                # Re-checking the lease in the UPDATE keeps a row another worker just took on SQLite theirs
+                db.session.execute(
+                    db.update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids), *claimable)
+                    .values(leased_until=now + timedelta(seconds=self.lease_seconds), lease_owner=self.owner)
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if not ids:
+            return []
+        return db.session.execute(
+            db.select(OutboxMessage.id, OutboxMessage.topic, OutboxMessage.payload,
+                      OutboxMessage.attempts, OutboxMessage.created_at)
+            .where(OutboxMessage.id.in_(ids), OutboxMessage.lease_owner == self.owner)
+            .order_by(OutboxMessage.id)
+        ).all()
+
+    def settle(self, delivered, retries):
+        """Delete delivered messages and reschedule (or give up on) failed ones"""
+        now = datetime.utcnow()
+        rows = []
+        for message_id, attempts, error in retries:
+            failed = attempts >= self.max_attempts
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * (0.5 + random.random() / 2)
+            rows.append({
+                "b_id": message_id, "b_attempts": attempts, "b_error": error[:2000],
+                "b_available_at": now + timedelta(seconds=delay), "b_failed_at": now if failed else None
+            })
+            if failed:
+                logger.error("Outbox message %s failed %d times, giving up: %s", message_id, attempts, error)
+        try:
+            if delivered:
+                db.session.execute(outbox_table.delete().where(outbox_table.c.id.in_(delivered)))
+            if rows:
+                db.session.execute(retry_statement, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Failed to settle %d outbox messages", len(delivered) + len(rows))
+            return
+        self.delivered += len(delivered)
+        self.failed += sum(1 for row in rows if row["b_failed_at"])
+        self.retried += sum(1 for row in rows if not row["b_failed_at"])
+
+    def stats(self):
+        return {"delivered": self.delivered, "retried": self.retried, "failed": self.failed}
+
+
+def backlog():
+    """Messages waiting for delivery and messages that ran out of attempts"""
+    pending, failed = db.session.execute(db.select(
+        db.func.count(OutboxMessage.id).filter(OutboxMessage.failed_at.is_(None)),
+        db.func.count(OutboxMessage.id).filter(OutboxMessage.failed_at.isnot(None)),
+    )).one()
+    return {"pending": pending, "failed": failed}
+
+
+def get_outbox_worker(app):
+    worker = app.extensions.get("outbox_worker")
+    if worker is None:
+        worker = OutboxWorker(
+            app, batch_size=app.config["OUTBOX_BATCH_SIZE"], lease_seconds=app.config["OUTBOX_LEASE_SECONDS"],
+            max_attempts=app.config["OUTBOX_MAX_ATTEMPTS"], backoff_base=app.config["OUTBOX_BACKOFF_BASE"],
+            backoff_max=app.config["OUTBOX_BACKOFF_MAX"]
+        )
+        app.extensions["outbox_worker"] = worker
+    return worker
@@ -0,0 +1,35 @@
+from App.database import db
+from flask import current_app
+
+
+def page_size(limit=None):
+    """Clamp a requested page size to PAGE_SIZE_MAX, defaulting to PAGE_SIZE_DEFAULT"""
+    if not limit or limit < 1:
+        return current_app.config["PAGE_SIZE_DEFAULT"]
+    return min(limit, current_app.config["PAGE_SIZE_MAX"])
+
+
+def keyset_page(stmt, id_column, after_id=None, limit=None, scalars=True):
+    """One page of stmt ordered by id_column, starting after the after_id cursor.
+
+    Returns (items, next_after_id); next_after_id is None on the last page.
+    Seeks on the primary key rather than using OFFSET, so every page costs
+    the same and rows inserted meanwhile never shift a client's cursor.
+    With scalars=False the items are row tuples whose first column is "id".
+    """
+    limit = page_size(limit)
+    if after_id is not None:
+        stmt = stmt.where(id_column > after_id)
+    result = db.session.execute(stmt.order_by(id_column).limit(limit + 1))
+    items = (result.scalars() if scalars else result).all()
+    if len(items) > limit:
+        return items[:limit], items[limit - 1].id
+    return items, None
+
+
+def stream_all(stmt, id_column, chunk_size=None, scalars=True):
+    """Yield every row of stmt in id order, fetching chunk_size rows at a time"""
+    chunk_size = chunk_size or current_app.config["STREAM_CHUNK_SIZE"]
+    result = db.session.execute(stmt.order_by(id_column).execution_options(yield_per=chunk_size))
+    for item in (result.scalars() if scalars else result):
+        yield item
@@ -0,0 +1,151 @@
+from threading import Lock, Thread
+import atexit, json, logging, os, socket, stat, time
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 65536
+
+
+def private_directory(path):
+    """
+    Create path as a 0700 directory, or check that an existing one is a
+    directory of ours that nobody else can reach; raises PermissionError.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {info.st_uid}, not this process's uid {os.getuid()}")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o}); chmod it 700")
+    return path
+
+
+class WorkerRelay:
+    """
+    Local pub/sub between the gunicorn workers on one host.
+
+    Each worker binds a Unix datagram socket in a shared directory and
+    publishing sends the message to every other socket found there.
+    Sockets left behind by dead workers are removed the first time a
+    send to them is refused. The directory must be private to this user
+    (see private_directory), since anyone who can write to it can inject
+    messages. Handlers run for local publishes too, so
+    callers publish once and every worker (including this one) reacts.
+    """
+
+    def __init__(self, directory, peer_refresh=1.0):
+        self.directory = directory
+        self.peer_refresh = peer_refresh
+        self.handlers = {}       # channel -> list of callables taking the payload
+        self.sock = None         # bound, blocking: this worker's inbox
+        self.send_sock = None    # unbound, non-blocking: a slow peer never stalls a publisher
+        self.path = None
+        self.pid = None
+        self.peers = []
+        self.peers_listed = 0.0
+        self.lock = Lock()
+
+    def subscribe(self, channel, handler):
+        """Call handler(payload) for every message published on channel, from any worker"""
+        self.handlers.setdefault(channel, []).append(handler)
+        self.start()
+
+    def publish(self, channel, payload):
+        """Deliver to local handlers and relay to the other workers"""
+        self._dispatch(channel, payload)
+        if not self.directory:
+            return
+        self.start()
+        data = json.dumps({"channel": channel, "payload": payload}).encode()
+        if len(data) > MAX_DATAGRAM:
+            logger.warning("Relay message on %s too large (%d bytes), not relayed", channel, len(data))
+            return
+        for peer in self._list_peers():
+            try:
+                self.send_sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._forget_peer(peer)
+            except BlockingIOError:
+                logger.warning("Relay peer %s is not keeping up, dropped a %s message", peer, channel)
+            except OSError:
+                logger.exception("Relay send to %s failed", peer)
+
+    def start(self):
+        """Bind this worker's socket and start the listener (lazily, so it happens after a fork)"""
+        if self.pid == os.getpid() or not self.directory:
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            private_directory(self.directory)
+            self.path = os.path.join(self.directory, f"{os.getpid()}-{id(self)}.sock")
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.bind(self.path)
+            self.send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.send_sock.setblocking(False)
+            self.pid = os.getpid()
+            self.peers_listed = 0.0
+            Thread(target=self._listen, args=(self.sock,), name="worker-relay", daemon=True).start()
+
+    def close(self):
+        for sock in (self.sock, self.send_sock):
+            if sock is not None:
+                sock.close()
+        self.sock = self.send_sock = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.pid = None
+
+    def _listen(self, sock):
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except OSError:
+                return  # socket closed
+            try:
+                message = json.loads(data)
+                self._dispatch(message["channel"], message["payload"])
+            except Exception:
+                logger.exception("Bad relay message")
+
+    def _dispatch(self, channel, payload):
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Relay handler for %s failed", channel)
+
+    def _list_peers(self):
+        now = time.monotonic()
+        if now - self.peers_listed >= self.peer_refresh:
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                names = []
+            self.peers = [
+                os.path.join(self.directory, name) for name in names
+                if name.endswith(".sock") and os.path.join(self.directory, name) != self.path
+            ]
+            self.peers_listed = now
+        return self.peers
+
+    def _forget_peer(self, peer):
+        try:
+            os.unlink(peer)
+        except OSError:
+            pass
+        self.peers = [p for p in self.peers if p != peer]
+
+
+def get_relay(app):
+    """The app's relay; without WORKER_RELAY_DIR it only dispatches within this process"""
+    relay = app.extensions.get("worker_relay")
+    if relay is None:
+        relay = WorkerRelay(app.config["WORKER_RELAY_DIR"])
+        app.extensions["worker_relay"] = relay
+        atexit.register(relay.close)
+    return relay
@@ -0,0 +1,142 @@
+from App.controllers.geo import haversine_km
+from collections import OrderedDict
+from threading import Lock
+import time
+import numpy as np
+
+
+def distance_matrix(lats, lons):
+    """Pairwise great-circle distances in km between the points, as an n x n array"""
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    return haversine_km(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+
+def nearest_neighbour(matrix):
+    """Open path from node 0 that always moves to the closest unvisited node"""
+    n = len(matrix)
+    order = [0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n - 1):
+        distances = np.where(unvisited, matrix[order[-1]], np.inf)
+        nxt = int(np.argmin(distances))
+        order.append(nxt)
+        unvisited[nxt] = False
+    return order
+
+
+def two_opt(matrix, order, deadline):
+    """
+    Improve an open path with fixed start by reversing segments until no
+    reversal shortens it or the deadline passes; returns (order, converged).
+
+    For each segment start i the gain of every segment end j is computed in
+    one vectorized step.
+    """
+    order = np.array(order)
+    n = len(order)
+    if n < 4:
+        return order.tolist(), True
+    while True:
+        improved = False
+        for i in range(1, n - 1):
+            if time.perf_counter() > deadline:
+                return order.tolist(), False
+            a, b = order[i - 1], order[i]
+            c = order[i + 1:]                        # candidate segment ends j = i+1 .. n-1
+            d = np.append(order[i + 2:], -1)         # node after each end; -1 past the last
+            before = matrix[a, b] + np.where(d >= 0, matrix[c, d], 0.0)
+            after = matrix[a, c] + np.where(d >= 0, matrix[b, d], 0.0)
+            gains = before - after
+            best = int(np.argmax(gains))
+            if gains[best] > 1e-9:
+                j = i + 1 + best
+                order[i:j + 1] = order[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            return order.tolist(), True
+
+
+def plan_route(start, points, time_budget=0.2):
+    """
+    Visiting order for points [(lat, lon), ...] starting from start (lat, lon),
+    or from whichever point suits the route best when start is None.
+
+    Returns (order of point indexes, leg distances km, converged).
+    """
+    deadline = time.perf_counter() + time_budget
+    if not points:
+        return [], [], True
+    nodes = [start] + list(points) if start else list(points)
+    lats, lons = zip(*nodes)
+    matrix = distance_matrix(lats, lons)
+    if start is None:
+        # A free start is node 0 of a dummy zero-distance hub
+        matrix = np.pad(matrix, ((1, 0), (1, 0)))
+    order, converged = two_opt(matrix, nearest_neighbour(matrix), deadline)
+    legs = [float(matrix[order[k - 1], order[k]]) for k in range(1, len(order))]
+    return [node - 1 for node in order[1:]], legs, converged
+
+
+def walk_from(start, lats, lons):
+    """
+    Walk a planned open path from start (lat, lon), entering it at whichever
+    end is nearer. Returns (reversed, legs km) for the path in walking order,
+    where legs[0] is start to the first stop (0 without a start).
+    """
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    if not len(lats):
+        return False, []
+    flip = False
+    if start:
+        ends = haversine_km(start[0], start[1], lats[[0, -1]], lons[[0, -1]])
+        flip = bool(ends[1] < ends[0])
+    if flip:
+        lats, lons = lats[::-1], lons[::-1]
+    lead = float(haversine_km(start[0], start[1], lats[:1], lons[:1])[0]) if start else 0.0
+    legs = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]).tolist()
+    return flip, [lead] + legs
+
+
+class RoutePlanCache:
+    """
+    Per-worker LRU of route plans keyed by schedule id. A plan is reused
+    until the schedule's set of confirmed stops (or where they geocode to)
+    changes; the caller passes that set as the key to compare against.
+    Plans have no fixed start, so the van moving doesn't make them stale;
+    walk_from() applies its position when a plan is read.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.plans = OrderedDict()   # schedule id -> (stops key, plan)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schedule_id, stops_key, build):
+        with self.lock:
+            cached = self.plans.get(schedule_id)
+            if cached is not None and cached[0] == stops_key:
+                self.plans.move_to_end(schedule_id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        plan = build()
+        with self.lock:
+            self.plans[schedule_id] = (stops_key, plan)
+            self.plans.move_to_end(schedule_id)
+            while len(self.plans) > self.max_size:
+                self.plans.popitem(last=False)
+        return plan
+
+    def stats(self):
+        return {"size": len(self.plans), "hits": self.hits, "misses": self.misses}
+
+
+def get_route_cache(app):
+    cache = app.extensions.get("route_plans")
+    if cache is None:
+        cache = RoutePlanCache(app.config["ROUTE_CACHE_SIZE"])
+        app.extensions["route_plans"] = cache
+    return cache
@@ -1,6 +1,83 @@
-from App.models import DriverSchedule
+from App.models import DriverSchedule, Driver, StopRequest, StopRequestStatus, User
 from App.database import db
-from datetime import datetime
+from App.controllers.street import StreetController
+from App.controllers.pagination import keyset_page, stream_all
+from App.controllers.serialization import schedule_rows, schedule_json, schedules as schedule_table
+from App.controllers.schedule_cache import get_upcoming_cache
+from App.controllers.schedule_conflicts import IntervalIndex, find_conflict, describe_conflict
+from App.controllers.route_planner import plan_route, walk_from, get_route_cache
+from App.controllers.geo import parse_coordinates
+from App.controllers.geocoding import GeocodingController
+from App.controllers.eta import get_eta_board
+from datetime import datetime, timezone
+from flask import current_app
+from itertools import islice
+from sqlalchemy.orm import joinedload, selectinload
+import csv, json, os, time
+
+# Loader options for with_related=True: the driver is joined into the schedule query
+SCHEDULE_RELATED = (joinedload(DriverSchedule.driver),)
+# A single schedule also brings its stop requests and their residents (one extra query)
+SCHEDULE_DETAIL = SCHEDULE_RELATED + (selectinload(DriverSchedule.stop_requests).joinedload(StopRequest.resident),)
+
+IMPORT_FIELDS = ("driver_id", "street", "scheduled_start_time", "scheduled_end_time")
+
+
+def read_schedule_rows(path):
+    """Yield (line number, row dict) from a CSV or JSON Lines schedule file without loading it"""
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        with open(path, newline="") as f:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError as e:
+                        yield line_no, {"_error": f"Invalid JSON: {e}"}
+    else:
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def parse_timestamp(value):
+    """ISO 8601 timestamp as the naive UTC datetime schedules are stored in; offsets are converted"""
+    moment = datetime.fromisoformat(str(value))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def parse_schedule_row(row, driver_ids, max_span=None):
+    """Turn one raw import row into insert parameters, or raise ValueError with the reason"""
+    if not isinstance(row, dict):
+        raise ValueError("Expected an object")
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    missing = [field for field in IMPORT_FIELDS if not str(row.get(field) or "").strip()]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    try:
+        driver_id = int(row["driver_id"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid driver_id {row['driver_id']!r}")
+    if driver_id not in driver_ids:
+        raise ValueError(f"Driver {driver_id} not found")
+    try:
+        start = parse_timestamp(row["scheduled_start_time"])
+        end = parse_timestamp(row["scheduled_end_time"])
+    except ValueError:
+        raise ValueError("Invalid datetime format, expected ISO 8601")
+    if end <= start:
+        raise ValueError("Schedule must end after it starts")
+    if max_span is not None and end - start > max_span:
+        raise ValueError(f"Schedule must not last longer than {max_span.total_seconds() / 3600:g} hours")
+    return {
+        "driver_id": driver_id,
+        "street": str(row["street"]).strip(),
+        "scheduled_start_time": start,
+        "scheduled_end_time": end
+    }
 
 class ScheduleController:
     @staticmethod
@@ -12,10 +89,23 @@ class ScheduleController:
             driver = UserController.get_user_by_id(driver_id)
             if not driver or driver.user_type.value != 'driver':
                 return None, "Driver not found"
-            
-            schedule = DriverSchedule(driver_id, street, scheduled_start_time, scheduled_end_time)
+            if scheduled_end_time <= scheduled_start_time:
+                return None, "Schedule must end after it starts"
+
+            # Lock the driver row so concurrent creates for one driver check conflicts in turn
+            db.session.execute(db.select(User.id).where(User.id == driver_id).with_for_update())
+            conflict = find_conflict(driver_id, scheduled_start_time, scheduled_end_time)
+            if conflict:
+                db.session.rollback()
+                return None, describe_conflict(conflict)
+
+            street_ref = StreetController.get_or_create_street(street)
+            schedule = DriverSchedule(driver_id, street, scheduled_start_time, scheduled_end_time, street_id=street_ref.id)
             db.session.add(schedule)
             db.session.commit()
+            StreetController.index_street(street_ref)
+            get_upcoming_cache(current_app).invalidate()
+            get_eta_board(current_app).forget_drivers([driver_id])
             return schedule, "Schedule created successfully"
             
         except Exception as e:
@@ -23,25 +113,256 @@ class ScheduleController:
             return None, f"Error creating schedule: {str(e)}"
 
     @staticmethod
-    def get_schedules_for_street(street_name):
+    def import_schedules(path, chunk_size=1000):
+        """
+        Bulk import schedules from a CSV/JSONL file, one executemany insert and commit per chunk.
+        On a failure part way through, the report still covers the chunks already committed and
+        carries the failure under "error".
+        """
+        started = time.perf_counter()
+        imported = 0
+        rejected = []
+        drivers = set()
+        error = None
+        try:
+            # One query for every valid driver id instead of a user lookup per row
+            driver_ids = set(db.session.execute(db.select(Driver.id)).scalars())
+            intervals = IntervalIndex()
+            rows = read_schedule_rows(path)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                parsed = []
+                chunk_rejected = []
+                for line_no, row in chunk:
+                    try:
+                        parsed.append((line_no, parse_schedule_row(row, driver_ids)))
+                    except ValueError as e:
+                        chunk_rejected.append((line_no, str(e)))
+                params = ScheduleController._without_conflicts(
+                    parsed, intervals, chunk_rejected, lambda line_no: f"line {line_no}"
+                )
+                if params:
+                    street_ids = StreetController.resolve_street_ids({p["street"] for p in params})
+                    for p in params:
+                        p["street_id"] = street_ids[p["street"]]
+                    db.session.execute(db.insert(DriverSchedule), params)
+                    db.session.commit()
+                # Only chunks that made it in count, so the report matches what was stored
+                imported += len(params)
+                rejected.extend(chunk_rejected)
+                drivers.update(p["driver_id"] for p in params)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+
+        rejected.sort()
+        if imported:
+            StreetController.get_index().refresh(force=True)
+            get_upcoming_cache(current_app).invalidate()
+            get_eta_board(current_app).forget_drivers(drivers)
+        elapsed = time.perf_counter() - started
+        report = {
+            "imported": imported,
+            "rejected": rejected,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": (imported + len(rejected)) / elapsed if elapsed else 0.0
+        }
+        if error is not None:
+            report["error"] = error
+            return report, f"Error importing schedules after {imported} rows: {error}"
+        return report, f"Imported {imported} schedules, rejected {len(rejected)}"
+
+    @staticmethod
+    def validate_schedules(proposed, labels=None, max_span=None):
+        """Check proposed schedule dicts without saving them; one result per proposal, in order"""
+        labels = labels or [f"item {index}" for index in range(len(proposed))]
+        try:
+            driver_ids = set(db.session.execute(db.select(Driver.id)).scalars())
+            parsed, rejected = [], []
+            for index, row in enumerate(proposed):
+                try:
+                    parsed.append((index, parse_schedule_row(row, driver_ids, max_span)))
+                except ValueError as e:
+                    rejected.append((index, str(e)))
+            # Proposals are checked against stored schedules and each other
+            ScheduleController._without_conflicts(parsed, IntervalIndex(), rejected, labels.__getitem__)
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error validating schedules: {str(e)}"
+
+        reasons = dict(rejected)
+        results = [
+            {"index": index, "valid": index not in reasons, "reason": reasons.get(index)}
+            for index in range(len(proposed))
+        ]
+        return results, f"{len(proposed) - len(reasons)} of {len(proposed)} schedules are valid"
+
+    @staticmethod
+    def _without_conflicts(parsed, intervals, rejected, label):
+        """Params of the parsed (key, params) pairs that overlap nothing; the rest go to rejected"""
+        intervals.load([(p["driver_id"], p["scheduled_start_time"], p["scheduled_end_time"]) for _, p in parsed])
+        accepted = []
+        for key, p in parsed:
+            start, end = p["scheduled_start_time"], p["scheduled_end_time"]
+            conflict = intervals.conflict(p["driver_id"], start, end)
+            if conflict:
+                rejected.append((key, describe_conflict(conflict)))
+                continue
+            intervals.add(p["driver_id"], start, end, label(key))
+            accepted.append(p)
+        return accepted
+
+    @staticmethod
+    def get_schedules_for_street(street_name, with_related=False):
         """Get all schedules for a specific street"""
-        return DriverSchedule.query.filter(
-            DriverSchedule.street.ilike(f'%{street_name}%')
+        # Resolve matching streets from the in-process index, then hit ix_driver_schedule_street_id
+        street_ids = StreetController.search_street_ids(street_name)
+        if not street_ids:
+            return []
+        return ScheduleController._related(DriverSchedule.query, with_related).filter(
+            DriverSchedule.street_id.in_(street_ids)
         ).all()
 
     @staticmethod
-    def get_schedules_for_driver(driver_id):
+    def search_streets(query, limit=10):
+        """Get catalog streets matching a prefix, or the closest fuzzy matches"""
+        return StreetController.search_streets(query, limit)
+
+    @staticmethod
+    def get_schedules_for_driver(driver_id, with_related=False):
         """Get all schedules for a driver"""
-        return DriverSchedule.query.filter_by(driver_id=driver_id).all()
+        return ScheduleController._related(DriverSchedule.query, with_related).filter_by(driver_id=driver_id).all()
+
+    @staticmethod
+    def get_upcoming_schedules(with_related=False):
+        """Get all upcoming schedules, earliest first; which ones comes from the per-worker cache"""
+        ids = [schedule["id"] for schedule in get_upcoming_cache(current_app).get()]
+        query = ScheduleController._related(DriverSchedule.query, with_related)
+        by_id = {}
+        chunk_size = current_app.config["STREAM_CHUNK_SIZE"]
+        for i in range(0, len(ids), chunk_size):
+            by_id.update((s.id, s) for s in query.filter(DriverSchedule.id.in_(ids[i:i + chunk_size])))
+        # A schedule deleted since the cache was loaded is skipped
+        return [by_id[schedule_id] for schedule_id in ids if schedule_id in by_id]
 
     @staticmethod
-    def get_upcoming_schedules():
-        """Get all upcoming schedules"""
-        return DriverSchedule.query.filter(
-            DriverSchedule.scheduled_start_time >= datetime.utcnow()
-        ).order_by(DriverSchedule.scheduled_start_time).all()
+    def get_upcoming_schedules_json(limit=None):
+        """get_json() dicts of upcoming schedules, earliest first, served from the per-worker cache"""
+        return get_upcoming_cache(current_app).get(limit=limit)
 
     @staticmethod
-    def get_schedule_by_id(schedule_id):
+    def get_schedules_page(after_id=None, limit=None, driver_id=None, with_related=False):
+        """Get one keyset page of schedules and the next cursor"""
+        stmt = ScheduleController._related(ScheduleController._schedules_query(driver_id), with_related)
+        return keyset_page(stmt, DriverSchedule.id, after_id, limit)
+
+    @staticmethod
+    def stream_schedules(driver_id=None, with_related=False):
+        """Iterate over every schedule in id order without loading them all at once"""
+        stmt = ScheduleController._related(ScheduleController._schedules_query(driver_id), with_related)
+        return stream_all(stmt, DriverSchedule.id)
+
+    @staticmethod
+    def get_schedules_json_page(after_id=None, limit=None, driver_id=None):
+        """Same page as get_schedules_page, serialized straight from projected columns"""
+        rows, next_after_id = keyset_page(schedule_rows(driver_id), schedule_table.c.id, after_id, limit, scalars=False)
+        return [schedule_json(row) for row in rows], next_after_id
+
+    @staticmethod
+    def stream_schedules_json(driver_id=None):
+        """Stream get_json() dicts for every schedule without hydrating ORM objects"""
+        for row in stream_all(schedule_rows(driver_id), schedule_table.c.id, scalars=False):
+            yield schedule_json(row)
+
+    @staticmethod
+    def _related(query, with_related):
+        """Add the eager-loading options for each schedule's driver when asked to"""
+        return query.options(*SCHEDULE_RELATED) if with_related else query
+
+    @staticmethod
+    def _schedules_query(driver_id=None):
+        stmt = db.select(DriverSchedule)
+        if driver_id is not None:
+            stmt = stmt.where(DriverSchedule.driver_id == driver_id)
+        return stmt
+
+    @staticmethod
+    def get_schedule_by_id(schedule_id, with_related=False):
         """Get schedule by ID"""
-        return db.session.get(DriverSchedule, schedule_id)
\ No newline at end of file
+        return db.session.get(DriverSchedule, schedule_id, options=SCHEDULE_DETAIL if with_related else None)
+
+    @staticmethod
+    def get_schedule_route(schedule_id):
+        """Planned visiting order of a schedule's confirmed stops, walked from the driver's last "lat,lon" ping"""
+        plan, message = ScheduleController.get_route_plan(schedule_id)
+        if plan is None:
+            return None, message
+        from App.controllers.location import LocationController
+        location, _ = LocationController.get_driver_location(plan["driver_id"])
+        start = parse_coordinates(location["current_location"]) if location else None
+        return ScheduleController._walk_from(plan, start), message
+
+    @staticmethod
+    def get_route_plan(schedule_id):
+        """The schedule's start-free route plan, cached until its confirmed stops change"""
+        schedule = ScheduleController.get_schedule_by_id(schedule_id, with_related=True)
+        if not schedule:
+            return None, "Schedule not found"
+        stops = sorted(
+            (s for s in schedule.stop_requests if s.status == StopRequestStatus.CONFIRMED), key=lambda s: s.id
+        )
+        places = GeocodingController.locate_many({s.resident.home_address for s in stops}, store=False)
+        located = [(s, places[s.resident.home_address]) for s in stops]
+        stops_key = tuple((s.id, place) for s, place in located)
+        plan = get_route_cache(current_app).get(
+            schedule.id, stops_key, lambda: ScheduleController._plan_route(schedule, located)
+        )
+        return plan, f"Route with {len(plan['stops'])} stops planned"
+
+    @staticmethod
+    def _walk_from(plan, start):
+        """A copy of a cached plan walked from start (lat, lon) or from its first stop when None"""
+        flip, legs = walk_from(start, [s["lat"] for s in plan["stops"]], [s["lon"] for s in plan["stops"]])
+        stops = plan["stops"][::-1] if flip else plan["stops"]
+        walked, cumulative = [], 0.0
+        for stop, leg in zip(stops, legs):
+            cumulative += leg
+            walked.append(dict(stop, leg_km=round(leg, 3), cumulative_km=round(cumulative, 3)))
+        return dict(
+            plan, stops=walked, total_km=round(cumulative, 3),
+            start={"lat": start[0], "lon": start[1]} if start else None
+        )
+
+    @staticmethod
+    def _plan_route(schedule, stops):
+        """Plan a start-free visiting order through [(stop, (lat, lon) or None)]"""
+        located = [(stop, place) for stop, place in stops if place]
+        unlocated = [(stop, place) for stop, place in stops if not place]
+
+        order, _, converged = plan_route(
+            None, [c for _, c in located], current_app.config["ROUTE_PLAN_TIME_BUDGET"]
+        )
+        planned = []
+        for index in order:
+            stop, (lat, lon) = located[index]
+            planned.append({
+                "stop_request_id": stop.id,
+                "resident_id": stop.resident_id,
+                "resident_name": stop.resident.name,
+                "home_address": stop.resident.home_address,
+                "lat": lat,
+                "lon": lon
+            })
+        return {
+            "schedule_id": schedule.id,
+            "driver_id": schedule.driver_id,
+            "optimal_within_budget": converged,
+            "planned_at": datetime.utcnow().isoformat(),
+            "stops": planned,
+            "unlocated": [
+                {"stop_request_id": stop.id, "resident_id": stop.resident_id, "home_address": stop.resident.home_address}
+                for stop, _ in unlocated
+            ]
+        }
@@ -0,0 +1,105 @@
+from App.database import db
+from App.controllers.relay import get_relay
+from App.controllers.serialization import schedule_rows, schedule_json, schedules as schedule_table
+from bisect import bisect_left
+from datetime import datetime
+from threading import Lock
+import time
+
+RELAY_CHANNEL = "upcoming-schedules-invalidate"
+
+
+def load_upcoming(now):
+    """Every schedule starting at or after now, as (start times, get_json() dicts) sorted by start"""
+    stmt = schedule_rows().where(schedule_table.c.scheduled_start_time >= now).order_by(
+        schedule_table.c.scheduled_start_time, schedule_table.c.id
+    )
+    rows = db.session.execute(stmt).all()
+    return [row[3] for row in rows], tuple(schedule_json(row) for row in rows)
+
+
+class UpcomingScheduleCache:
+    """
+    Sorted upcoming schedules, kept until a write invalidates them.
+
+    The only other way the result changes is a schedule's start time
+    passing, and those always drop off the head of the list: once the
+    head's start time (next_expiry) has passed, the expired prefix is cut
+    with a bisect over the start times instead of re-querying. ttl bounds
+    how long changes made outside ScheduleController can go unnoticed.
+    """
+
+    def __init__(self, relay, ttl=60.0):
+        self.relay = relay
+        self.ttl = ttl
+        self.starts = []
+        self.items = None        # tuple of schedule dicts, None when not loaded
+        self.next_expiry = None
+        self.loaded_at = 0.0
+        self.invalidations = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.loads = 0
+        self.trims = 0
+        relay.subscribe(RELAY_CHANNEL, self._drop)
+
+    def get(self, load=load_upcoming, limit=None):
+        """
+        The first limit (default all) upcoming schedules, earliest first, as
+        fresh dicts the caller may change without touching the cached ones.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative")
+        items = self._current(load)
+        return [dict(item) for item in (items[:limit] if limit else items)]
+
+    def _current(self, load):
+        now = datetime.utcnow()
+        with self.lock:
+            if self.items is not None and time.monotonic() - self.loaded_at < self.ttl:
+                if self.next_expiry is not None and now > self.next_expiry:
+                    self._trim(now)
+                self.hits += 1
+                return self.items
+            invalidations = self.invalidations
+        loaded_at = time.monotonic()
+        starts, items = load(now)
+        with self.lock:
+            self.loads += 1
+            if self.invalidations == invalidations:
+                self.starts, self.items, self.loaded_at = starts, items, loaded_at
+                self.next_expiry = starts[0] if starts else None
+        return items
+
+    def invalidate(self):
+        """Drop the cached list in this worker and every other one"""
+        self.relay.publish(RELAY_CHANNEL, {})
+
+    def _trim(self, now):
+        # Same boundary as the query: schedules starting exactly now are still upcoming
+        cut = bisect_left(self.starts, now)
+        self.starts, self.items = self.starts[cut:], self.items[cut:]
+        self.next_expiry = self.starts[0] if self.starts else None
+        self.trims += 1
+
+    def _drop(self, message):
+        with self.lock:
+            self.items = None
+            self.invalidations += 1
+
+    def stats(self):
+        return {
+            "size": len(self.items) if self.items is not None else 0,
+            "hits": self.hits,
+            "loads": self.loads,
+            "trims": self.trims,
+            "invalidations": self.invalidations
+        }
+
+
+def get_upcoming_cache(app):
+    cache = app.extensions.get("upcoming_schedules")
+    if cache is None:
+        cache = UpcomingScheduleCache(get_relay(app), app.config["UPCOMING_SCHEDULES_TTL"])
+        app.extensions["upcoming_schedules"] = cache
+    return cache
@@ -0,0 +1,80 @@
+from App.models import DriverSchedule
+from App.database import db
+from bisect import bisect_left
+from collections import defaultdict
+
+# Schedules are half-open [start, end): one may start exactly when another ends.
+#
+# A driver's accepted schedules never overlap, so ordered by start they are
+# ordered by end too, and the only one that can overlap [start, end) is the
+# last one starting before end. Both checks below are one seek for it.
+
+interval_columns = (DriverSchedule.id, DriverSchedule.scheduled_start_time, DriverSchedule.scheduled_end_time)
+
+
+def find_conflict(driver_id, start, end):
+    """(start, end, label) of the driver's stored schedule overlapping [start, end), or None"""
+    # Walks ix_driver_schedule_driver_start_end backwards from end, one row
+    stmt = db.select(*interval_columns).where(
+        DriverSchedule.driver_id == driver_id,
+        DriverSchedule.scheduled_start_time < end
+    ).order_by(DriverSchedule.scheduled_start_time.desc()).limit(1)
+    row = db.session.execute(stmt).first()
+    if row is None or row.scheduled_end_time <= start:
+        return None
+    return row.scheduled_start_time, row.scheduled_end_time, f"schedule {row.id}"
+
+
+def describe_conflict(conflict):
+    start, end, label = conflict
+    return f"Overlaps {label} ({start.isoformat()} to {end.isoformat()})"
+
+
+class IntervalIndex:
+    """
+    Per-driver sorted [start, end) intervals for checking many proposed
+    schedules in memory, O(log n) per check.
+
+    load() pulls in only the stored schedules that can conflict with a
+    batch: those starting inside the batch's window plus the one right
+    before it. Accepted proposals are add()ed so later ones in the same
+    batch are checked against them too.
+    """
+
+    def __init__(self):
+        self.starts = defaultdict(list)
+        self.intervals = defaultdict(list)  # (start, end, label), parallel to starts
+
+    def load(self, proposals):
+        """Load stored schedules that may overlap any (driver_id, start, end) in proposals"""
+        windows = {}
+        for driver_id, start, end in proposals:
+            low, high = windows.get(driver_id, (start, end))
+            windows[driver_id] = (min(low, start), max(high, end))
+        for driver_id, (low, high) in windows.items():
+            rows = db.session.execute(db.select(*interval_columns).where(
+                DriverSchedule.driver_id == driver_id,
+                DriverSchedule.scheduled_start_time >= low,
+                DriverSchedule.scheduled_start_time < high
+            )).all()
+            previous = db.session.execute(db.select(*interval_columns).where(
+                DriverSchedule.driver_id == driver_id,
+                DriverSchedule.scheduled_start_time < low
+            ).order_by(DriverSchedule.scheduled_start_time.desc()).limit(1)).first()
+            for schedule_id, start, end in rows + ([previous] if previous else []):
+                self.add(driver_id, start, end, f"schedule {schedule_id}")
+
+    def conflict(self, driver_id, start, end):
+        """(start, end, label) overlapping [start, end) for the driver, or None"""
+        i = bisect_left(self.starts[driver_id], end) - 1
+        if i >= 0 and self.intervals[driver_id][i][1] > start:
+            return self.intervals[driver_id][i]
+        return None
+
+    def add(self, driver_id, start, end, label):
+        starts = self.starts[driver_id]
+        i = bisect_left(starts, start)
+        if i < len(starts) and starts[i] == start:
+            return  # already loaded, e.g. inserted by an earlier import chunk
+        starts.insert(i, start)
+        self.intervals[driver_id].insert(i, (start, end, label))
@@ -0,0 +1,109 @@
+from App.models import User, Resident, Driver, DriverStatus, UserType, DriverSchedule, StopRequest, StopRequestStatus
+from App.database import db
+from App.hashing import get_hasher
+from App.controllers.street import StreetController
+from App.controllers.schedule_cache import get_upcoming_cache
+from App.controllers.eta import get_eta_board
+from datetime import datetime, timedelta
+from flask import current_app
+import random
+
+STREET_WORDS = ("Main", "Oak", "Maple", "Cedar", "Elm", "Pine", "Birch", "Church", "Hill", "Park",
+                "River", "Lake", "Mill", "School", "Station", "Orange", "Coconut", "Mango", "Palm", "Bay")
+STREET_SUFFIXES = ("Street", "Avenue", "Road", "Drive", "Lane", "Court")
+STATUS_WEIGHTS = ((StopRequestStatus.REQUESTED, 5), (StopRequestStatus.CONFIRMED, 3),
+                  (StopRequestStatus.REJECTED, 1), (StopRequestStatus.COMPLETED, 1))
+
+user_table = User.__table__
+
+
+class SeedController:
+    @staticmethod
+    def seed(drivers=10, residents=100, schedules=100, requests=500, password="password",
+             chunk_size=5000, seed=None):
+        """Bulk insert synthetic drivers, residents, schedules and stop requests"""
+        rng = random.Random(seed)
+        try:
+            # One hash shared by every seeded user: hashing each would dominate the run
+            password_hash = get_hasher().hash(password)
+            base = db.session.execute(db.select(db.func.max(User.id))).scalar() or 0
+            streets = sorted({f"{rng.choice(STREET_WORDS)} {rng.choice(STREET_SUFFIXES)}" for _ in range(60)})
+            driver_ids = SeedController._insert_users(
+                Driver, UserType.DRIVER, drivers, base, password_hash, chunk_size,
+                lambda n: {"vehicle_type": "Bread Van", "license_plate": f"SEED{n}", "current_status": DriverStatus.AVAILABLE}
+            )
+            resident_ids = SeedController._insert_users(
+                Resident, UserType.RESIDENT, residents, base + drivers, password_hash, chunk_size,
+                lambda n: {"home_address": f"{rng.randint(1, 400)} {rng.choice(streets)}"}
+            )
+
+            schedule_ids = []
+            if schedules and driver_ids:
+                street_ids = StreetController.resolve_street_ids(streets)
+                # Each driver's schedules are back to back 4 hour slots, so none of them overlap
+                day_start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+                rows = []
+                for n in range(schedules):
+                    street = rng.choice(streets)
+                    start = day_start + timedelta(hours=4 * (n // len(driver_ids)))
+                    rows.append({
+                        "driver_id": driver_ids[n % len(driver_ids)],
+                        "street": street,
+                        "street_id": street_ids[street],
+                        "scheduled_start_time": start,
+                        "scheduled_end_time": start + timedelta(hours=rng.choice((1, 2, 3)))
+                    })
+                schedule_ids = SeedController._insert_returning(DriverSchedule.__table__, rows, chunk_size)
+
+            requests = min(requests, len(resident_ids) * len(schedule_ids))
+            pairs = set()
+            while len(pairs) < requests:
+                pairs.add((rng.choice(resident_ids), rng.choice(schedule_ids)))
+            statuses, weights = zip(*STATUS_WEIGHTS)
+            now = datetime.utcnow()
+            rows = [
+                {"resident_id": r, "schedule_id": s, "request_time": now, "status": rng.choices(statuses, weights)[0]}
+                for r, s in sorted(pairs)
+            ]
+            for i in range(0, len(rows), chunk_size):
+                db.session.execute(db.insert(StopRequest), rows[i:i + chunk_size])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error seeding data: {str(e)}"
+
+        StreetController.get_index().refresh(force=True)
+        get_upcoming_cache(current_app).invalidate()
+        # Like create_schedule: a driver remembered as off duty may now have a running schedule
+        get_eta_board(current_app).forget_drivers(driver_ids)
+        counts = {
+            "drivers": len(driver_ids), "residents": len(resident_ids),
+            "schedules": len(schedule_ids), "requests": len(rows)
+        }
+        message = "Seeded {drivers} drivers, {residents} residents, {schedules} schedules and {requests} stop requests"
+        return counts, message.format(**counts)
+
+    @staticmethod
+    def _insert_users(model, user_type, count, base, password_hash, chunk_size, subtype_values):
+        """Insert count users of one type into the base and subtype tables; returns their ids"""
+        label = user_type.value
+        rows = [
+            {"username": f"seed_{label}{base + n}", "password": password_hash,
+             "email": f"seed_{label}{base + n}@example.com", "name": f"Seed {label.title()} {base + n}",
+             "user_type": user_type}
+            for n in range(1, count + 1)
+        ]
+        ids = SeedController._insert_returning(user_table, rows, chunk_size)
+        subtype_rows = [dict(subtype_values(base + n), id=user_id) for n, user_id in enumerate(ids, 1)]
+        for i in range(0, len(subtype_rows), chunk_size):
+            db.session.execute(db.insert(model.__table__), subtype_rows[i:i + chunk_size])
+        return ids
+
+    @staticmethod
+    def _insert_returning(table, rows, chunk_size):
+        """executemany INSERT ... RETURNING id, ids in the same order as rows"""
+        ids = []
+        for i in range(0, len(rows), chunk_size):
+            stmt = db.insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            ids.extend(db.session.execute(stmt, rows[i:i + chunk_size]).scalars())
+        return ids
@@ -0,0 +1,99 @@
+from App.models import User, Resident, Driver, UserType, DriverSchedule, StopRequest
+from App.database import db
+
+# Read-only projections for list endpoints: select just the columns get_json()
+# needs as plain row tuples and build the dicts directly, skipping ORM
+# hydration (identity map, instance state, per-row lazy loads of subclass
+# tables). Every *_json(row) below must stay identical to the model's get_json().
+
+users = User.__table__
+residents = Resident.__table__
+drivers = Driver.__table__
+schedules = DriverSchedule.__table__
+stop_requests = StopRequest.__table__
+
+
+def user_rows(user_type=None):
+    """Select for users (optionally one subtype) with the subtype columns joined in"""
+    home_address = residents.c.home_address
+    driver_columns = [
+        drivers.c.vehicle_type, drivers.c.license_plate, drivers.c.current_status,
+        drivers.c.current_location, drivers.c.location_updated_at
+    ]
+    if user_type == UserType.RESIDENT:
+        source = users.join(residents, residents.c.id == users.c.id)
+        driver_columns = [db.null().label(c.name) for c in driver_columns]
+    elif user_type == UserType.DRIVER:
+        source = users.join(drivers, drivers.c.id == users.c.id)
+        home_address = db.null().label(home_address.name)
+    else:
+        source = (
+            users.outerjoin(residents, residents.c.id == users.c.id)
+            .outerjoin(drivers, drivers.c.id == users.c.id)
+        )
+    return db.select(
+        users.c.id, users.c.username, users.c.email, users.c.name, users.c.user_type,
+        home_address, *driver_columns
+    ).select_from(source)
+
+
+def user_json(row):
+    user_type = row[4]
+    data = {
+        "id": row[0],
+        "username": row[1],
+        "email": row[2],
+        "name": row[3],
+        "user_type": user_type.value
+    }
+    if user_type is UserType.RESIDENT:
+        data["home_address"] = row[5]
+    elif user_type is UserType.DRIVER:
+        data["vehicle_type"] = row[6]
+        data["license_plate"] = row[7]
+        data["current_status"] = row[8].value if row[8] else None
+        data["current_location"] = row[9]
+        data["location_updated_at"] = row[10].isoformat() if row[10] else None
+    return data
+
+
+def schedule_rows(driver_id=None):
+    stmt = db.select(
+        schedules.c.id, schedules.c.driver_id, schedules.c.street,
+        schedules.c.scheduled_start_time, schedules.c.scheduled_end_time
+    )
+    if driver_id is not None:
+        stmt = stmt.where(schedules.c.driver_id == driver_id)
+    return stmt
+
+
+def schedule_json(row):
+    return {
+        "id": row[0],
+        "driver_id": row[1],
+        "street": row[2],
+        "scheduled_start_time": row[3].isoformat(),
+        "scheduled_end_time": row[4].isoformat()
+    }
+
+
+def stop_request_rows(schedule_id=None, resident_id=None):
+    stmt = db.select(
+        stop_requests.c.id, stop_requests.c.resident_id, stop_requests.c.schedule_id,
+        stop_requests.c.request_time, stop_requests.c.status
+    )
+    if schedule_id is not None:
+        stmt = stmt.where(stop_requests.c.schedule_id == schedule_id)
+    if resident_id is not None:
+        stmt = stmt.where(stop_requests.c.resident_id == resident_id)
+    return stmt
+
+
+def stop_request_json(row):
+    return {
+        "id": row[0],
+        "resident_id": row[1],
+        "schedule_id": row[2],
+        "request_time": row[3].isoformat(),
+        "status": row[4].value
+    }
@@ -1,6 +1,19 @@
-from App.models import StopRequest, StopRequestStatus, DriverSchedule
-from App.database import db
+from App.models import StopRequest, StopRequestStatus, DriverSchedule, ALLOWED_STATUS_TRANSITIONS
+from App.database import db, violated_constraint
+from App.controllers.pagination import keyset_page, stream_all
+from App.controllers.serialization import stop_request_rows, stop_request_json, stop_requests as stop_request_table
+from App.controllers.eta import get_eta_board
+from App.controllers.outbox import emit
 from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+# Loader options for with_related=True: resident, schedule and its driver in the same query
+STOP_REQUEST_RELATED = (
+    joinedload(StopRequest.resident),
+    joinedload(StopRequest.schedule).joinedload(DriverSchedule.driver),
+)
 
 class StopRequestController:
     @staticmethod
@@ -23,34 +36,84 @@ class StopRequestController:
             if time_until_departure < timedelta(hours=1):
                 return None, "Stop requests must be made at least 1 hour before departure"
             
-            # Check if resident already has a request for this schedule
-            existing_request = StopRequest.query.filter_by(
-                resident_id=resident_id, 
-                schedule_id=schedule_id
-            ).first()
-            
-            if existing_request:
-                return None, "Stop request already exists for this schedule"
-            
+            # One request per resident per schedule is enforced by
+            # uq_stop_request_resident_schedule, so concurrent workers can't race a pre-check
             stop_request = StopRequest(resident_id, schedule_id)
             db.session.add(stop_request)
+            db.session.flush()
+            emit("stop_request.created", {
+                "id": stop_request.id, "resident_id": resident_id, "schedule_id": schedule_id
+            })
             db.session.commit()
             
             return stop_request, "Stop request created successfully"
             
+        except IntegrityError as e:
+            db.session.rollback()
+            kind, constraint = violated_constraint(
+                e, unique_columns=("stop_request.resident_id", "stop_request.schedule_id")
+            )
+            if kind == "unique" and constraint in (None, "uq_stop_request_resident_schedule"):
+                return None, "Stop request already exists for this schedule"
+            if kind == "foreign_key":
+                # Removed between the lookups above and the insert
+                return None, "Schedule or resident no longer exists"
+            return None, f"Error creating stop request: {str(e.orig)}"
         except Exception as e:
             db.session.rollback()
             return None, f"Error creating stop request: {str(e)}"
 
     @staticmethod
-    def get_stop_requests_by_resident(resident_id):
+    def get_stop_requests_by_resident(resident_id, with_related=False):
         """Get all stop requests for a resident"""
-        return StopRequest.query.filter_by(resident_id=resident_id).all()
+        query = StopRequestController._related(StopRequest.query, with_related)
+        return query.filter_by(resident_id=resident_id).all()
 
     @staticmethod
-    def get_stop_requests_by_schedule(schedule_id):
+    def get_stop_requests_by_schedule(schedule_id, with_related=False):
         """Get all stop requests for a schedule"""
-        return StopRequest.query.filter_by(schedule_id=schedule_id).all()
+        query = StopRequestController._related(StopRequest.query, with_related)
+        return query.filter_by(schedule_id=schedule_id).all()
+
+    @staticmethod
+    def get_stop_requests_page(after_id=None, limit=None, schedule_id=None, resident_id=None, with_related=False):
+        """Get one keyset page of stop requests and the next cursor"""
+        stmt = StopRequestController._stop_requests_query(schedule_id, resident_id)
+        return keyset_page(StopRequestController._related(stmt, with_related), StopRequest.id, after_id, limit)
+
+    @staticmethod
+    def stream_stop_requests(schedule_id=None, resident_id=None, with_related=False):
+        """Iterate over every stop request in id order without loading them all at once"""
+        stmt = StopRequestController._stop_requests_query(schedule_id, resident_id)
+        return stream_all(StopRequestController._related(stmt, with_related), StopRequest.id)
+
+    @staticmethod
+    def get_stop_requests_json_page(after_id=None, limit=None, schedule_id=None, resident_id=None):
+        """Same page as get_stop_requests_page, serialized straight from projected columns"""
+        stmt = stop_request_rows(schedule_id, resident_id)
+        rows, next_after_id = keyset_page(stmt, stop_request_table.c.id, after_id, limit, scalars=False)
+        return [stop_request_json(row) for row in rows], next_after_id
+
+    @staticmethod
+    def stream_stop_requests_json(schedule_id=None, resident_id=None):
+        """Stream get_json() dicts for every stop request without hydrating ORM objects"""
+        stmt = stop_request_rows(schedule_id, resident_id)
+        for row in stream_all(stmt, stop_request_table.c.id, scalars=False):
+            yield stop_request_json(row)
+
+    @staticmethod
+    def _related(query, with_related):
+        """Add the eager-loading options for the resident, schedule and driver when asked to"""
+        return query.options(*STOP_REQUEST_RELATED) if with_related else query
+
+    @staticmethod
+    def _stop_requests_query(schedule_id=None, resident_id=None):
+        stmt = db.select(StopRequest)
+        if schedule_id is not None:
+            stmt = stmt.where(StopRequest.schedule_id == schedule_id)
+        if resident_id is not None:
+            stmt = stmt.where(StopRequest.resident_id == resident_id)
+        return stmt
 
     @staticmethod
     def update_stop_request_status(request_id, status):
@@ -61,9 +124,146 @@ class StopRequestController:
                 return None, "Stop request not found"
             
             stop_request.status = status
+            emit("stop_request.status_changed", {"ids": [stop_request.id], "status": StopRequestStatus(status).value})
             db.session.commit()
+            get_eta_board(current_app).forget([stop_request.schedule_id])
             return stop_request, "Stop request status updated successfully"
             
         except Exception as e:
             db.session.rollback()
-            return None, f"Error updating stop request: {str(e)}"
\ No newline at end of file
+            return None, f"Error updating stop request: {str(e)}"
+
+    @staticmethod
+    def update_stop_request_statuses(status, request_ids=None, schedule_id=None, from_status=None, driver_id=None):
+        """Move many stop requests to a status with one set-based UPDATE.
+
+        Targets either explicit request_ids or every request on schedule_id
+        (optionally only those currently in from_status). Only rows whose
+        current status may transition to the target are touched; driver_id
+        restricts the update to that driver's schedules. Returns a list of
+        {id, outcome, status} dicts where outcome is "updated",
+        "invalid_transition" or "not_found".
+        """
+        if request_ids is None and schedule_id is None:
+            return None, "Either request ids or a schedule id is required"
+        try:
+            status = StopRequestStatus(status)
+            from_status = StopRequestStatus(from_status) if from_status else None
+        except ValueError as e:
+            return None, str(e)
+
+        sources = ALLOWED_STATUS_TRANSITIONS[status]
+        scope = []
+        if request_ids is not None:
+            # 1.5, "2" or true are mistakes, not ids to round or coerce
+            if not isinstance(request_ids, (list, tuple, set)) or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in request_ids
+            ):
+                return None, "Stop request ids must be integers"
+            request_ids = sorted(set(request_ids))
+            if not request_ids:
+                return [], "No stop requests given"
+            scope.append(StopRequest.id.in_(request_ids))
+        if schedule_id is not None:
+            scope.append(StopRequest.schedule_id == schedule_id)
+        if driver_id is not None:
+            scope.append(StopRequest.schedule_id.in_(
+                db.select(DriverSchedule.id).where(DriverSchedule.driver_id == driver_id)
+            ))
+        # from_status narrows what is moved; explicit ids in another status still count as found
+        moving = scope + [StopRequest.status == from_status] if from_status else scope
+        reported = scope if request_ids is not None else moving
+
+        try:
+            updated = set()
+            if sources:
+                stmt = (
+                    db.update(StopRequest)
+                    .where(*moving, StopRequest.status.in_(sources))
+                    .values(status=status)
+                    .execution_options(synchronize_session=False)
+                )
+                if db.engine.dialect.update_returning:
+                    updated = set(db.session.execute(stmt.returning(StopRequest.id)).scalars())
+                else:
+                    # No UPDATE ... RETURNING (older SQLite): lock the matching ids first
+                    updated = set(db.session.execute(
+                        db.select(StopRequest.id)
+                        .where(*moving, StopRequest.status.in_(sources))
+                        .with_for_update()
+                    ).scalars())
+                    if updated:
+                        db.session.execute(stmt.where(StopRequest.id.in_(updated)))
+
+            # Classify everything in scope that was not moved
+            untouched = dict(db.session.execute(
+                db.select(StopRequest.id, StopRequest.status)
+                .where(*reported, StopRequest.id.notin_(updated) if updated else db.true())
+            ).all())
+            changed_schedules = []
+            if updated:
+                changed_schedules = [schedule_id] if schedule_id is not None else db.session.execute(
+                    db.select(StopRequest.schedule_id).where(StopRequest.id.in_(updated)).distinct()
+                ).scalars().all()
+                emit("stop_request.status_changed", {"ids": sorted(updated), "status": status.value})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error updating stop requests: {str(e)}"
+        get_eta_board(current_app).forget(changed_schedules)
+
+        outcomes = [{"id": i, "outcome": "updated", "status": status.value} for i in sorted(updated)]
+        for i, current in sorted(untouched.items()):
+            outcomes.append({"id": i, "outcome": "invalid_transition", "status": current.value})
+        for i in (request_ids or []):
+            if i not in updated and i not in untouched:
+                outcomes.append({"id": i, "outcome": "not_found", "status": None})
+        return outcomes, f"Updated {len(updated)} stop requests to {status.value}"
+
+    @staticmethod
+    def get_stop_eta(schedule_id, resident_id):
+        """When the van should reach a resident's confirmed stop, as of the driver's last ping"""
+        table = get_eta_board(current_app).table(schedule_id, StopRequestController._route_plan)
+        row = table["stops"].get(resident_id) if table else None
+        if row is None:
+            return None, "No ETA for this stop yet"
+        return StopRequestController._eta_json(schedule_id, resident_id, row, table), "ETA retrieved"
+
+    @staticmethod
+    def get_schedule_etas(schedule_id):
+        """ETAs of every confirmed stop on a running schedule, in visiting order"""
+        table = get_eta_board(current_app).table(schedule_id, StopRequestController._route_plan)
+        if table is None:
+            return None, "No ETAs for this schedule yet"
+        etas = sorted(
+            (StopRequestController._eta_json(schedule_id, resident_id, row, table)
+             for resident_id, row in table["stops"].items()),
+            key=lambda eta: eta["position"]
+        )
+        return {"driver_id": table["driver_id"], "stops": etas}, f"{len(etas)} ETAs retrieved"
+
+    @staticmethod
+    def _route_plan(schedule_id):
+        from App.controllers.schedule import ScheduleController
+        plan, _ = ScheduleController.get_route_plan(schedule_id)
+        return plan or {"stops": []}
+
+    @staticmethod
+    def _eta_json(schedule_id, resident_id, row, table):
+        return {
+            "schedule_id": schedule_id,
+            "resident_id": resident_id,
+            "stop_request_id": row["stop_request_id"],
+            "position": row["position"],
+            "distance_km": row["distance_km"],
+            "eta": datetime.utcfromtimestamp(row["eta"]).isoformat(),
+            "computed_at": datetime.utcfromtimestamp(table["computed_at"]).isoformat()
+        }
+
+
+# Keep the original functions for template compatibility
+def create_stop_request(resident_id, schedule_id):
+    return StopRequestController.create_stop_request(resident_id, schedule_id)
+
+def get_stop_requests_by_resident(resident_id):
+    return StopRequestController.get_stop_requests_by_resident(resident_id)
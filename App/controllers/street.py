@@ -0,0 +1,236 @@
+from App.models import Street
+from App.database import db
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from threading import Lock
+import time
+
+
+def trigrams(text):
+    """Padded character trigrams, pg_trgm style"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StreetIndex:
+    """
+    In-process search index over the street catalog.
+
+    Keeps a prefix trie over every word of every street name and an inverted
+    trigram index, so substring, prefix and fuzzy lookups never touch the
+    driver_schedule table. The catalog is loaded incrementally: refresh()
+    fetches streets above the highest id it has read, plus the ids below it
+    that were missing (created by another worker but not committed yet, or
+    committed out of order). Streets this worker adds itself don't move that
+    mark. Every reconcile_interval seconds the index is checked against the
+    whole catalog, so a street that fell through anyway is picked up.
+    """
+
+    # Ids skipped by one refresh that are tracked individually; larger jumps wait for reconcile
+    MAX_TRACKED_GAP = 10000
+
+    def __init__(self, refresh_interval=5.0, reconcile_interval=300.0):
+        self.refresh_interval = refresh_interval
+        self.reconcile_interval = reconcile_interval
+        self.names = {}          # street id -> normalized name
+        self.trie = {}           # char -> child node, ids stored under "$"
+        self.postings = {}       # trigram -> set of street ids
+        self.gram_counts = {}    # street id -> number of distinct trigrams
+        self.max_id = 0          # highest id read by refresh()
+        self.gaps = {}           # unseen id below max_id -> monotonic time it was first missed
+        self.last_refresh = 0.0
+        self.last_reconcile = time.monotonic()
+        self.lock = Lock()
+
+    def add(self, street_id, normalized_name):
+        """Index one street; safe to call again for an already indexed id"""
+        with self.lock:
+            if street_id in self.names:
+                return
+            self.names[street_id] = normalized_name
+            for word in set(normalized_name.split()):
+                node = self.trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                node.setdefault("$", set()).add(street_id)
+            grams = trigrams(normalized_name)
+            self.gram_counts[street_id] = len(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(street_id)
+
+    def refresh(self, force=False):
+        """Pull streets created since the last refresh (possibly by other workers)"""
+        now = time.monotonic()
+        if not force and now - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = now
+        if now - self.last_reconcile >= self.reconcile_interval:
+            self.reconcile()
+            return
+        new = Street.id > self.max_id
+        if self.gaps:
+            new = db.or_(new, Street.id.in_(list(self.gaps)))
+        rows = db.session.execute(
+            db.select(Street.id, Street.normalized_name).where(new).order_by(Street.id)
+        ).all()
+        for street_id, normalized_name in rows:
+            self.add(street_id, normalized_name)
+            self.gaps.pop(street_id, None)
+        top = rows[-1][0] if rows else self.max_id
+        if top - self.max_id <= self.MAX_TRACKED_GAP:
+            for street_id in range(self.max_id + 1, top):
+                if street_id not in self.names:
+                    self.gaps[street_id] = now
+        # A gap never filled was most likely a rolled back insert
+        for street_id in [i for i, missed in self.gaps.items() if now - missed > self.reconcile_interval]:
+            del self.gaps[street_id]
+        self.max_id = max(self.max_id, top)
+
+    def reconcile(self):
+        """Index every catalog street this worker doesn't have yet"""
+        self.last_reconcile = time.monotonic()
+        ids = set(db.session.execute(db.select(Street.id)).scalars())
+        with self.lock:
+            missing = sorted(ids - set(self.names))
+        for start in range(0, len(missing), 500):
+            rows = db.session.execute(
+                db.select(Street.id, Street.normalized_name).where(Street.id.in_(missing[start:start + 500]))
+            ).all()
+            for street_id, normalized_name in rows:
+                self.add(street_id, normalized_name)
+        self.gaps.clear()
+        self.max_id = max(ids, default=self.max_id)
+
+    def prefix(self, query, limit=None):
+        """Street ids with a word starting with the (normalized) query's last word,
+        and containing every earlier query word"""
+        words = Street.normalize(query).split()
+        if not words:
+            return []
+        node = self.trie
+        for char in words[-1]:
+            node = node.get(char)
+            if node is None:
+                return []
+        matches = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == "$":
+                    matches.update(child)
+                else:
+                    stack.append(child)
+        if len(words) > 1:
+            matches = {i for i in matches if all(w in self.names[i].split() for w in words[:-1])}
+        return sorted(matches)[:limit]
+
+    def search(self, query):
+        """Street ids whose normalized name contains the normalized query"""
+        normalized = Street.normalize(query)
+        if not normalized:
+            return []
+        if len(normalized) < 3:
+            # Too short for a trigram; the catalog is small enough to walk
+            return sorted(i for i, name in self.names.items() if normalized in name)
+        # Inner trigrams only: the padded edge trigrams need not occur in a longer name
+        grams = {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            ids = self.postings.get(gram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        return sorted(i for i in candidates if normalized in self.names[i])
+
+    def fuzzy(self, query, limit=5, threshold=0.3):
+        """Street ids ranked by trigram similarity to the query"""
+        grams = trigrams(Street.normalize(query))
+        shared = {}
+        for gram in grams:
+            for street_id in self.postings.get(gram, ()):
+                shared[street_id] = shared.get(street_id, 0) + 1
+        scored = []
+        for street_id, count in shared.items():
+            similarity = count / (len(grams) + self.gram_counts[street_id] - count)
+            if similarity >= threshold:
+                scored.append((similarity, street_id))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [street_id for _, street_id in scored[:limit]]
+
+
+class StreetController:
+    @staticmethod
+    def get_index():
+        """Get this app's street index, loading it on first use"""
+        index = current_app.extensions.get("street_index")
+        if index is None:
+            index = StreetIndex(
+                current_app.config["STREET_INDEX_REFRESH_SECONDS"], current_app.config["STREET_INDEX_RECONCILE_SECONDS"]
+            )
+            current_app.extensions["street_index"] = index
+        index.refresh()
+        return index
+
+    @staticmethod
+    def get_or_create_street(name):
+        """Get the catalog entry for a street name, creating it if needed (no commit)"""
+        normalized_name = Street.normalize(name)
+        street = Street.query.filter_by(normalized_name=normalized_name).first()
+        if street:
+            return street
+        try:
+            # Savepoint so losing a creation race to another worker keeps the outer transaction
+            with db.session.begin_nested():
+                street = Street(name)
+                db.session.add(street)
+            return street
+        except IntegrityError:
+            return Street.query.filter_by(normalized_name=normalized_name).one()
+
+    @staticmethod
+    def resolve_street_ids(names):
+        """Map street names to catalog ids in bulk, inserting missing streets (no commit)"""
+        by_normalized = {}
+        for name in names:
+            by_normalized.setdefault(Street.normalize(name), name)
+        rows = db.session.execute(
+            db.select(Street.normalized_name, Street.id)
+            .where(Street.normalized_name.in_(by_normalized))
+        ).all()
+        ids = dict(rows)
+        missing = [n for n in by_normalized if n not in ids]
+        if missing:
+            db.session.execute(
+                db.insert(Street),
+                [{"name": by_normalized[n].strip(), "normalized_name": n} for n in missing]
+            )
+            ids.update(db.session.execute(
+                db.select(Street.normalized_name, Street.id)
+                .where(Street.normalized_name.in_(missing))
+            ).all())
+        return {name: ids[Street.normalize(name)] for name in names}
+
+    @staticmethod
+    def index_street(street):
+        """Add a newly committed street to this worker's index"""
+        StreetController.get_index().add(street.id, street.normalized_name)
+
+    @staticmethod
+    def search_street_ids(query):
+        """Ids of streets whose name contains the query"""
+        return StreetController.get_index().search(query)
+
+    @staticmethod
+    def search_streets(query, limit=10, fuzzy=True):
+        """Streets matching the query by prefix, falling back to fuzzy matches"""
+        index = StreetController.get_index()
+        ids = index.prefix(query, limit)
+        if not ids and fuzzy:
+            ids = index.fuzzy(query, limit)
+        if not ids:
+            return []
+        streets = {s.id: s for s in Street.query.filter(Street.id.in_(ids)).all()}
+        return [streets[i] for i in ids if i in streets]
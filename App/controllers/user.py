@@ -1,6 +1,36 @@
 from App.models import User, Resident, Driver, UserType
 from App.database import db
+from App.controllers.pagination import keyset_page, stream_all
+from App.controllers.serialization import user_rows, user_json, users as user_table
+from App.controllers.auth import check_credentials
+from App.controllers.identity_cache import get_identity_cache
+from App.controllers.geocoder import get_geocode_queue
 from enum import Enum
+from flask import current_app
+from sqlalchemy.orm import selectin_polymorphic, with_polymorphic
+
+# Model to list for each user type filter (None lists every user)
+USER_MODELS = {None: User, UserType.RESIDENT: Resident, UserType.DRIVER: Driver}
+
+# How base User listings load subtype columns:
+#   "selectin" - one query for users, then one per subtype present
+#   "joined"   - a single query LEFT OUTER JOINed to every subtype table
+#   None       - base columns only; each subtype row lazy-loads its own (N+1)
+POLYMORPHIC_LOADING = ("selectin", "joined", None)
+
+
+def users_select(user_type=None, polymorphic="selectin"):
+    """Select for users of a type and the entity to order it by"""
+    model = USER_MODELS[user_type]
+    if model is not User or polymorphic is None:
+        # Resident/Driver selects already join their own table
+        return db.select(model), model
+    if polymorphic == "joined":
+        entity = with_polymorphic(User, [Resident, Driver])
+        return db.select(entity), entity
+    if polymorphic == "selectin":
+        return db.select(User).options(selectin_polymorphic(User, [Resident, Driver])), User
+    raise ValueError(f"polymorphic must be one of {POLYMORPHIC_LOADING}")
 
 class UserController:
     @staticmethod
@@ -21,12 +51,30 @@ class UserController:
             
             db.session.add(user)
             db.session.commit()
+            get_identity_cache(current_app).invalidate(user.id)
+            if user_type == UserType.RESIDENT:
+                get_geocode_queue(current_app).submit([user.home_address])
             return user, "User created successfully"
             
         except Exception as e:
             db.session.rollback()
             return None, f"Error creating user: {str(e)}"
 
+    @staticmethod
+    def update_home_address(user_id, home_address):
+        """Move a resident to a new home address and queue it for geocoding"""
+        try:
+            resident = db.session.get(Resident, user_id)
+            if not resident:
+                return None, "Resident not found"
+            resident.home_address = home_address
+            db.session.commit()
+            get_geocode_queue(current_app).submit([home_address])
+            return resident, "Home address updated"
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error updating home address: {str(e)}"
+
     @staticmethod
     def get_user_by_id(user_id):
         """Get user by ID"""
@@ -38,9 +86,10 @@ class UserController:
         return User.query.filter_by(username=username).first()
 
     @staticmethod
-    def get_all_users():
+    def get_all_users(polymorphic="selectin"):
         """Get all users"""
-        return User.query.all()
+        stmt, entity = users_select(polymorphic=polymorphic)
+        return db.session.execute(stmt.order_by(entity.id)).scalars().all()
 
     @staticmethod
     def get_all_residents():
@@ -52,13 +101,34 @@ class UserController:
         """Get all drivers - Bread Van App specific"""
         return Driver.query.all()
 
+    @staticmethod
+    def get_users_page(after_id=None, limit=None, user_type=None, polymorphic="selectin"):
+        """Get one keyset page of users (optionally only residents or drivers) and the next cursor"""
+        stmt, entity = users_select(user_type, polymorphic)
+        return keyset_page(stmt, entity.id, after_id, limit)
+
+    @staticmethod
+    def stream_users(user_type=None, polymorphic="selectin"):
+        """Iterate over every user in id order without loading them all at once"""
+        stmt, entity = users_select(user_type, polymorphic)
+        return stream_all(stmt, entity.id)
+
+    @staticmethod
+    def get_users_json_page(after_id=None, limit=None, user_type=None):
+        """Same page as get_users_page, serialized straight from projected columns"""
+        rows, next_after_id = keyset_page(user_rows(user_type), user_table.c.id, after_id, limit, scalars=False)
+        return [user_json(row) for row in rows], next_after_id
+
+    @staticmethod
+    def stream_users_json(user_type=None):
+        """Stream get_json() dicts for every user without hydrating ORM objects"""
+        for row in stream_all(user_rows(user_type), user_table.c.id, scalars=False):
+            yield user_json(row)
+
     @staticmethod
     def authenticate(username, password):
         """Authenticate user"""
-        user = UserController.get_user_by_username(username)
-        if user and user.check_password(password):
-            return user
-        return None
+        return check_credentials(username, password)
 
     # Keep existing template functions for compatibility
     @staticmethod
@@ -75,11 +145,8 @@ class UserController:
     @staticmethod
     def get_all_users_json():
         """Original template function"""
-        users = UserController.get_all_users()
-        if not users:
-            return []
-        users = [user.get_json() for user in users]
-        return users
+        rows = db.session.execute(user_rows().order_by(user_table.c.id))
+        return [user_json(row) for row in rows]
 
 # Keep the original functions for template compatibility
 def create_user(username, password):
@@ -102,6 +169,7 @@ def update_user(id, username):
     if user:
         user.username = username
         db.session.commit()
+        get_identity_cache(current_app).invalidate(user.id)
         return user
     return None
 
@@ -1,14 +1,93 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.engine import make_url
+import sys, weakref
 
 
 db = SQLAlchemy()
 
+# Every app bound to db in this process, so a forked worker can drop its inherited connections
+_apps = weakref.WeakSet()
+
 def get_migrate(app):
-    return Migrate(app, db)
+    return Migrate(app, db, render_as_batch=True)
 
 def create_db():
     db.create_all()
-    
+
 def init_db(app):
-    db.init_app(app)
\ No newline at end of file
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    _apps.add(app)
+
+def gevent_patched():
+    """True when gevent has monkey-patched this process (gunicorn's gevent workers do)"""
+    monkey = sys.modules.get("gevent.monkey")
+    return bool(monkey and monkey.is_module_patched("threading"))
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS from the SQLALCHEMY_POOL_* settings; options set
+    there explicitly win. SQLite keeps Flask-SQLAlchemy's own pool choice.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == "sqlite":
+        return options
+    options.setdefault('pool_size', config['SQLALCHEMY_POOL_SIZE'])
+    options.setdefault('max_overflow', config['SQLALCHEMY_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['SQLALCHEMY_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['SQLALCHEMY_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', config['SQLALCHEMY_POOL_PRE_PING'])
+    lifo = config['SQLALCHEMY_POOL_LIFO']
+    # The only gevent-specific pool setting: the standard QueuePool's checkout waits on patched locks and so
+    # only parks the greenlet; handing out the most recently used connection keeps the rest of the pool
+    # idle long enough for recycle to retire it
+    options.setdefault('pool_use_lifo', gevent_patched() if lifo is None else lifo)
+    timeout = config['SQLALCHEMY_STATEMENT_TIMEOUT']
+    if timeout and url.get_backend_name() == "postgresql":
+        connect_args = dict(options.get('connect_args') or {})
+        setting = f"-c statement_timeout={int(timeout * 1000)}"
+        connect_args['options'] = f"{connect_args['options']} {setting}" if connect_args.get('options') else setting
+        options['connect_args'] = connect_args
+    return options
+
+def dispose_engines():
+    """
+    Forget the connections inherited from the parent process, without closing them
+    (they are still the parent's); call this first thing in a forked worker.
+    """
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+def pool_stats(engine):
+    """Checkout counters of an engine's pool, as far as its pool class keeps them"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+def violated_constraint(error, unique_columns=()):
+    """
+    Classify an IntegrityError as "unique", "foreign_key" or "other". PostgreSQL
+    reports the SQLSTATE and constraint name, so a unique violation is returned
+    as ("unique", name). SQLite only lists the table.column pairs, so a unique
+    violation there counts as ("unique", None) if it covers every one of
+    unique_columns.
+    """
+    orig = getattr(error, "orig", error)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate is not None:
+        diag = getattr(orig, "diag", None)
+        kind = {"23505": "unique", "23503": "foreign_key"}.get(sqlstate, "other")
+        return kind, getattr(diag, "constraint_name", None)
+    message = str(orig)
+    if message.startswith("UNIQUE constraint failed") and all(column in message for column in unique_columns):
+        return "unique", None
+    if message.startswith("FOREIGN KEY constraint failed"):
+        return "foreign_key", None
+    return "other", None
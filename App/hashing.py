@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from werkzeug.security import check_password_hash, generate_password_hash
+import atexit, multiprocessing, os
+
+from flask import current_app, has_app_context
+
+from App.database import gevent_patched
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class PasswordHasher:
+    """
+    Password hashing off the request worker.
+
+    Hashes and checks run in a pool of `workers` processes so a burst of
+    logins uses spare cores instead of holding the GIL of the worker
+    serving them. Under gevent they run on gevent's native thread pool
+    instead: hashlib's scrypt and pbkdf2 release the GIL, and waiting on
+    its futures only parks the greenlet, where a process pool's helper
+    threads and pipes would be driven by the patched event loop. With
+    workers=0 the work runs inline. `method` is any werkzeug method
+    string, cost included (e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000").
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=2):
+        self.method = method
+        self.workers = workers
+        self.pool = None
+        self.pid = None
+        self.lock = Lock()
+        self._stored_method = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords across every pool process"""
+        pool = self._get_pool()
+        if pool is None:
+            return [generate_password_hash(password, self.method) for password in passwords]
+        methods = [self.method] * len(passwords)
+        return list(pool.map(generate_password_hash, passwords, methods, chunksize=8))
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with a different method or cost than configured"""
+        return pwhash.split("$", 1)[0] != self.stored_method
+
+    @property
+    def stored_method(self):
+        # werkzeug stores the method with its defaults filled in ("pbkdf2" -> "pbkdf2:sha256:<n>")
+        if self._stored_method is None:
+            self._stored_method = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._stored_method
+
+    def close(self):
+        if self.pool is not None and self.pid == os.getpid():
+            self.pool.shutdown(cancel_futures=True)
+        self.pool = self.pid = None
+
+    def _run(self, func, *args):
+        pool = self._get_pool()
+        if pool is None:
+            return func(*args)
+        return pool.submit(func, *args).result()
+
+    def _get_pool(self):
+        """This process's pool, created lazily so each forked worker gets its own"""
+        if not self.workers:
+            return None
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    if gevent_patched():
+                        from gevent.threadpool import ThreadPoolExecutor
+                        self.pool = ThreadPoolExecutor(self.workers)
+                    else:
+                        # spawn: children must not inherit the worker's sockets or threads
+                        self.pool = ProcessPoolExecutor(
+                            self.workers, mp_context=multiprocessing.get_context("spawn")
+                        )
+                    self.pid = os.getpid()
+        return self.pool
+
+
+inline_hasher = PasswordHasher(workers=0)
+
+
+def get_hasher(app=None):
+    """The app's hasher; outside an app context, an inline hasher with the default method"""
+    if app is None:
+        if not has_app_context():
+            return inline_hasher
+        app = current_app
+    hasher = app.extensions.get("password_hasher")
+    if hasher is None:
+        hasher = PasswordHasher(app.config["PASSWORD_HASH_METHOD"], app.config["PASSWORD_HASH_WORKERS"])
+        app.extensions["password_hasher"] = hasher
+        atexit.register(hasher.close)
+    return hasher
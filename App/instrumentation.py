@@ -0,0 +1,392 @@
+from flask import g, has_request_context, request, request_finished, request_started
+from sqlalchemy import event
+from threading import Event, Lock, Thread, local
+import atexit, fcntl, glob, hashlib, json, logging, os, re, time, weakref
+
+from App.database import db
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "breadvan_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+RETIRED_FILE = "retired.json"   # summed snapshots of workers that have exited
+
+# Every Metrics in this process that writes snapshots, so worker_exit can retire them
+_writers = weakref.WeakSet()
+
+COUNTERS = {
+    "requests_total": "Requests handled, by endpoint, method and status",
+    "request_sql_seconds_total": "Time spent in SQL while handling requests, by endpoint",
+    "sql_statements_total": "SQL statements executed (requests and background work)",
+    "sql_seconds_total": "Time spent executing SQL statements",
+    "slow_queries_total": "Statements slower than SQL_SLOW_QUERY_SECONDS, by statement fingerprint",
+    "outbox_messages_total": "Outbox messages handled by flask worker, by topic and outcome (delivered, retried, failed)",
+}
+HISTOGRAMS = {
+    "request_duration_seconds": ("Request latency, by endpoint and method", LATENCY_BUCKETS),
+    "request_sql_statements": ("SQL statements per request, by endpoint", STATEMENT_BUCKETS),
+    "pool_checkout_wait_seconds": ("Time waiting for a pooled connection, not counting opening new ones", WAIT_BUCKETS),
+    "outbox_delivery_seconds": ("Time running an outbox message's handler, by topic", LATENCY_BUCKETS),
+    "outbox_lag_seconds": ("Time from an outbox message's commit to its delivery, by topic", LAG_BUCKETS),
+}
+
+_quoted = re.compile(r"'(?:[^']|'')*'")
+_numbers = re.compile(r"\b\d+(?:\.\d+)?\b")
+_placeholders = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+")
+_value_lists = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_statement(statement):
+    """Statement text with literals, bind parameters and IN/VALUES lists collapsed to ?"""
+    sql = _quoted.sub("?", statement)
+    sql = _numbers.sub("?", sql)
+    sql = _placeholders.sub("?", sql)
+    sql = _value_lists.sub("(?+)", sql)
+    return _whitespace.sub(" ", sql).strip()
+
+
+def fingerprint(statement):
+    """Short stable id for every statement with the same normalized text"""
+    return hashlib.sha1(normalize_statement(statement).encode()).hexdigest()[:12]
+
+
+def label_string(**labels):
+    """Labels rendered the way they appear in the exposition, used as the series key"""
+    return ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in sorted(labels.items())
+    )
+
+
+class Metrics:
+    """
+    Per-process counters and histograms with Prometheus text exposition.
+
+    Values are keyed by metric name and a rendered label string. When
+    `directory` is set every worker periodically writes its snapshot there
+    and render() sums the snapshots of all workers, so any worker can
+    answer a scrape for the whole gunicorn server.
+
+    Snapshot files are named after the worker's pid and start time, so a
+    reused pid never overwrites a dead worker's counts. An exiting worker
+    folds its snapshot into retired.json (retire()), and render() does the
+    same for files left by workers that died without exiting cleanly.
+    """
+
+    def __init__(self, directory=None, write_interval=5.0):
+        self.directory = directory
+        self.write_interval = write_interval
+        self.counters = {name: {} for name in COUNTERS}
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+        self.pid = None
+        self.path = None
+
+    def inc(self, name, value=1, **labels):
+        key = label_string(**labels)
+        with self.lock:
+            series = self.counters[name]
+            series[key] = series.get(key, 0) + value
+        self.start()
+
+    def observe(self, name, value, **labels):
+        key = label_string(**labels)
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            series = self.histograms[name].get(key)
+            if series is None:
+                series = self.histograms[name][key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+        self.start()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({"counters": self.counters, "histograms": self.histograms}))
+
+    def render(self):
+        """Prometheus text format for this worker, or every worker when a directory is set"""
+        totals = self.snapshot()
+        if self.directory:
+            self.start()
+            self.write()
+            totals = {"counters": {name: {} for name in COUNTERS}, "histograms": {name: {} for name in HISTOGRAMS}}
+            with self._locked():
+                for path in self._worker_files():
+                    if not pid_running(worker_pid(path)):
+                        self._fold(path)
+                for path in self._worker_files() + [os.path.join(self.directory, RETIRED_FILE)]:
+                    try:
+                        with open(path) as f:
+                            merge(totals, json.load(f))
+                    except (OSError, ValueError):
+                        continue  # not written yet, or a worker is replacing its file
+        return exposition(totals)
+
+    def start(self):
+        """Start the snapshot writer (lazily, so it starts in each worker after the fork)"""
+        if not self.directory or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            self.path = os.path.join(self.directory, f"worker-{self.pid}-{time.time_ns()}.json")
+            # An earlier process with this pid is gone; keep its counts
+            with self._locked():
+                for path in self._worker_files():
+                    if worker_pid(path) == self.pid and path != self.path:
+                        self._fold(path)
+            self.stopped.clear()
+            self.thread = Thread(target=self._run, name="metrics-writer", daemon=True)
+            self.thread.start()
+            _writers.add(self)
+            atexit.register(self.retire)
+
+    def write(self):
+        """Atomically replace this worker's snapshot file"""
+        if not self.directory or self.pid != os.getpid():
+            return
+        try:
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError:
+            logger.exception("Could not write metrics to %s", self.path)
+
+    def retire(self):
+        """Write a final snapshot and fold it into the retired totals (the worker is exiting)"""
+        if not self.directory or self.pid != os.getpid():
+            return
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self.write()
+        with self._locked():
+            self._fold(self.path)
+        self.pid = None
+
+    def _worker_files(self):
+        return glob.glob(os.path.join(self.directory, "worker-*.json"))
+
+    def _locked(self):
+        """Exclusive lock on the directory, held while snapshot files are folded or read together"""
+        return DirectoryLock(os.path.join(self.directory, ".lock"))
+
+    def _fold(self, path):
+        """Add a worker's snapshot to retired.json and remove it; call with the lock held"""
+        if not os.path.exists(path):
+            return
+        retired = os.path.join(self.directory, RETIRED_FILE)
+        totals = {"counters": {}, "histograms": {}}
+        try:
+            for source in (retired, path):
+                if os.path.exists(source):
+                    with open(source) as f:
+                        merge(totals, json.load(f))
+            with open(retired + ".tmp", "w") as f:
+                json.dump(totals, f)
+            os.replace(retired + ".tmp", retired)
+            os.remove(path)
+        except (OSError, ValueError):
+            logger.exception("Could not retire metrics from %s", path)
+
+    def _run(self):
+        while not self.stopped.wait(self.write_interval):
+            self.write()
+
+
+class DirectoryLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def worker_pid(path):
+    """Pid from a worker-<pid>-<start>.json snapshot name"""
+    return int(os.path.basename(path).split("-")[1])
+
+
+def pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # someone else's process
+    return True
+
+
+def retire_metrics():
+    """Fold this worker's metrics into the retired totals; gunicorn's worker_exit hook calls this"""
+    for metrics in list(_writers):
+        metrics.retire()
+
+
+def merge(totals, snapshot):
+    for name, series in snapshot.get("counters", {}).items():
+        target = totals["counters"].setdefault(name, {})
+        for key, value in series.items():
+            target[key] = target.get(key, 0) + value
+    for name, series in snapshot.get("histograms", {}).items():
+        target = totals["histograms"].setdefault(name, {})
+        for key, value in series.items():
+            if key not in target:
+                target[key] = {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+                continue
+            merged = target[key]
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], value["buckets"])]
+            merged["sum"] += value["sum"]
+            merged["count"] += value["count"]
+
+
+def exposition(totals):
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} counter"]
+        for key, value in sorted(totals["counters"].get(name, {}).items()):
+            lines.append(f"{PREFIX}{name}{{{key}}} {value}" if key else f"{PREFIX}{name} {value}")
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} histogram"]
+        for key, series in sorted(totals["histograms"].get(name, {}).items()):
+            sep = "," if key else ""
+            for bound, count in zip(bounds, series["buckets"]):
+                lines.append(f'{PREFIX}{name}_bucket{{{key}{sep}le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}{name}_bucket{{{key}{sep}le="+Inf"}} {series["count"]}')
+            labels = f"{{{key}}}" if key else ""
+            lines.append(f"{PREFIX}{name}_sum{labels} {series['sum']}")
+            lines.append(f"{PREFIX}{name}_count{labels} {series['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def current_endpoint():
+    return (request.endpoint or "unmatched") if has_request_context() else None
+
+
+def instrument_engine(engine, metrics, slow_seconds):
+    """Count and time every statement on engine, and log the slow ones"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+        if context is not None:
+            context._metrics_timing = True
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if context is not None:
+            context._metrics_timing = False
+        metrics.inc("sql_statements_total")
+        metrics.inc("sql_seconds_total", elapsed)
+        endpoint = current_endpoint()
+        if endpoint is not None and "_metrics_sql" in g:
+            g._metrics_sql[0] += 1
+            g._metrics_sql[1] += elapsed
+        if elapsed >= slow_seconds:
+            fp = fingerprint(statement)
+            metrics.inc("slow_queries_total", fingerprint=fp)
+            logger.warning("Slow query %.3fs [%s] in %s: %s", elapsed, fp, endpoint or "background",
+                           normalize_statement(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # A statement that raised never reaches after_cursor_execute: drop its start time
+        execution = context.execution_context
+        if execution is not None and getattr(execution, "_metrics_timing", False):
+            execution._metrics_timing = False
+            context.connection.info["query_started"].pop()
+
+    # Seconds this thread (greenlet, under gevent) spent opening new DBAPI connections
+    opening = local()
+
+    @event.listens_for(engine, "do_connect")
+    def do_connect(dialect, connection_record, cargs, cparams):
+        opening.started = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        opening.seconds = getattr(opening, "seconds", 0.0) + time.perf_counter() - opening.started
+
+    instrument_pool(engine, metrics, opening)
+
+    @event.listens_for(engine, "engine_disposed")
+    def engine_disposed(engine):
+        instrument_pool(engine, metrics, opening)  # dispose() replaces the pool
+
+
+def instrument_pool(engine, metrics, opening):
+    """Time checkouts from engine's pool, less any time opening a connection, as the wait for one"""
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        opening.seconds = 0.0
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            waited = time.perf_counter() - started - opening.seconds
+            metrics.observe("pool_checkout_wait_seconds", max(waited, 0.0))
+
+    pool.connect = timed_connect
+
+
+def setup_instrumentation(app):
+    """Record request, SQL and pool metrics for app; see Metrics.render for /metrics"""
+    metrics = Metrics(app.config["METRICS_DIR"], app.config["METRICS_WRITE_INTERVAL"])
+    app.extensions["metrics"] = metrics
+    with app.app_context():
+        instrument_engine(db.engine, metrics, app.config["SQL_SLOW_QUERY_SECONDS"])
+
+    def started(sender, **extra):
+        g._metrics_started = time.perf_counter()
+        g._metrics_sql = [0, 0.0]
+
+    def finished(sender, response, **extra):
+        g._metrics_status = response.status_code
+
+    def torn_down(exc):
+        # Runs for every request, including ones whose exception escaped (no request_finished, so
+        # counted as 500s), and after a streamed body is sent, so its queries are counted too
+        if "_metrics_started" not in g:
+            return
+        status = g.pop("_metrics_status", 500) if exc is None else 500
+        endpoint = current_endpoint()
+        metrics.observe("request_duration_seconds", time.perf_counter() - g.pop("_metrics_started"),
+                        endpoint=endpoint, method=request.method)
+        metrics.inc("requests_total", endpoint=endpoint, method=request.method, status=status)
+        statements, sql_seconds = g.pop("_metrics_sql")
+        metrics.observe("request_sql_statements", statements, endpoint=endpoint)
+        metrics.inc("request_sql_seconds_total", sql_seconds, endpoint=endpoint)
+
+    # weak=False: the handlers are closures that would otherwise be garbage collected
+    request_started.connect(started, app, weak=False)
+    request_finished.connect(finished, app, weak=False)
+    app.teardown_request(torn_down)
+    return metrics
+
+
+def get_metrics(app):
+    return app.extensions["metrics"]
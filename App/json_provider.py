@@ -0,0 +1,42 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib json provider
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Output matches DefaultJSONProvider (sorted keys, datetimes as HTTP dates
+    via the same default hook); anything orjson refuses, such as integers
+    wider than 64 bits, falls back to the stdlib encoder.
+    """
+
+    options = 0 if orjson is None else (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+    def dumps(self, obj, **kwargs):
+        options = self.options
+        if kwargs.get("indent"):
+            options |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=options).decode()
+        except TypeError:
+            # Same spacing as orjson, so a response doesn't change shape when it falls back
+            kwargs.setdefault("separators", (",", ": ") if kwargs.get("indent") else (",", ":"))
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def setup_json(app):
+    """Use orjson for request/response JSON when it is installed"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
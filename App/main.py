@@ -7,6 +7,8 @@ from werkzeug.datastructures import  FileStorage
 
 from App.database import init_db
 from App.config import load_config
+from App.json_provider import setup_json
+from App.instrumentation import setup_instrumentation
 
 
 from App.controllers import (
@@ -25,12 +27,14 @@ def add_views(app):
 def create_app(overrides={}):
     app = Flask(__name__, static_url_path='/static')
     load_config(app, overrides)
+    setup_json(app)
     CORS(app)
     add_auth_context(app)
     photos = UploadSet('photos', TEXT + DOCUMENTS + IMAGES)
     configure_uploads(app, photos)
     add_views(app)
     init_db(app)
+    setup_instrumentation(app)
     jwt = setup_jwt(app)
     setup_admin(app)
     @jwt.invalid_token_loader
@@ -1,10 +1,15 @@
-from .user import User, UserType, Resident, Driver
+from .user import User, UserType, Resident, Driver, DriverStatus
+from .street import Street
 from .driver_schedule import DriverSchedule
-from .stop_request import StopRequest, StopRequestStatus
+from .stop_request import StopRequest, StopRequestStatus, ALLOWED_STATUS_TRANSITIONS
+from .location_history import LocationHistoryBlock
+from .geocoded_address import GeocodedAddress
+from .outbox import OutboxMessage
 
 # Since there are multiple init files, we define __all__ here to specify what is imported
 __all__ = [
-    "User", "UserType", "Resident", "Driver",
-    "DriverSchedule",
-    "StopRequest", "StopRequestStatus"
+    "User", "UserType", "Resident", "Driver", "DriverStatus",
+    "Street", "DriverSchedule",
+    "StopRequest", "StopRequestStatus", "ALLOWED_STATUS_TRANSITIONS",
+    "LocationHistoryBlock", "GeocodedAddress", "OutboxMessage"
 ]
@@ -4,15 +4,23 @@ from datetime import datetime
 # DriverSchedule model: stores driver runs for streets with start/end times
 class DriverSchedule(db.Model):
     __tablename__ = "driver_schedule"   # so FK strings match
+    __table_args__ = (
+        # Covers the per-driver overlap check: seek to driver_id, walk back by start, read end
+        db.Index("ix_driver_schedule_driver_start_end", "driver_id", "scheduled_start_time", "scheduled_end_time"),
+        db.Index("ix_driver_schedule_start", "scheduled_start_time"),
+        db.Index("ix_driver_schedule_street_id", "street_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     driver_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     street = db.Column(db.String(200), nullable=False)
+    street_id = db.Column(db.Integer, db.ForeignKey("street.id"), nullable=False)
     scheduled_start_time = db.Column(db.DateTime, nullable=False)
     scheduled_end_time = db.Column(db.DateTime, nullable=False)
 
     # Relationships
     driver = db.relationship("Driver", back_populates="schedules")
+    street_ref = db.relationship("Street", back_populates="schedules")
     stop_requests = db.relationship(
         "StopRequest",
         back_populates="schedule",
@@ -20,9 +28,10 @@ class DriverSchedule(db.Model):
         lazy=True
     )
 
-    def __init__(self, driver_id, street, scheduled_start_time, scheduled_end_time):
+    def __init__(self, driver_id, street, scheduled_start_time, scheduled_end_time, street_id=None):
         self.driver_id = driver_id
         self.street = street
+        self.street_id = street_id
         self.scheduled_start_time = scheduled_start_time
         self.scheduled_end_time = scheduled_end_time
 
@@ -0,0 +1,36 @@
+from App.database import db
+from App.models.street import Street
+from datetime import datetime
+
+# GeocodedAddress model: persistent geocoding cache keyed on the normalized address.
+# lat/lon are null for addresses no backend could place, so they aren't retried on every lookup.
+class GeocodedAddress(db.Model):
+    __tablename__ = "geocoded_address"
+
+    id = db.Column(db.Integer, primary_key=True)
+    normalized_address = db.Column(db.String(300), unique=True, nullable=False)
+    lat = db.Column(db.Float, nullable=True)
+    lon = db.Column(db.Float, nullable=True)
+    source = db.Column(db.String(100), nullable=True)
+    geocoded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __init__(self, normalized_address, lat=None, lon=None, source=None):
+        self.normalized_address = normalized_address
+        self.lat = lat
+        self.lon = lon
+        self.source = source
+
+    @staticmethod
+    def normalize(address):
+        """Cache key for an address: Street.normalize rules (case, punctuation, suffixes)"""
+        return Street.normalize(address)[:300]
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "normalized_address": self.normalized_address,
+            "lat": self.lat,
+            "lon": self.lon,
+            "source": self.source,
+            "geocoded_at": self.geocoded_at.isoformat() if self.geocoded_at else None
+        }
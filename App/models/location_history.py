@@ -0,0 +1,31 @@
+from App.database import db
+
+# LocationHistoryBlock model: packed location pings for one driver within one UTC hour.
+# data is a run of fixed-width little-endian records (uint32 ms into the hour,
+# float32 lat, float32 lon); each flush appends a new block rather than rewriting one.
+class LocationHistoryBlock(db.Model):
+    __tablename__ = "location_history_block"
+    __table_args__ = (
+        db.Index("ix_location_history_driver_hour", "driver_id", "hour"),
+        db.Index("ix_location_history_hour", "hour"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    hour = db.Column(db.Integer, nullable=False)   # hours since the Unix epoch (partition key)
+    record_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    def __init__(self, driver_id, hour, record_count, data):
+        self.driver_id = driver_id
+        self.hour = hour
+        self.record_count = record_count
+        self.data = data
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "driver_id": self.driver_id,
+            "hour": self.hour,
+            "record_count": self.record_count
+        }
@@ -0,0 +1,38 @@
+from App.database import db
+from datetime import datetime
+
+# OutboxMessage model: a side effect to run after the transaction that wrote it commits.
+# Rows are inserted in the same transaction as the domain change and deleted once delivered;
+# a worker claims due rows by setting leased_until/lease_owner, and failed_at marks rows that
+# ran out of attempts.
+class OutboxMessage(db.Model):
+    __tablename__ = "outbox_message"
+    __table_args__ = (
+        db.Index("ix_outbox_message_due", "failed_at", "available_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    leased_until = db.Column(db.DateTime, nullable=True)
+    lease_owner = db.Column(db.String(64), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    failed_at = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "payload": self.payload,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "failed_at": self.failed_at.isoformat() if self.failed_at else None
+        }
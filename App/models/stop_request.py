@@ -9,8 +9,21 @@ class StopRequestStatus(Enum):
     REJECTED = "rejected"
     COMPLETED = "completed"
 
+# Allowed status changes, keyed by target status -> statuses it may be reached from
+ALLOWED_STATUS_TRANSITIONS = {
+    StopRequestStatus.REQUESTED: (),
+    StopRequestStatus.CONFIRMED: (StopRequestStatus.REQUESTED,),
+    StopRequestStatus.REJECTED: (StopRequestStatus.REQUESTED, StopRequestStatus.CONFIRMED),
+    StopRequestStatus.COMPLETED: (StopRequestStatus.CONFIRMED,),
+}
+
 class StopRequest(db.Model):
     __tablename__ = "stop_request"   # so FK strings match
+    __table_args__ = (
+        # One request per resident per schedule; also serves lookups by resident
+        db.UniqueConstraint("resident_id", "schedule_id", name="uq_stop_request_resident_schedule"),
+        db.Index("ix_stop_request_schedule_status", "schedule_id", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     resident_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
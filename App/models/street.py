@@ -0,0 +1,42 @@
+from App.database import db
+import re
+
+# Common suffix abbreviations expanded so "Main St" and "Main Street" share one catalog entry
+STREET_SUFFIXES = {
+    "st": "street",
+    "rd": "road",
+    "ave": "avenue",
+    "av": "avenue",
+    "dr": "drive",
+    "ln": "lane",
+    "blvd": "boulevard",
+    "ct": "court",
+    "hwy": "highway",
+}
+
+# Street model: canonical catalog of street names that schedules point at
+class Street(db.Model):
+    __tablename__ = "street"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    normalized_name = db.Column(db.String(200), unique=True, nullable=False)
+
+    # Relationships
+    schedules = db.relationship("DriverSchedule", back_populates="street_ref", lazy=True)
+
+    def __init__(self, name):
+        self.name = name.strip()
+        self.normalized_name = Street.normalize(name)
+
+    @staticmethod
+    def normalize(name):
+        """Lowercase, strip punctuation and expand suffix abbreviations"""
+        words = re.sub(r"[^\w\s]", " ", name.lower()).split()
+        return " ".join(STREET_SUFFIXES.get(word, word) for word in words)
+
+    def get_json(self):
+        return {
+            "id": self.id,
+            "name": self.name
+        }
@@ -1,5 +1,5 @@
-from werkzeug.security import check_password_hash, generate_password_hash
 from App.database import db
+from App.hashing import get_hasher
 from enum import Enum
 from datetime import datetime
 
@@ -8,6 +8,11 @@ class UserType(Enum):
     RESIDENT = "resident"
     DRIVER = "driver"
 
+class DriverStatus(Enum):
+    AVAILABLE = "available"
+    BUSY = "busy"
+    OFFLINE = "offline"
+
 # Base User model (joined-table inheritance)
 class User(db.Model):
     __tablename__ = "user"   # base table name used by FKs elsewhere
@@ -46,11 +51,18 @@ class User(db.Model):
 
     def set_password(self, password):
         """Create hashed password."""
-        self.password = generate_password_hash(password)
+        self.password = get_hasher().hash(password)
 
     def check_password(self, password):
         """Check hashed password."""
-        return check_password_hash(self.password, password)
+        return get_hasher().verify(self.password, password)
+
+    def upgrade_password(self, password):
+        """Re-hash a just-verified password stored with an outdated method or cost."""
+        if get_hasher().needs_rehash(self.password):
+            self.set_password(password)
+            return True
+        return False
 
 
 
@@ -91,8 +103,15 @@ class Driver(User):
     id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
     vehicle_type = db.Column(db.String(100), nullable=False)
     license_plate = db.Column(db.String(20), nullable=False)
-    current_status = db.Column(db.String(50), default="available")
+    # Stored as the lowercase value in the existing VARCHAR column, no database enum type
+    current_status = db.Column(
+        db.Enum(DriverStatus, native_enum=False, length=50, values_callable=lambda e: [m.value for m in e]),
+        default=DriverStatus.AVAILABLE
+    )
     current_location = db.Column(db.String(200))
+    # Parsed from current_location when it is a "lat,lon" pair, otherwise null
+    current_lat = db.Column(db.Float, nullable=True)
+    current_lon = db.Column(db.Float, nullable=True)
     location_updated_at = db.Column(db.DateTime, nullable=True)
 
     # Relationships
@@ -111,14 +130,14 @@ class Driver(User):
         super().__init__(username, password, email, name, UserType.DRIVER)
         self.vehicle_type = vehicle_type
         self.license_plate = license_plate
-        self.current_status = "available"
+        self.current_status = DriverStatus.AVAILABLE
 
     def get_json(self):
         base = super().get_json()
         base.update({
             "vehicle_type": self.vehicle_type,
             "license_plate": self.license_plate,
-            "current_status": self.current_status,
+            "current_status": self.current_status.value if self.current_status else None,
             "current_location": self.current_location,
             "location_updated_at": self.location_updated_at.isoformat() if self.location_updated_at else None
         })
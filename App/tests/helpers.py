@@ -0,0 +1,15 @@
+from sqlalchemy import event
+
+from App.database import db
+
+
+def count_queries(func):
+    """Number of SQL statements func() sends to the database"""
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return len(statements)
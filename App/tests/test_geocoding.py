@@ -0,0 +1,124 @@
+import os, pytest, tempfile, unittest
+
+from flask import current_app
+from App.main import create_app
+from App.database import db, create_db
+from App.models import UserType, GeocodedAddress
+from App.controllers import UserController, GeocodingController
+from App.controllers.geocoder import GazetteerBackend, Geocoder, get_geocoder, get_geocode_queue
+
+GAZETTEER = "address,lat,lon\n12 Main Street,10.651,-61.501\nMain Street,10.65,-61.5\nOak Avenue,10.7,-61.4\n"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write(GAZETTEER)
+    app = create_app({
+        'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'GEOCODER_GAZETTEER_PATH': path, 'GEOCODE_BATCH_INTERVAL': 3600, 'GEOCODE_BATCH_SIZE': 1000
+    })
+    create_db()
+    yield app.test_client()
+    get_geocode_queue(app).drain()
+    db.drop_all()
+    os.remove(path)
+
+
+class CountingBackend:
+    name = "counting"
+
+    def __init__(self, places):
+        self.places = places
+        self.calls = []
+
+    def geocode(self, addresses):
+        self.calls.append(list(addresses))
+        return {address: self.places[address] for address in addresses if address in self.places}
+
+
+'''
+    Unit Tests
+'''
+class GeocoderUnitTests(unittest.TestCase):
+
+    def test_gazetteer_matches_normalized_address_then_street(self):
+        backend = GazetteerBackend(current_app.config["GEOCODER_GAZETTEER_PATH"])
+        keys = [GeocodedAddress.normalize(a) for a in ("12 main st.", "7 Oak Ave", "Nowhere Lane")]
+        found = backend.geocode(keys)
+        assert found == {keys[0]: (10.651, -61.501), keys[1]: (10.7, -61.4)}
+
+    def test_lru_then_table_then_backend(self):
+        backend = CountingBackend({GeocodedAddress.normalize("1 Palm Road"): (10.1, -61.1)})
+        geocoder = Geocoder([backend], cache_size=1)
+        assert geocoder.lookup_many(["1 Palm Road", "1 PALM RD", "Atlantis"]) == {
+            "1 Palm Road": (10.1, -61.1), "1 PALM RD": (10.1, -61.1), "Atlantis": None
+        }
+        assert len(backend.calls) == 1
+        # Misses are remembered as well as hits
+        stored = db.session.execute(db.select(GeocodedAddress.normalized_address, GeocodedAddress.lat)).all()
+        assert dict(stored) == {GeocodedAddress.normalize("1 Palm Road"): 10.1, GeocodedAddress.normalize("Atlantis"): None}
+
+        # The one-entry LRU has evicted Palm Road; the table answers without the backend
+        assert geocoder.lookup("1 Palm Road") == (10.1, -61.1)
+        assert geocoder.lookup("Atlantis") is None
+        assert len(backend.calls) == 1
+        assert geocoder.stats()["stored"] >= 1
+
+        # Coordinate literals never reach the caches
+        assert geocoder.lookup("10.5, -61.2") == (10.5, -61.2)
+
+        assert geocoder.forget_missing() == 1
+        geocoder.lookup("Atlantis")
+        assert backend.calls[-1] == [GeocodedAddress.normalize("Atlantis")]
+
+    def test_misses_are_not_remembered_when_a_backend_fails(self):
+        class BrokenBackend:
+            name = "broken"
+
+            def geocode(self, addresses):
+                raise ConnectionError("backend down")
+
+        fallback = CountingBackend({GeocodedAddress.normalize("5 Bay Road"): (10.2, -61.2)})
+        geocoder = Geocoder([BrokenBackend(), fallback])
+        assert geocoder.lookup_many(["5 Bay Road", "7 Lost Lane"]) == {"5 Bay Road": (10.2, -61.2), "7 Lost Lane": None}
+        # The fallback's answer is kept; the address the broken backend never answered is not
+        assert GeocodedAddress.normalize("7 Lost Lane") not in geocoder.cache
+        assert db.session.execute(
+            db.select(GeocodedAddress).filter_by(normalized_address=GeocodedAddress.normalize("7 Lost Lane"))
+        ).first() is None
+        assert GeocodedAddress.normalize("5 Bay Road") in geocoder.cache
+
+
+'''
+    Integration Tests
+'''
+class GeocodingIntegrationTests(unittest.TestCase):
+
+    def test_resident_addresses_are_geocoded_in_background_batches(self):
+        queue = get_geocode_queue(current_app)
+        queue.drain()
+        resident, _ = UserController.create_user(
+            UserType.RESIDENT, "geo_resident", "pass", "geo_resident@mail.com", "Resident", home_address="12 Main Street"
+        )
+        assert GeocodedAddress.normalize("12 Main Street") not in get_geocoder(current_app).cache
+        assert queue.drain() == 1
+        assert db.session.execute(
+            db.select(GeocodedAddress.lat).filter_by(normalized_address=GeocodedAddress.normalize("12 Main Street"))
+        ).scalar() == 10.651
+
+        moved, message = UserController.update_home_address(resident.id, "40 Oak Avenue")
+        assert moved.home_address == "40 Oak Avenue", message
+        assert queue.drain() == 1
+        assert GeocodingController.locate("40 oak ave") == (10.7, -61.4)
+
+    def test_backfill_reports_located_and_unlocated(self):
+        for n, address in enumerate(["3 Main Street", "3 Main Street", "9 Unknown Road"]):
+            UserController.create_user(
+                UserType.RESIDENT, f"backfill{n}", "pass", f"backfill{n}@mail.com", "Resident", home_address=address
+            )
+        report, message = GeocodingController.backfill(chunk_size=2)
+        assert report["located"] >= 1 and report["unlocated"] >= 1, message
+        assert GeocodingController.locate("3 Main Street") == (10.65, -61.5)
+        assert GeocodingController.locate("9 Unknown Road") is None
@@ -0,0 +1,169 @@
+import json, os, subprocess, sys, tempfile, time, pytest, unittest
+from unittest import mock
+from flask import current_app
+from sqlalchemy import create_engine, event
+
+from App.main import create_app
+from App.database import db, create_db, engine_options
+from App.models import UserType
+from App.controllers import UserController
+from App.instrumentation import Metrics, exposition, fingerprint, instrument_engine, merge, normalize_statement
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    # every statement counts as slow so the slow query log can be checked
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQL_SLOW_QUERY_SECONDS': 0})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+POOL_SETTINGS = {
+    'SQLALCHEMY_POOL_SIZE': 8, 'SQLALCHEMY_MAX_OVERFLOW': 4, 'SQLALCHEMY_POOL_TIMEOUT': 5.0,
+    'SQLALCHEMY_POOL_RECYCLE': 600, 'SQLALCHEMY_POOL_PRE_PING': True, 'SQLALCHEMY_POOL_LIFO': None,
+    'SQLALCHEMY_STATEMENT_TIMEOUT': 2.5,
+}
+
+
+'''
+    Unit Tests
+'''
+class InstrumentationUnitTests(unittest.TestCase):
+
+    def test_engine_options_from_pool_settings(self):
+        config = dict(POOL_SETTINGS, SQLALCHEMY_DATABASE_URI='postgresql+psycopg://u:p@db/app',
+                      SQLALCHEMY_ENGINE_OPTIONS={'max_overflow': 0, 'connect_args': {'options': '-c search_path=app'}})
+        options = engine_options(config)
+        assert options['pool_size'] == 8 and options['pool_recycle'] == 600 and options['pool_pre_ping']
+        assert options['max_overflow'] == 0   # explicit engine options win
+        assert options['pool_use_lifo'] is False   # not running under gevent
+        assert options['connect_args']['options'] == '-c search_path=app -c statement_timeout=2500'
+        # SQLite keeps Flask-SQLAlchemy's pool and takes no statement timeout
+        assert engine_options(dict(POOL_SETTINGS, SQLALCHEMY_DATABASE_URI='sqlite://')) == {}
+
+    def test_statements_normalize_to_one_fingerprint(self):
+        first = "SELECT * FROM stop_request WHERE resident_id = 4 AND status = 'CONFIRMED' AND id IN (?, ?, ?)"
+        second = "SELECT *  FROM stop_request\nWHERE resident_id = 17 AND status = 'REJECTED' AND id IN (?)"
+        assert normalize_statement(first) == "SELECT * FROM stop_request WHERE resident_id = ? AND status = ? AND id IN (?+)"
+        assert fingerprint(first) == fingerprint(second)
+        assert normalize_statement("SELECT x::text FROM t WHERE id = %(id_1)s") == "SELECT x::text FROM t WHERE id = ?"
+
+    def test_worker_snapshots_merge(self):
+        workers = [Metrics(), Metrics()]
+        for n, metrics in enumerate(workers):
+            metrics.inc("requests_total", endpoint="a", method="GET", status=200)
+            metrics.observe("request_duration_seconds", 0.02 * (n + 1), endpoint="a", method="GET")
+        totals = {"counters": {}, "histograms": {}}
+        for metrics in workers:
+            merge(totals, metrics.snapshot())
+        text = exposition(totals)
+        assert 'breadvan_requests_total{endpoint="a",method="GET",status="200"} 2' in text
+        assert 'breadvan_request_duration_seconds_bucket{endpoint="a",method="GET",le="0.025"} 1' in text
+        assert 'breadvan_request_duration_seconds_bucket{endpoint="a",method="GET",le="0.05"} 2' in text
+        assert 'breadvan_request_duration_seconds_count{endpoint="a",method="GET"} 2' in text
+
+    def test_render_sums_every_worker_file(self):
+        directory = tempfile.mkdtemp()
+        other = Metrics()
+        other.inc("sql_statements_total", 5)
+        # pid 1 is always running, so its file is a live worker's
+        with open(os.path.join(directory, "worker-1-0.json"), "w") as f:
+            json.dump(other.snapshot(), f)
+        metrics = Metrics(directory, write_interval=60)
+        metrics.inc("sql_statements_total", 2)
+        assert "breadvan_sql_statements_total 7" in metrics.render()
+        assert os.path.exists(metrics.path)
+        metrics.stopped.set()
+
+    def test_exited_and_dead_workers_are_folded_into_retired_totals(self):
+        directory = tempfile.mkdtemp()
+        exited = Metrics(directory, write_interval=60)
+        exited.inc("sql_statements_total", 3)
+        exited.retire()
+        assert sorted(os.listdir(directory)) == [".lock", "retired.json"]
+
+        # A worker killed without retiring leaves its file; the next render folds it in once
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        crashed = Metrics()
+        crashed.inc("sql_statements_total", 4)
+        with open(os.path.join(directory, f"worker-{dead.pid}-0.json"), "w") as f:
+            json.dump(crashed.snapshot(), f)
+
+        metrics = Metrics(directory, write_interval=60)
+        metrics.inc("sql_statements_total", 2)
+        assert "breadvan_sql_statements_total 9" in metrics.render()
+        assert "breadvan_sql_statements_total 9" in metrics.render()
+        assert not os.path.exists(os.path.join(directory, f"worker-{dead.pid}-0.json"))
+        metrics.retire()
+
+
+'''
+    Integration Tests
+'''
+class MetricsEndpointIntegrationTests(unittest.TestCase):
+
+    def test_failed_requests_and_statements_are_accounted(self):
+        def broken():
+            db.session.execute(db.text("SELECT * FROM no_such_table"))
+
+        client = current_app.test_client()
+        with mock.patch.dict(current_app.view_functions, {"index_views.index_page": broken}):
+            with self.assertRaises(Exception):
+                client.get("/")
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'breadvan_requests_total{endpoint="index_views.index_page",method="GET",status="500"} 1' in text
+        with db.engine.connect() as connection:
+            assert not connection.connection.info.get("query_started")
+
+    def test_pool_wait_leaves_out_opening_connections(self):
+        metrics = Metrics()
+        engine = create_engine("sqlite://")
+        instrument_engine(engine, metrics, slow_seconds=60)
+
+        @event.listens_for(engine, "do_connect")
+        def slow_connect(dialect, connection_record, cargs, cparams):
+            time.sleep(0.2)
+
+        with engine.connect():
+            pass
+        wait = metrics.snapshot()["histograms"]["pool_checkout_wait_seconds"][""]
+        assert wait["count"] == 1 and wait["sum"] < 0.1
+
+    def test_requests_and_sql_are_reported(self):
+        client = current_app.test_client()
+        with self.assertLogs("App.instrumentation", level="WARNING") as logs:
+            client.get("/health")
+            client.get("/health")
+            client.get("/api/users")
+        assert "Slow query" in logs.output[0]
+
+        response = client.get("/metrics")
+        text = response.get_data(as_text=True)
+        assert response.mimetype == "text/plain"
+        assert 'breadvan_requests_total{endpoint="index_views.health_check",method="GET",status="200"} 2' in text
+        assert 'breadvan_request_sql_statements_bucket{endpoint="index_views.health_check",le="0"} 2' in text
+        assert 'breadvan_request_sql_statements_count{endpoint="user_views.get_users_action"} 1' in text
+        assert "breadvan_slow_queries_total{fingerprint=" in text
+        assert "breadvan_pool_checkout_wait_seconds_count" in text
+
+        # A streamed list runs its queries while the body is sent; they still count towards the request
+        streamed = client.get("/api/users?stream=json")
+        streamed.get_data()
+        streamed.close()
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'breadvan_request_sql_statements_count{endpoint="user_views.get_users_action"} 2' in text
+        assert 'breadvan_request_sql_statements_bucket{endpoint="user_views.get_users_action",le="0"} 0' in text
+
+    def test_pool_diagnostics(self):
+        client = current_app.test_client()
+        assert client.get('/api/diagnostics/pool').status_code == 401
+        UserController.create_user(
+            UserType.DRIVER, "pool_driver", "pass", "pool_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="POOL1"
+        )
+        token = client.post('/api/login', json={'username': 'pool_driver', 'password': 'pass'}).json['access_token']
+        response = client.get('/api/diagnostics/pool', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        assert response.json['pools']['default']['pool'] == type(db.engine.pool).__name__
@@ -0,0 +1,221 @@
+import json, os, random, stat, tempfile, time, pytest, unittest
+import numpy as np
+from datetime import datetime, timedelta
+from queue import Queue
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.tests.helpers import count_queries
+from App.models import UserType, Driver, DriverStatus, LocationHistoryBlock
+from App.controllers import UserController, LocationController
+from App.controllers.relay import WorkerRelay
+from App.controllers.location_buffer import LocationWriteBuffer
+from App.controllers.location_history import LocationHistory
+from App.controllers.driver_index import DriverGrid
+from App.controllers.geo import haversine_km
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'LOCATION_WRITE_BEHIND': True,
+        'LOCATION_FLUSH_INTERVAL': 60.0,
+        'LOCATION_MAX_STALENESS': 60.0
+    })
+    create_db()
+    yield app.test_client()
+    LocationController.get_write_buffer().close()
+    LocationController.get_history().close()
+    db.drop_all()
+
+
+class LocationIntegrationTests(unittest.TestCase):
+
+    def test_write_behind_coalesces_pings(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "ping_driver", "pass", "ping_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="PING1"
+        )
+        LocationController.flush_locations()
+        for n in range(5):
+            LocationController.update_driver_location(driver.id, f"Stop {n}")
+
+        # Readers see the latest ping before anything is written
+        location, _ = LocationController.get_driver_location(driver.id)
+        assert location["current_location"] == "Stop 4"
+        stored = db.session.execute(
+            db.select(Driver.current_location).where(Driver.id == driver.id)
+        ).scalar_one()
+        assert stored is None
+
+        assert LocationController.flush_locations() == 1
+        db.session.expire_all()
+        assert db.session.get(Driver, driver.id).current_location == "Stop 4"
+
+    def test_pings_skip_the_database_and_older_flushes_lose(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "guard_driver", "pass", "guard_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="GUARD1"
+        )
+        LocationController.update_driver_location(driver.id, "Warm up")
+        assert count_queries(lambda: LocationController.update_driver_location(driver.id, "Newest")) == 0
+        assert LocationController.update_driver_location(driver.id + 1000, "Nowhere")[0] is None
+
+        # Another worker buffered an older ping and flushes it after this one was written
+        LocationController.flush_locations()
+        other_worker = LocationWriteBuffer(current_app._get_current_object(), flush_interval=60.0)
+        other_worker.record(driver.id, "Older", datetime.utcnow() - timedelta(minutes=1))
+        other_worker.close()
+        db.session.expire_all()
+        assert db.session.get(Driver, driver.id).current_location == "Newest"
+
+    def test_lone_ping_is_flushed_within_max_staleness(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "lone_driver", "pass", "lone_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="LONE1"
+        )
+        buffer = LocationWriteBuffer(current_app._get_current_object(), flush_interval=60.0, max_staleness=0.2)
+        assert buffer.next_flush_in() == 60.0
+        buffer.record(driver.id, "Depot", datetime.utcnow())
+        assert buffer.next_flush_in() <= 0.2
+        # No further ping arrives to wake the flusher; the staleness deadline alone must
+        deadline = time.monotonic() + 5
+        while buffer.flushed == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        buffer.close()
+        assert buffer.flushed == 1
+        db.session.expire_all()
+        assert db.session.get(Driver, driver.id).current_location == "Depot"
+
+    def test_history_trail_and_retention(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "trail_driver", "pass", "trail_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="TRAIL1"
+        )
+        points = [(10.6549, -61.5019), (10.6551, -61.5021), (10.6560, -61.5030)]
+        for lat, lon in points:
+            LocationController.update_driver_location(driver.id, f"{lat}, {lon}")
+        LocationController.update_driver_location(driver.id, "Depot")   # not coordinates, not recorded
+
+        trail, _ = LocationController.get_driver_trail(driver.id)
+        assert [(p["lat"], p["lon"]) for p in trail] == [pytest.approx(p, abs=1e-4) for p in points]
+
+        LocationController.flush_locations()
+        blocks = LocationHistoryBlock.query.filter_by(driver_id=driver.id).all()
+        assert [b.record_count for b in blocks] == [3]
+        assert len(LocationController.get_driver_trail(driver.id)[0]) == 3
+
+        db.session.add(LocationHistoryBlock(driver.id, 1, 1, b"\0" * 12))
+        db.session.commit()
+        deleted, _ = LocationController.prune_history(retention_days=30)
+        assert deleted == 1
+        assert LocationHistoryBlock.query.filter_by(driver_id=driver.id).count() == 1
+
+    def test_history_is_written_by_its_flusher_not_the_request(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "history_driver", "pass", "history_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="HIST1"
+        )
+        history = LocationHistory(current_app._get_current_object(), flush_records=2, flush_interval=60.0,
+                                  max_staleness=60.0)
+        now = datetime.utcnow()
+        # Reaching flush_records only wakes the flusher thread; the caller never writes
+        assert count_queries(lambda: history.record(driver.id, 10.65, -61.50, now)) == 0
+        assert count_queries(lambda: history.record(driver.id, 10.66, -61.51, now)) == 0
+        deadline = time.monotonic() + 5
+        while history.pending_records and time.monotonic() < deadline:
+            time.sleep(0.01)
+        history.close()
+        assert [b.record_count for b in LocationHistoryBlock.query.filter_by(driver_id=driver.id)] == [2]
+
+    def test_location_stream_receives_published_updates(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "stream_driver", "pass", "stream_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="SSE1"
+        )
+        client = current_app.test_client()
+        response = client.get(f"/api/drivers/{driver.id}/location/stream", buffered=False)
+        events = iter(response.response)
+        assert next(events).startswith(b"event: location")
+
+        LocationController.update_driver_location(driver.id, "Corner of Main and 1st")
+        event = next(events).decode()
+        assert json.loads(event.split("data: ", 1)[1])["current_location"] == "Corner of Main and 1st"
+        response.close()
+
+
+    def test_nearest_drivers_follow_pings_and_status(self):
+        drivers = []
+        for n, location in enumerate(["10.6500,-61.5000", "10.6600,-61.5000", "10.7000,-61.5000"]):
+            driver, _ = UserController.create_user(
+                UserType.DRIVER, f"near_driver{n}", "pass", f"near_driver{n}@mail.com", "Driver",
+                vehicle_type="Van", license_plate=f"NEAR{n}"
+            )
+            LocationController.update_driver_location(driver.id, location)
+            drivers.append(driver.id)
+        found, _ = LocationController.get_nearest_drivers(10.6510, -61.5, k=2)
+        assert [d["driver_id"] for d in found] == drivers[:2]
+        assert found[0]["distance_km"] < 0.2
+
+        LocationController.update_driver_status(drivers[0], "busy")
+        response = current_app.test_client().get("/api/drivers/nearest?lat=10.651&lon=-61.5&k=2")
+        assert [d["driver_id"] for d in response.json] == drivers[1:]
+        found, _ = LocationController.get_nearest_drivers(10.651, -61.5, k=5, max_km=2)
+        assert [d["driver_id"] for d in found] == drivers[1:2]
+
+        # A non-coordinate location takes the driver out; the flushed row carries the columns
+        LocationController.update_driver_location(drivers[1], "Depot")
+        LocationController.flush_locations()
+        assert db.session.get(Driver, drivers[2]).current_lat == 10.7
+        assert db.session.get(Driver, drivers[1]).current_lat is None
+        assert db.session.get(Driver, drivers[0]).current_status == DriverStatus.BUSY
+        found, _ = LocationController.get_nearest_drivers(10.651, -61.5, k=5, max_km=10)
+        assert [d["driver_id"] for d in found] == drivers[2:]
+        assert LocationController.update_driver_status(drivers[0], "napping")[0] is None
+
+
+class DriverGridUnitTests(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        grid = DriverGrid(WorkerRelay(None), cell_degrees=0.01)
+        grid.loaded = True
+        points = {n: (10 + rng.random() * 0.5, -61.8 + rng.random() * 0.5) for n in range(3000)}
+        for n, (lat, lon) in points.items():
+            grid._apply({"driver_id": n, "lat": lat, "lon": lon, "status": "available", "at": 0})
+        ids = np.array(list(points))
+        lats, lons = np.array([points[n] for n in ids]).T
+        for _ in range(20):
+            lat, lon = 10 + rng.random() * 0.6 - 0.05, -61.8 + rng.random() * 0.6 - 0.05
+            expected = ids[np.argsort(haversine_km(lat, lon, lats, lons), kind="stable")[:7]].tolist()
+            assert [found[0] for found in grid.nearest(lat, lon, k=7)] == expected
+        # Far from every driver the sparse fallback still finds them
+        assert len(grid.nearest(50.0, 0.0, k=3)) == 3
+
+
+class WorkerRelayUnitTests(unittest.TestCase):
+
+    def test_relay_delivers_to_other_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sender, receiver = WorkerRelay(directory), WorkerRelay(directory)
+            received = Queue()
+            receiver.subscribe("test", received.put)
+            sender.start()
+            sender.publish("test", {"n": 1})
+            assert received.get(timeout=2) == {"n": 1}
+            sender.close()
+            receiver.close()
+
+    def test_relay_refuses_a_directory_others_can_reach(self):
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, "relay")
+            relay = WorkerRelay(directory)
+            relay.start()
+            assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+            relay.close()
+            os.chmod(directory, 0o777)
+            with pytest.raises(PermissionError):
+                WorkerRelay(directory).start()
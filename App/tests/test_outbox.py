@@ -0,0 +1,109 @@
+import pytest, unittest
+from datetime import datetime, timedelta
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import UserType, OutboxMessage, StopRequestStatus
+from App.controllers import UserController, ScheduleController, StopRequestController, LocationController
+from App.controllers.outbox import OutboxWorker, backlog
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'GEOCODE_BATCH_INTERVAL': 0})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+def messages(topic=None):
+    stmt = db.select(OutboxMessage).order_by(OutboxMessage.id)
+    if topic:
+        stmt = stmt.where(OutboxMessage.topic == topic)
+    return db.session.execute(stmt).scalars().all()
+
+
+def clear_outbox():
+    db.session.execute(db.delete(OutboxMessage))
+    db.session.commit()
+
+
+'''
+    Integration Tests
+'''
+class OutboxIntegrationTests(unittest.TestCase):
+
+    def test_messages_are_written_with_the_change(self):
+        clear_outbox()
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "outbox_driver", "pass", "outbox_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="OUT1"
+        )
+        resident, _ = UserController.create_user(
+            UserType.RESIDENT, "outbox_resident", "pass", "outbox_resident@mail.com", "Resident",
+            home_address="1 Main Street"
+        )
+        start = datetime.utcnow() + timedelta(hours=3)
+        schedule, _ = ScheduleController.create_schedule(driver.id, "Main Street", start, start + timedelta(hours=1))
+
+        stop, _ = StopRequestController.create_stop_request(resident.id, schedule.id)
+        # A rejected duplicate rolls its message back with it
+        assert StopRequestController.create_stop_request(resident.id, schedule.id)[0] is None
+        created = messages("stop_request.created")
+        assert [m.payload for m in created] == [{"id": stop.id, "resident_id": resident.id, "schedule_id": schedule.id}]
+
+        StopRequestController.update_stop_request_statuses(StopRequestStatus.CONFIRMED, request_ids=[stop.id])
+        assert messages("stop_request.status_changed")[-1].payload == {"ids": [stop.id], "status": "confirmed"}
+
+        LocationController.update_driver_location(driver.id, "10.6,-61.5")
+        LocationController.flush_locations()
+        assert messages("driver.location_updated")[-1].payload["lat"] == 10.6
+        assert backlog() == {"pending": 3, "failed": 0}
+
+    def test_worker_delivers_retries_and_gives_up(self):
+        clear_outbox()
+        delivered = []
+
+        def flaky(payload):
+            raise RuntimeError("downstream unavailable")
+
+        for n in range(3):
+            db.session.add(OutboxMessage("ok", {"n": n}))
+        db.session.add(OutboxMessage("flaky", {}))
+        db.session.add(OutboxMessage("unknown", {}))
+        db.session.commit()
+
+        worker = OutboxWorker(
+            current_app, {"ok": delivered.append, "flaky": flaky}, batch_size=10, max_attempts=2, backoff_base=60
+        )
+        assert worker.run_once() == 5
+        assert delivered == [{"n": 0}, {"n": 1}, {"n": 2}]
+        assert worker.stats() == {"delivered": 3, "retried": 2, "failed": 0}
+        failing = messages()
+        assert [m.attempts for m in failing] == [1, 1]
+        assert "downstream unavailable" in failing[0].last_error
+        assert all(m.available_at > datetime.utcnow() + timedelta(seconds=29) for m in failing)
+        assert worker.run_once() == 0   # backing off
+
+        # Once due again the second failure is the last
+        db.session.execute(db.update(OutboxMessage).values(available_at=datetime.utcnow()))
+        db.session.commit()
+        assert worker.run_once() == 2
+        assert worker.stats()["failed"] == 2
+        assert backlog() == {"pending": 0, "failed": 2}
+        assert worker.run_once() == 0
+
+    def test_leased_messages_are_not_claimed_twice(self):
+        clear_outbox()
+        db.session.add(OutboxMessage("ok", {}))
+        db.session.commit()
+        first = OutboxWorker(current_app, {"ok": lambda payload: None}, lease_seconds=60)
+        second = OutboxWorker(current_app, {"ok": lambda payload: None})
+        assert len(first.claim()) == 1
+        assert second.claim() == []
+        # A lease that ran out (its worker died) is claimable again
+        db.session.execute(db.update(OutboxMessage).values(leased_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        assert second.run_once() == 1
+        assert messages() == []
@@ -0,0 +1,370 @@
+import json, os, random, tempfile, time, pytest, unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import UserType, Street, StopRequestStatus
+from App.controllers import UserController, ScheduleController, StopRequestController, LocationController
+from App.controllers.street import StreetController, StreetIndex
+from App.controllers.relay import WorkerRelay
+from App.controllers.schedule_cache import UpcomingScheduleCache
+from App.controllers.schedule_conflicts import IntervalIndex
+from App.controllers.route_planner import plan_route, distance_matrix, nearest_neighbour
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'GEOCODE_BATCH_INTERVAL': 0})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+'''
+    Unit Tests
+'''
+class StreetIndexUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = StreetIndex()
+        for street_id, name in enumerate(["Main Street", "North Main Street", "Oak Avenue", "Maple Drive"], 1):
+            self.index.add(street_id, Street.normalize(name))
+
+    def test_normalize_expands_suffixes(self):
+        assert Street.normalize("  Main St. ") == "main street"
+
+    def test_substring_search(self):
+        assert self.index.search("main st") == [1, 2]
+        assert self.index.search("ak") == [3]
+        assert self.index.search("Elm") == []
+
+    def test_prefix_search(self):
+        assert self.index.prefix("ma") == [1, 2, 4]
+        assert self.index.prefix("north ma") == [2]
+
+    def test_fuzzy_search(self):
+        assert self.index.fuzzy("Mapel Drive")[0] == 4
+
+
+class UpcomingScheduleCacheUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = 0
+
+    def load(self, now):
+        self.loads += 1
+        starts = [now + timedelta(seconds=0.05), now + timedelta(hours=1), now + timedelta(hours=2)]
+        return starts, tuple({"id": n} for n in range(len(starts)))
+
+    def test_expired_head_is_trimmed_without_reloading(self):
+        cache = UpcomingScheduleCache(WorkerRelay(None), ttl=60)
+        assert [s["id"] for s in cache.get(self.load)] == [0, 1, 2]
+        time.sleep(0.1)
+        assert [s["id"] for s in cache.get(self.load)] == [1, 2]
+        assert self.loads == 1
+        assert cache.stats()["trims"] == 1
+
+    def test_invalidation_and_ttl_reload(self):
+        relay = WorkerRelay(None)
+        cache, other_worker = UpcomingScheduleCache(relay, ttl=60), UpcomingScheduleCache(relay, ttl=0)
+        cache.get(self.load)
+        cache.get(self.load)
+        other_worker.get(self.load)
+        other_worker.get(self.load)
+        assert self.loads == 3
+        cache.invalidate()
+        assert other_worker.stats()["invalidations"] == 1
+        cache.get(self.load)
+        assert self.loads == 4
+
+
+'''
+    Integration Tests
+'''
+class IntervalIndexUnitTests(unittest.TestCase):
+
+    def test_conflicts_are_half_open(self):
+        index = IntervalIndex()
+        day = datetime(2030, 1, 1)
+        for hour in (9, 13, 17):
+            index.add(1, day.replace(hour=hour), day.replace(hour=hour + 2), f"schedule {hour}")
+        assert index.conflict(1, day.replace(hour=11), day.replace(hour=13)) is None
+        assert index.conflict(1, day.replace(hour=12), day.replace(hour=14))[2] == "schedule 13"
+        assert index.conflict(1, day.replace(hour=8), day.replace(hour=20))[2] == "schedule 17"
+        assert index.conflict(1, day.replace(hour=19), day.replace(hour=22)) is None
+        assert index.conflict(2, day.replace(hour=9), day.replace(hour=10)) is None
+
+
+class RoutePlannerUnitTests(unittest.TestCase):
+
+    def test_points_on_a_line_are_visited_in_order(self):
+        points = [(10.60 + 0.01 * n, -61.5) for n in (3, 0, 4, 1, 2)]
+        order, legs, converged = plan_route((10.59, -61.5), points)
+        assert order == [1, 3, 4, 0, 2]
+        assert converged and abs(sum(legs) - distance_matrix([10.59, 10.64], [-61.5, -61.5])[0, 1]) < 1e-6
+        # Without a start the route may begin at either end
+        order, _, _ = plan_route(None, points)
+        assert order in ([1, 3, 4, 0, 2], [2, 0, 4, 3, 1])
+
+    def test_two_opt_never_worse_than_nearest_neighbour(self):
+        rng = random.Random(5)
+        for _ in range(10):
+            points = [(10 + rng.random(), -61 + rng.random()) for _ in range(40)]
+            start = (10.5, -60.5)
+            nodes = [start] + points
+            matrix = distance_matrix([p[0] for p in nodes], [p[1] for p in nodes])
+            greedy = nearest_neighbour(matrix)
+            greedy_km = sum(matrix[a, b] for a, b in zip(greedy, greedy[1:]))
+            order, legs, _ = plan_route(start, points, time_budget=1.0)
+            assert sorted(order) == list(range(40))
+            assert sum(legs) <= greedy_km + 1e-9
+
+
+class ScheduleIntegrationTests(unittest.TestCase):
+
+    def test_schedules_for_street_use_catalog(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "street_driver", "pass", "street_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="ST1"
+        )
+        start = datetime.utcnow() + timedelta(days=1)
+        first, _ = ScheduleController.create_schedule(driver.id, "Elm St", start, start + timedelta(hours=1))
+        second, _ = ScheduleController.create_schedule(driver.id, "elm street", start + timedelta(days=1), start + timedelta(days=1, hours=1))
+        assert first.street_id == second.street_id
+        found = ScheduleController.get_schedules_for_street("Elm")
+        assert sorted(s.id for s in found) == [first.id, second.id]
+        assert [s.name for s in ScheduleController.search_streets("Elm Stret")] == ["Elm St"]
+
+    def test_street_index_picks_up_streets_below_its_high_water_mark(self):
+        index = StreetIndex(refresh_interval=0)
+        index.refresh(force=True)
+        top = db.session.execute(db.select(db.func.max(Street.id))).scalar() or 0
+
+        # Another worker's street, then one created (and indexed) here with a higher id
+        db.session.add(Street("Gap Road"))
+        db.session.commit()
+        local = Street("Local Lane")
+        db.session.add(local)
+        db.session.commit()
+        index.add(local.id, local.normalized_name)
+        index.refresh(force=True)
+        assert index.search("gap road")
+
+        # Ids committed out of order: the lower one shows up after a refresh has passed it
+        later = Street("Later Lane")
+        later.id = top + 10
+        db.session.add(later)
+        db.session.commit()
+        index.refresh(force=True)
+        earlier = Street("Earlier Lane")
+        earlier.id = top + 9
+        db.session.add(earlier)
+        db.session.commit()
+        index.refresh(force=True)
+        assert index.search("earlier lane") == [top + 9]
+
+    def test_import_schedules_reports_rejected_rows(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "import_driver", "pass", "import_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="IMP1"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schedules.csv")
+            with open(path, "w") as f:
+                f.write("driver_id,street,scheduled_start_time,scheduled_end_time\n")
+                for day in range(1, 6):
+                    f.write(f"{driver.id},Birch Road,2030-01-0{day}T09:00:00,2030-01-0{day}T10:00:00\n")
+                f.write("999999,Birch Road,2030-01-07T09:00:00,2030-01-07T10:00:00\n")
+                f.write(f"{driver.id},Birch Road,not-a-date,2030-01-08T10:00:00\n")
+                f.write(f"{driver.id},  ,2030-01-09T09:00:00,2030-01-09T10:00:00\n")
+            report, message = ScheduleController.import_schedules(path, chunk_size=2)
+            assert report["imported"] == 5, message
+            assert [line for line, _ in report["rejected"]] == [7, 8, 9]
+            assert report["rejected"][2][1] == "Missing street"
+
+            path = os.path.join(tmp, "schedules.jsonl")
+            with open(path, "w") as f:
+                f.write("[1, 2]\n\"text\"\n")
+                f.write(json.dumps({"driver_id": driver.id, "street": "Birch Road", "scheduled_start_time": "2030-01-10T09:00:00", "scheduled_end_time": "2030-01-10T10:00:00"}) + "\n")
+            report, message = ScheduleController.import_schedules(path)
+        assert report["imported"] == 1, message
+        assert report["rejected"] == [(1, "Expected an object"), (2, "Expected an object")]
+        assert len(ScheduleController.get_schedules_for_street("birch rd")) == 6
+
+    def test_failed_import_reports_the_chunks_already_committed(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "partial_driver", "pass", "partial_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="PART1"
+        )
+        resolve = StreetController.resolve_street_ids
+        calls = []
+
+        def fails_second_chunk(names):
+            calls.append(names)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return resolve(names)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schedules.csv")
+            with open(path, "w") as f:
+                f.write("driver_id,street,scheduled_start_time,scheduled_end_time\n")
+                f.write(f"{driver.id},Cork Lane,not-a-date,2031-01-01T10:00:00\n")
+                for day in range(1, 5):
+                    f.write(f"{driver.id},Cork Lane,2031-01-0{day}T09:00:00,2031-01-0{day}T10:00:00\n")
+            with mock.patch.object(StreetController, "resolve_street_ids", side_effect=fails_second_chunk):
+                report, message = ScheduleController.import_schedules(path, chunk_size=2)
+        assert report["imported"] == 1 and report["error"] == "connection lost"
+        assert [line for line, _ in report["rejected"]] == [2]
+        assert message == "Error importing schedules after 1 rows: connection lost"
+        assert len(ScheduleController.get_schedules_for_driver(driver.id)) == 1
+
+    def test_upcoming_schedules_cache_sees_new_schedules(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "upcoming_driver", "pass", "upcoming_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="UP1"
+        )
+        before = ScheduleController.get_upcoming_schedules_json()
+        start = datetime.utcnow() + timedelta(hours=5)
+        schedule, _ = ScheduleController.create_schedule(driver.id, "Cedar Court", start, start + timedelta(hours=1))
+        after = current_app.test_client().get("/api/schedules/upcoming").json
+        assert len(after) == len(before) + 1
+        assert after == [s.get_json() for s in ScheduleController.get_upcoming_schedules()]
+        assert ScheduleController.get_upcoming_schedules_json(limit=1) == after[:1]
+        assert current_app.test_client().get("/api/schedules/upcoming?limit=-5").status_code == 400
+        with self.assertRaises(ValueError):
+            ScheduleController.get_upcoming_schedules_json(limit=-5)
+        # Callers get copies; changing one leaves the cached list alone
+        ScheduleController.get_upcoming_schedules_json()[0]["street"] = "Changed"
+        assert ScheduleController.get_upcoming_schedules_json() == after
+
+    def test_create_schedule_rejects_overlaps_and_inverted_times(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "conflict_driver", "pass", "conflict_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="CF1"
+        )
+        start = datetime(2031, 3, 1, 9)
+        first, _ = ScheduleController.create_schedule(driver.id, "Pine Lane", start, start + timedelta(hours=2))
+        schedule, message = ScheduleController.create_schedule(driver.id, "Pine Lane", start + timedelta(hours=1), start + timedelta(hours=3))
+        assert schedule is None and message.startswith(f"Overlaps schedule {first.id}")
+        schedule, message = ScheduleController.create_schedule(driver.id, "Pine Lane", start - timedelta(hours=1), start + timedelta(hours=4))
+        assert schedule is None
+        schedule, message = ScheduleController.create_schedule(driver.id, "Pine Lane", start, start - timedelta(hours=1))
+        assert schedule is None and message == "Schedule must end after it starts"
+        # Back to back is fine
+        schedule, _ = ScheduleController.create_schedule(driver.id, "Pine Lane", start + timedelta(hours=2), start + timedelta(hours=3))
+        assert schedule is not None
+
+    def test_validate_and_import_check_stored_and_batch_overlaps(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "batch_driver", "pass", "batch_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="BT1"
+        )
+        existing, _ = ScheduleController.create_schedule(driver.id, "Mill Road", datetime(2032, 5, 1, 9), datetime(2032, 5, 1, 11))
+        proposed = [
+            {"driver_id": driver.id, "street": "Mill Road", "scheduled_start_time": "2032-05-01T10:00:00", "scheduled_end_time": "2032-05-01T12:00:00"},
+            {"driver_id": driver.id, "street": "Mill Road", "scheduled_start_time": "2032-05-01T11:00:00", "scheduled_end_time": "2032-05-01T12:00:00"},
+            {"driver_id": driver.id, "street": "Mill Road", "scheduled_start_time": "2032-05-01T11:30:00", "scheduled_end_time": "2032-05-01T13:00:00"},
+            {"driver_id": driver.id, "street": "Mill Road", "scheduled_start_time": "2032-05-01T15:00:00", "scheduled_end_time": "2032-05-01T14:00:00"},
+        ]
+        client = current_app.test_client()
+        assert client.post("/api/schedules/validate", json={"schedules": proposed}).status_code == 401
+        token = client.post('/api/login', json={'username': driver.username, 'password': 'pass'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        response = client.post("/api/schedules/validate", json={"schedules": proposed}, headers=headers)
+        results = response.json["results"]
+        assert [r["valid"] for r in results] == [False, True, False, False]
+        assert results[0]["reason"].startswith(f"Overlaps schedule {existing.id}")
+        assert results[2]["reason"].startswith("Overlaps item 1")
+        assert results[3]["reason"] == "Schedule must end after it starts"
+
+        # Requests are capped in size and in how long each proposal may last
+        too_long = dict(proposed[0], scheduled_end_time="2032-05-03T10:00:00")
+        response = client.post("/api/schedules/validate", json=[too_long], headers=headers)
+        assert response.json["results"][0]["reason"] == "Schedule must not last longer than 24 hours"
+        too_many = proposed * (current_app.config["SCHEDULE_VALIDATE_MAX_ITEMS"] // len(proposed) + 1)
+        assert client.post("/api/schedules/validate", json=too_many, headers=headers).status_code == 400
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schedules.jsonl")
+            with open(path, "w") as f:
+                for row in proposed:
+                    f.write(json.dumps(row) + "\n")
+            report, message = ScheduleController.import_schedules(path, chunk_size=2)
+        assert report["imported"] == 1, message
+        assert [line for line, _ in report["rejected"]] == [1, 3, 4]
+        assert "line 2" in report["rejected"][1][1]
+
+    def test_offset_timestamps_are_compared_in_utc(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "offset_driver", "pass", "offset_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="OF1"
+        )
+        existing, _ = ScheduleController.create_schedule(driver.id, "Quay Street", datetime(2033, 2, 1, 9), datetime(2033, 2, 1, 11))
+        proposed = [
+            # 12:00+02:00 is 10:00 UTC, inside the stored schedule
+            {"driver_id": driver.id, "street": "Quay Street", "scheduled_start_time": "2033-02-01T12:00:00+02:00", "scheduled_end_time": "2033-02-01T13:00:00+02:00"},
+            {"driver_id": driver.id, "street": "Quay Street", "scheduled_start_time": "2033-02-01T11:00:00+00:00", "scheduled_end_time": "2033-02-01T12:00:00+00:00"},
+        ]
+        results, message = ScheduleController.validate_schedules(proposed)
+        assert results is not None, message
+        assert [r["valid"] for r in results] == [False, True]
+        assert results[0]["reason"].startswith(f"Overlaps schedule {existing.id}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schedules.jsonl")
+            with open(path, "w") as f:
+                for row in proposed:
+                    f.write(json.dumps(row) + "\n")
+            report, message = ScheduleController.import_schedules(path)
+        assert report["imported"] == 1, message
+        assert [line for line, _ in report["rejected"]] == [1]
+        stored = max(ScheduleController.get_schedules_for_driver(driver.id), key=lambda s: s.scheduled_start_time)
+        assert stored.scheduled_start_time == datetime(2033, 2, 1, 11)
+
+    def test_schedule_route_is_cached_until_stops_change(self):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, "route_driver", "pass", "route_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="RT1"
+        )
+        start = datetime.utcnow() + timedelta(days=30)
+        schedule, _ = ScheduleController.create_schedule(driver.id, "Bay Road", start, start + timedelta(hours=2))
+        LocationController.update_driver_location(driver.id, "10.6000,-61.5000")
+        LocationController.flush_locations()
+        stops = []
+        for n, address in enumerate(["10.6300,-61.5000", "10.6100,-61.5000", "Unknown Lane", "10.6200,-61.5000"]):
+            resident, _ = UserController.create_user(
+                UserType.RESIDENT, f"route_resident{n}", "pass", f"route_resident{n}@mail.com", "Resident",
+                home_address=address
+            )
+            stop, _ = StopRequestController.create_stop_request(resident.id, schedule.id)
+            stops.append(stop.id)
+        StopRequestController.update_stop_request_statuses(StopRequestStatus.CONFIRMED, request_ids=stops[:3])
+
+        client = current_app.test_client()
+        url = f"/api/schedules/{schedule.id}/route"
+        assert client.get(url).status_code == 401
+        token = client.post('/api/login', json={'username': 'route_resident0', 'password': 'pass'}).json['access_token']
+        assert client.get(url, headers={'Authorization': f'Bearer {token}'}).status_code == 403
+        token = client.post('/api/login', json={'username': 'route_driver', 'password': 'pass'}).json['access_token']
+        plan = client.get(url, headers={'Authorization': f'Bearer {token}'}).json
+        assert [s["stop_request_id"] for s in plan["stops"]] == [stops[1], stops[0]]
+        assert [s["stop_request_id"] for s in plan["unlocated"]] == [stops[2]]
+        assert plan["stops"][-1]["cumulative_km"] == plan["total_km"]
+
+        again, _ = ScheduleController.get_schedule_route(schedule.id)
+        assert again is plan or again["planned_at"] == plan["planned_at"]
+        StopRequestController.update_stop_request_statuses(StopRequestStatus.CONFIRMED, request_ids=[stops[3]])
+        replanned, _ = ScheduleController.get_schedule_route(schedule.id)
+        assert [s["stop_request_id"] for s in replanned["stops"]] == [stops[1], stops[3], stops[0]]
+
+        # The van moving past the far end walks the same plan backwards instead of replanning
+        LocationController.update_driver_location(driver.id, "10.6400,-61.5000")
+        walked, _ = ScheduleController.get_schedule_route(schedule.id)
+        assert [s["stop_request_id"] for s in walked["stops"]] == [stops[0], stops[3], stops[1]]
+        assert walked["planned_at"] == replanned["planned_at"]
+        assert walked["start"] == {"lat": 10.64, "lon": -61.5}
+        assert walked["stops"][-1]["cumulative_km"] == walked["total_km"]
@@ -0,0 +1,52 @@
+import pytest, unittest
+from unittest import mock
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import UserType, Driver, Resident, DriverSchedule, StopRequest
+from App.controllers import SeedController, UserController, ScheduleController
+from App.controllers.eta import get_eta_board
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'PASSWORD_HASH_WORKERS': 0})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+'''
+    Integration Tests
+'''
+class SeedIntegrationTests(unittest.TestCase):
+
+    def test_seed_counts_and_login(self):
+        counts, message = SeedController.seed(drivers=3, residents=20, schedules=9, requests=40, seed=7)
+        assert counts == {"drivers": 3, "residents": 20, "schedules": 9, "requests": 40}
+        assert db.session.scalar(db.select(db.func.count()).select_from(Driver)) == 3
+        assert db.session.scalar(db.select(db.func.count()).select_from(Resident)) == 20
+        assert db.session.scalar(db.select(db.func.count()).select_from(DriverSchedule)) == 9
+        assert db.session.scalar(db.select(db.func.count()).select_from(StopRequest)) == 40
+
+        resident = UserController.get_users_page(user_type=UserType.RESIDENT)[0][0]
+        user = UserController.authenticate(resident.username, "password")
+        assert user is not None and user.id == resident.id
+        # Seeded schedules land in the street catalog and the upcoming list
+        assert ScheduleController.search_streets(ScheduleController.get_upcoming_schedules()[0].street)
+
+    def test_seeded_schedules_do_not_overlap(self):
+        SeedController.seed(drivers=2, residents=5, schedules=10, requests=10, seed=8)
+        by_driver = {}
+        for schedule in ScheduleController.get_upcoming_schedules():
+            by_driver.setdefault(schedule.driver_id, []).append(schedule)
+        for schedules in by_driver.values():
+            for before, after in zip(schedules, schedules[1:]):
+                assert before.scheduled_end_time <= after.scheduled_start_time
+
+    def test_seed_forgets_what_etas_knew_about_its_drivers(self):
+        with mock.patch.object(get_eta_board(current_app), "forget_drivers") as forget_drivers:
+            SeedController.seed(drivers=2, residents=2, schedules=2, requests=0, seed=9)
+        drivers = UserController.get_users_page(limit=1000, user_type=UserType.DRIVER)[0]
+        forget_drivers.assert_called_once_with([d.id for d in drivers[-2:]])
@@ -0,0 +1,58 @@
+import json, pytest, unittest
+from datetime import datetime, timedelta
+from flask import current_app
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import User, DriverSchedule, StopRequest, UserType
+from App.controllers import UserController, ScheduleController, StopRequestController, LocationController
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'GEOCODE_BATCH_INTERVAL': 0})
+    create_db()
+    resident, _ = UserController.create_user(
+        UserType.RESIDENT, "json_resident", "pass", "json_resident@mail.com", "Resident",
+        home_address="1 Main Street"
+    )
+    for n in range(2):
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, f"json_driver{n}", "pass", f"json_driver{n}@mail.com", "Driver",
+            vehicle_type="Van", license_plate=f"JSON{n}"
+        )
+    LocationController.update_driver_location(driver.id, "Corner of Main Street")
+    start = datetime.utcnow() + timedelta(hours=2)
+    schedule, _ = ScheduleController.create_schedule(driver.id, "Main Street", start, start + timedelta(hours=1))
+    StopRequestController.create_stop_request(resident.id, schedule.id)
+    yield app.test_client()
+    db.drop_all()
+
+
+class ProjectionSerializationTests(unittest.TestCase):
+
+    def test_users_match_get_json(self):
+        expected = [user.get_json() for user in User.query.order_by(User.id)]
+        assert UserController.get_all_users_json() == expected
+        assert any(user.get("location_updated_at") for user in expected)
+        assert any("location_updated_at" in user and user["location_updated_at"] is None for user in expected)
+
+    def test_user_type_pages_match_get_json(self):
+        for user_type in (UserType.RESIDENT, UserType.DRIVER):
+            users, _ = UserController.get_users_page(user_type=user_type)
+            rows, _ = UserController.get_users_json_page(user_type=user_type)
+            assert rows == [user.get_json() for user in users]
+            assert list(UserController.stream_users_json(user_type)) == rows
+
+    def test_schedules_and_stop_requests_match_get_json(self):
+        schedules, _ = ScheduleController.get_schedules_json_page()
+        assert schedules == [s.get_json() for s in DriverSchedule.query.order_by(DriverSchedule.id)]
+        stop_requests, _ = StopRequestController.get_stop_requests_json_page()
+        assert stop_requests == [r.get_json() for r in StopRequest.query.order_by(StopRequest.id)]
+
+    def test_orjson_provider_matches_stdlib_output(self):
+        payload = {"b": 1, "a": [datetime(2024, 1, 15, 9, 30)], "c": None}
+        encoded = current_app.json.dumps(payload)
+        assert encoded == json.dumps(payload, default=current_app.json.default, sort_keys=True, separators=(",", ":"))
+        assert current_app.json.loads(encoded) == {"a": ["Mon, 15 Jan 2024 09:30:00 GMT"], "b": 1, "c": None}
+        assert current_app.json.dumps({"n": 2 ** 70}) == '{"n":1180591620717411303424}'
@@ -0,0 +1,245 @@
+import itertools, sqlite3, pytest, unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from App.main import create_app
+from App.database import db, create_db
+from App.tests.helpers import count_queries
+from App.models import UserType, StopRequest, StopRequestStatus
+from App.controllers import UserController, ScheduleController, StopRequestController, LocationController
+from App.controllers.eta import get_eta_board
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'GEOCODE_BATCH_INTERVAL': 0})
+    create_db()
+    yield app.test_client()
+    db.drop_all()
+
+
+user_numbers = itertools.count(1)
+
+
+class StopRequestIntegrationTests(unittest.TestCase):
+
+    def setUp(self):
+        n = next(user_numbers)
+        self.driver, _ = UserController.create_user(
+            UserType.DRIVER, f"driver{n}", "pass", f"driver{n}@mail.com", "Driver",
+            vehicle_type="Van", license_plate="ABC123"
+        )
+        self.resident, _ = UserController.create_user(
+            UserType.RESIDENT, f"resident{n}", "pass", f"resident{n}@mail.com", "Resident",
+            home_address="1 Main Street"
+        )
+        start = datetime.utcnow() + timedelta(hours=3)
+        self.schedule, _ = ScheduleController.create_schedule(
+            self.driver.id, "Main Street", start, start + timedelta(hours=1)
+        )
+
+    def test_create_stop_request(self):
+        stop_request, message = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+        assert stop_request is not None, message
+        assert stop_request.schedule_id == self.schedule.id
+
+    def test_duplicate_stop_request_rejected_by_constraint(self):
+        first, _ = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+        second, message = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+        assert first is not None
+        assert second is None
+        assert message == "Stop request already exists for this schedule"
+        assert StopRequest.query.filter_by(resident_id=self.resident.id).count() == 1
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        for error, expected in (
+            ("FOREIGN KEY constraint failed", "Schedule or resident no longer exists"),
+            ("NOT NULL constraint failed: stop_request.status", "Error creating stop request: NOT NULL constraint failed"),
+        ):
+            failure = IntegrityError("INSERT INTO stop_request", {}, sqlite3.IntegrityError(error))
+            with mock.patch.object(db.session, "flush", side_effect=failure):
+                stop_request, message = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+            assert stop_request is None and message.startswith(expected)
+
+    def test_batch_status_update(self):
+        n = next(user_numbers)
+        other, _ = UserController.create_user(
+            UserType.RESIDENT, f"other{n}", "pass", f"other{n}@mail.com", "Other",
+            home_address="2 Main Street"
+        )
+        first, _ = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+        second, _ = StopRequestController.create_stop_request(other.id, self.schedule.id)
+        StopRequestController.update_stop_request_status(second.id, StopRequestStatus.REJECTED)
+
+        outcomes, _ = StopRequestController.update_stop_request_statuses(
+            "confirmed", request_ids=[first.id, second.id, 999999]
+        )
+        assert outcomes == [
+            {"id": first.id, "outcome": "updated", "status": "confirmed"},
+            {"id": second.id, "outcome": "invalid_transition", "status": "rejected"},
+            {"id": 999999, "outcome": "not_found", "status": None},
+        ]
+
+        outcomes, _ = StopRequestController.update_stop_request_statuses(
+            StopRequestStatus.COMPLETED, schedule_id=self.schedule.id, from_status="confirmed"
+        )
+        assert outcomes == [{"id": first.id, "outcome": "updated", "status": "completed"}]
+        assert db.session.get(StopRequest, first.id).status == StopRequestStatus.COMPLETED
+
+        # An id in another status than from_status exists, so it is an invalid transition
+        outcomes, _ = StopRequestController.update_stop_request_statuses(
+            "confirmed", request_ids=[second.id], from_status="requested"
+        )
+        assert outcomes == [{"id": second.id, "outcome": "invalid_transition", "status": "rejected"}]
+
+    def test_batch_status_update_rejects_malformed_ids(self):
+        for ids in (["abc"], [None], [{}], 5, [1.5], ["2"], [True]):
+            outcomes, message = StopRequestController.update_stop_request_statuses("confirmed", request_ids=ids)
+            assert outcomes is None and message == "Stop request ids must be integers"
+        client = current_app.test_client()
+        token = client.post('/api/login', json={'username': self.driver.username, 'password': 'pass'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        response = client.post('/api/stop-requests/status', json={'ids': ['abc'], 'status': 'confirmed'},
+                               headers=headers)
+        assert response.status_code == 400
+        # A body that isn't a JSON object is a bad request, not a server error
+        for body in ([1, 2], "confirmed", 3):
+            assert client.post('/api/stop-requests/status', json=body, headers=headers).status_code == 400
+            assert client.post(f'/api/schedules/{self.schedule.id}/stop-requests/status', json=body,
+                               headers=headers).status_code == 400
+
+    def test_batch_status_update_scoped_to_driver(self):
+        stop_request, _ = StopRequestController.create_stop_request(self.resident.id, self.schedule.id)
+        outcomes, _ = StopRequestController.update_stop_request_statuses(
+            "confirmed", request_ids=[stop_request.id], driver_id=self.driver.id + 1000
+        )
+        assert outcomes == [{"id": stop_request.id, "outcome": "not_found", "status": None}]
+
+    def test_create_stop_request_endpoint(self):
+        client = current_app.test_client()
+        token = client.post('/api/login', json={'username': self.resident.username, 'password': 'pass'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        response = client.post('/api/stop-requests', json={'schedule_id': self.schedule.id}, headers=headers)
+        assert response.status_code == 201
+        assert response.json['resident_id'] == self.resident.id
+        response = client.post('/api/stop-requests', json={'schedule_id': self.schedule.id}, headers=headers)
+        assert response.status_code == 400
+
+    def test_etas_follow_driver_pings(self):
+        residents, stops = [], []
+        for n, address in enumerate(["10.6200,-61.5000", "10.6100,-61.5000"]):
+            resident, _ = UserController.create_user(
+                UserType.RESIDENT, f"eta{self.driver.id}_{n}", "pass", f"eta{self.driver.id}_{n}@mail.com",
+                "Resident", home_address=address
+            )
+            residents.append(resident)
+            stops.append(StopRequestController.create_stop_request(resident.id, self.schedule.id)[0].id)
+        StopRequestController.update_stop_request_statuses(StopRequestStatus.CONFIRMED, request_ids=stops)
+        # The schedule is running now
+        self.schedule.scheduled_start_time = datetime.utcnow() - timedelta(minutes=10)
+        db.session.commit()
+
+        LocationController.update_driver_location(self.driver.id, "10.6000,-61.5000")
+        # The ping only publishes; the route is planned by the first read
+        assert self.schedule.id not in get_eta_board(current_app).routes
+        near, message = StopRequestController.get_stop_eta(self.schedule.id, residents[1].id)
+        far, _ = StopRequestController.get_stop_eta(self.schedule.id, residents[0].id)
+        assert near["position"] == 0 and far["position"] == 1, message
+        assert abs(far["distance_km"] - 2.224) < 0.01
+        assert near["eta"] < far["eta"]
+
+        # Closer to the stops, earlier arrivals
+        LocationController.update_driver_location(self.driver.id, "10.6050,-61.5000")
+        assert StopRequestController.get_stop_eta(self.schedule.id, residents[1].id)[0]["eta"] < near["eta"]
+
+        client = current_app.test_client()
+        token = client.post('/api/login', json={'username': residents[0].username, 'password': 'pass'}).json['access_token']
+        response = client.get(f'/api/schedules/{self.schedule.id}/eta', headers={'Authorization': f'Bearer {token}'})
+        assert response.json['stop_request_id'] == stops[0]
+        token = client.post('/api/login', json={'username': self.driver.username, 'password': 'pass'}).json['access_token']
+        response = client.get(f'/api/schedules/{self.schedule.id}/eta', headers={'Authorization': f'Bearer {token}'})
+        assert [eta['stop_request_id'] for eta in response.json['stops']] == [stops[1], stops[0]]
+
+        # Past the near stop only the far one is left, priced from where the van is
+        LocationController.update_driver_location(self.driver.id, "10.6150,-61.5000")
+        etas, _ = StopRequestController.get_schedule_etas(self.schedule.id)
+        assert [eta['stop_request_id'] for eta in etas['stops']] == [stops[0]]
+        assert abs(etas['stops'][0]['distance_km'] - 0.556) < 0.01
+
+        # A completed stop drops the schedule's ETAs until the next ping
+        StopRequestController.update_stop_request_statuses(StopRequestStatus.COMPLETED, request_ids=stops[1:])
+        assert StopRequestController.get_stop_eta(self.schedule.id, residents[0].id)[0] is None
+        LocationController.update_driver_location(self.driver.id, "10.6100,-61.5000")
+        assert StopRequestController.get_schedule_etas(self.schedule.id)[0]["stops"][0]["stop_request_id"] == stops[0]
+        LocationController.flush_locations()
+
+    def test_off_duty_drivers_are_remembered_until_a_schedule_is_created(self):
+        board = get_eta_board(current_app)
+        now = datetime.utcnow()
+        assert board.running(self.driver.id, now) is None
+        # Off duty until the setUp schedule starts in three hours: no query for the next ping
+        assert count_queries(lambda: board.running(self.driver.id, now + timedelta(seconds=1))) == 0
+        assert board.active[self.driver.id][1] <= now + timedelta(seconds=board.off_duty_ttl)
+
+        schedule, _ = ScheduleController.create_schedule(
+            self.driver.id, "Main Street", now - timedelta(minutes=5), now + timedelta(minutes=30)
+        )
+        assert board.running(self.driver.id, now + timedelta(seconds=2)) == (schedule.id, schedule.scheduled_end_time)
+
+
+class EagerLoadingIntegrationTests(unittest.TestCase):
+
+    def create_schedule_with_requests(self, size):
+        """A schedule with `size` stop requests from distinct residents, plus `size` other drivers' schedules"""
+        start = datetime.utcnow() + timedelta(hours=3)
+        schedule = None
+        for _ in range(size):
+            n = next(user_numbers)
+            driver, _ = UserController.create_user(
+                UserType.DRIVER, f"eager_driver{n}", "pass", f"eager_driver{n}@mail.com", f"Driver {n}",
+                vehicle_type="Van", license_plate=f"EAGER{n}"
+            )
+            other, _ = ScheduleController.create_schedule(driver.id, "Elm Lane", start, start + timedelta(hours=1))
+            schedule = schedule or other
+            resident, _ = UserController.create_user(
+                UserType.RESIDENT, f"eager_resident{n}", "pass", f"eager_resident{n}@mail.com", f"Resident {n}",
+                home_address=f"{n} Elm Lane"
+            )
+            StopRequestController.create_stop_request(resident.id, schedule.id)
+        schedule_id = schedule.id
+        db.session.expunge_all()
+        return schedule_id
+
+    def related_query_counts(self, size):
+        schedule_id = self.create_schedule_with_requests(size)
+
+        def stop_requests():
+            for req in StopRequestController.get_stop_requests_by_schedule(schedule_id, with_related=True):
+                (req.resident.name, req.schedule.street, req.schedule.driver.name)
+
+        def schedule_detail():
+            schedule = ScheduleController.get_schedule_by_id(schedule_id, with_related=True)
+            [(req.resident.name, schedule.driver.name) for req in schedule.stop_requests]
+
+        def upcoming():
+            [s.driver.name for s in ScheduleController.get_upcoming_schedules(with_related=True)]
+
+        # The upcoming list itself comes from the per-worker cache; count the loading of the schedules
+        ScheduleController.get_upcoming_schedules_json()
+        counts = []
+        for func in (stop_requests, schedule_detail, upcoming):
+            db.session.expunge_all()
+            counts.append(count_queries(func))
+        return counts
+
+    def test_query_count_does_not_grow_with_results(self):
+        assert self.related_query_counts(2) == self.related_query_counts(6) == [1, 2, 1]
+
+    def test_lazy_loading_grows_with_results(self):
+        schedule_id = self.create_schedule_with_requests(3)
+        lazy = count_queries(
+            lambda: [req.resident.name for req in StopRequestController.get_stop_requests_by_schedule(schedule_id)]
+        )
+        assert lazy > 3
@@ -0,0 +1,226 @@
+import json, os, subprocess, sys, pytest, unittest
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+from App.main import create_app
+from App.database import db, create_db
+from App.tests.helpers import count_queries
+from App.models import UserType
+from App.controllers import UserController, update_user
+from App.controllers.identity_cache import IdentityCache, UserSnapshot
+from App.controllers.relay import WorkerRelay
+from App.hashing import PasswordHasher
+
+
+@pytest.fixture(autouse=True, scope="module")
+def empty_db():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'GEOCODE_BATCH_INTERVAL': 0})
+    create_db()
+    for n in range(5):
+        UserController.create_user(
+            UserType.RESIDENT, f"page_resident{n}", "pass", f"page_resident{n}@mail.com", "Resident",
+            home_address=f"{n} Main Street"
+        )
+        UserController.create_user(
+            UserType.DRIVER, f"page_driver{n}", "pass", f"page_driver{n}@mail.com", "Driver",
+            vehicle_type="Van", license_plate=f"PAGE{n}"
+        )
+    yield app.test_client()
+    db.drop_all()
+
+
+class UserListingIntegrationTests(unittest.TestCase):
+
+    def test_keyset_pages_cover_every_user_once(self):
+        client = current_app.test_client()
+        seen, url = [], "/api/users?limit=3"
+        while url:
+            response = client.get(url)
+            seen.extend(user["id"] for user in response.json)
+            next_after_id = response.headers.get("X-Next-After-Id")
+            url = f"/api/users?limit=3&after_id={next_after_id}" if next_after_id else None
+        assert seen == sorted(seen)
+        assert len(seen) == 10
+
+    def test_resident_and_driver_listings(self):
+        client = current_app.test_client()
+        residents = client.get("/api/residents").json
+        drivers = client.get("/api/drivers").json
+        assert [u["user_type"] for u in residents] == ["resident"] * 5
+        assert all("vehicle_type" in u for u in drivers)
+
+    def test_streaming_matches_paged_output(self):
+        client = current_app.test_client()
+        paged = client.get("/api/users?limit=1000").json
+        # Without paging parameters the whole list comes back, as before paging existed
+        assert json.loads(client.get("/api/users").get_data(as_text=True)) == paged
+        streamed = json.loads(client.get("/api/users?stream=json").get_data(as_text=True))
+        lines = client.get("/api/users?stream=ndjson").get_data(as_text=True).splitlines()
+        assert streamed == paged
+        assert [json.loads(line) for line in lines] == paged
+
+    def test_users_page_lists_everyone_unless_paged(self):
+        client = current_app.test_client()
+        page_size = current_app.config["PAGE_SIZE_DEFAULT"]
+        current_app.config["PAGE_SIZE_DEFAULT"] = 3
+        try:
+            listed = client.get("/users").get_data(as_text=True)
+            paged = client.get("/users?after_id=0").get_data(as_text=True)
+        finally:
+            current_app.config["PAGE_SIZE_DEFAULT"] = page_size
+        assert all(f"page_driver{n}" in listed for n in range(5))
+        assert "page_driver4" not in paged
+
+
+class PolymorphicLoadingIntegrationTests(unittest.TestCase):
+
+    def serialize_all(self, polymorphic):
+        db.session.expunge_all()
+        return [user.get_json() for user in UserController.get_all_users(polymorphic=polymorphic)]
+
+    def test_subtype_columns_load_in_constant_queries(self):
+        expected = self.serialize_all(None)
+        assert count_queries(lambda: self.serialize_all(None)) > len(expected)
+        assert count_queries(lambda: self.serialize_all("selectin")) == 3
+        assert count_queries(lambda: self.serialize_all("joined")) == 1
+        assert self.serialize_all("selectin") == self.serialize_all("joined") == expected
+
+    def test_pages_and_streams_take_a_strategy(self):
+        def page_and_stream():
+            db.session.expunge_all()
+            users, _ = UserController.get_users_page(limit=1000, polymorphic="joined")
+            streamed = list(UserController.stream_users(polymorphic="joined"))
+            return [u.get_json() for u in users + streamed]
+        assert count_queries(page_and_stream) == 2
+        with self.assertRaises(ValueError):
+            UserController.get_users_page(polymorphic="eager")
+
+
+class PasswordHasherUnitTests(unittest.TestCase):
+
+    def test_pool_hashes_verify_and_match_configured_method(self):
+        hasher = PasswordHasher("pbkdf2:sha256:1000", workers=1)
+        try:
+            hashes = hasher.hash_many(["a", "b"])
+            assert hasher.verify(hashes[0], "a")
+            assert not hasher.verify(hashes[1], "a")
+            assert not hasher.needs_rehash(hasher.hash("c"))
+            assert hasher.needs_rehash(generate_password_hash("c", "pbkdf2:sha256:2000"))
+        finally:
+            hasher.close()
+
+    def test_gevent_workers_hash_on_the_gevent_thread_pool(self):
+        script = (
+            "from gevent import monkey; monkey.patch_all()\n"
+            "import gevent\n"
+            "from App.hashing import PasswordHasher\n"
+            "hasher = PasswordHasher('pbkdf2:sha256:1000', workers=2)\n"
+            "jobs = [gevent.spawn(hasher.hash, str(n)) for n in range(4)]\n"
+            "gevent.joinall(jobs, raise_error=True)\n"
+            "assert all(hasher.verify(job.value, str(n)) for n, job in enumerate(jobs))\n"
+            "print(type(hasher.pool).__module__)\n"
+            "hasher.close()\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "gevent.threadpool"
+
+    def test_method_defaults_are_filled_in(self):
+        hasher = PasswordHasher("pbkdf2", workers=0)
+        assert not hasher.needs_rehash(generate_password_hash("x", "pbkdf2"))
+
+
+class PasswordUpgradeIntegrationTests(unittest.TestCase):
+
+    def test_login_upgrades_outdated_hash(self):
+        user, _ = UserController.create_user(
+            UserType.RESIDENT, "legacy_hash", "secret", "legacy_hash@mail.com", "Legacy",
+            home_address="9 Main Street"
+        )
+        user.password = generate_password_hash("secret", "pbkdf2:sha256:1000")
+        db.session.commit()
+
+        assert UserController.authenticate("legacy_hash", "wrong") is None
+        assert user.password.startswith("pbkdf2:sha256:1000$")
+        assert UserController.authenticate("legacy_hash", "secret") is not None
+        assert user.password.startswith(current_app.config["PASSWORD_HASH_METHOD"] + "$")
+        assert user.check_password("secret")
+
+
+class IdentityCacheUnitTests(unittest.TestCase):
+
+    def snapshot(self, user_id):
+        return UserSnapshot(user_id, f"user{user_id}", f"user{user_id}@mail.com", "User", UserType.RESIDENT)
+
+    def test_lru_eviction_and_hit_ratio(self):
+        cache = IdentityCache(WorkerRelay(None), max_size=2, ttl=60)
+        for user_id in (1, 2, 1, 3, 2):
+            cache.get(user_id, self.snapshot)
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["size"], stats["evictions"]) == (1, 4, 2, 2)
+
+    def test_invalidation_reaches_every_cache_on_the_relay(self):
+        relay = WorkerRelay(None)
+        first, second = IdentityCache(relay), IdentityCache(relay)
+        first.get(1, self.snapshot)
+        second.get(1, self.snapshot)
+        first.invalidate(1)
+        assert first.stats()["size"] == second.stats()["size"] == 0
+
+    def test_snapshot_is_read_only(self):
+        with self.assertRaises(AttributeError):
+            self.snapshot(1).username = "changed"
+
+
+class IdentityCacheIntegrationTests(unittest.TestCase):
+
+    def test_jwt_lookups_are_cached_until_the_user_changes(self):
+        user, _ = UserController.create_user(
+            UserType.DRIVER, "cached_driver", "pass", "cached_driver@mail.com", "Driver",
+            vehicle_type="Van", license_plate="CACHE1"
+        )
+        client = current_app.test_client()
+        token = client.post("/api/login", json={"username": "cached_driver", "password": "pass"}).json["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        before = client.get("/api/diagnostics/identity-cache").json
+        assert "cached_driver" in client.get("/api/identify", headers=headers).json["message"]
+        assert "cached_driver" in client.get("/api/identify", headers=headers).json["message"]
+        after = client.get("/api/diagnostics/identity-cache").json
+        assert after["hits"] - before["hits"] == 1
+
+        update_user(user.id, "renamed_driver")
+        assert "renamed_driver" in client.get("/api/identify", headers=headers).json["message"]
+
+
+class RequestAuthIntegrationTests(unittest.TestCase):
+
+    def lookups(self, client):
+        stats = client.get("/api/diagnostics/identity-cache").json
+        return stats["hits"] + stats["misses"]
+
+    def test_user_resolved_once_per_rendered_page(self):
+        UserController.create_user(
+            UserType.RESIDENT, "render_once", "pass", "render_once@mail.com", "Resident",
+            home_address="3 Main Street"
+        )
+        client = current_app.test_client()
+        token = client.post("/api/login", json={"username": "render_once", "password": "pass"}).json["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for url in ("/identify", "/users"):
+            before = self.lookups(client)
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200
+            assert self.lookups(client) - before == 1
+
+        # the next request must not see the previous request's user
+        assert b"Welcome render_once" not in current_app.test_client().get("/").data
+
+    def test_anonymous_and_bad_tokens_render_without_lookups(self):
+        client = current_app.test_client()
+        before = self.lookups(client)
+        assert client.get("/users").status_code == 200
+        assert client.get("/users", headers={"Authorization": "Bearer not-a-token"}).status_code == 200
+        assert self.lookups(client) == before
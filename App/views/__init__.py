@@ -3,8 +3,11 @@
 from .user import user_views
 from .index import index_views
 from .auth import auth_views
+from .schedule import schedule_views
+from .stop_request import stop_request_views
+from .location import location_views
 from .admin import setup_admin
 
 
-views = [user_views, index_views, auth_views] 
+views = [user_views, index_views, auth_views, schedule_views, stop_request_views, location_views] 
 # blueprints must be added to this list
\ No newline at end of file
@@ -1,9 +1,11 @@
 from flask_admin.contrib.sqla import ModelView
 from flask_jwt_extended import jwt_required, current_user, unset_jwt_cookies, set_access_cookies
 from flask_admin import Admin
-from flask import flash, redirect, url_for, request
+from flask import current_app, flash, redirect, url_for, request
 from App.database import db
 from App.models import User
+from App.controllers.identity_cache import get_identity_cache
+from App.controllers.geocoder import get_geocode_queue
 
 class AdminView(ModelView):
 
@@ -11,6 +13,14 @@ class AdminView(ModelView):
     def is_accessible(self):
         return current_user is not None
 
+    def after_model_change(self, form, model, is_created):
+        get_identity_cache(current_app).invalidate(model.id)
+        if getattr(model, "home_address", None):
+            get_geocode_queue(current_app).submit([model.home_address])
+
+    def after_model_delete(self, model):
+        get_identity_cache(current_app).invalidate(model.id)
+
     def inaccessible_callback(self, name, **kwargs):
         # redirect to login page if user doesn't have access
         flash("Login to access admin")
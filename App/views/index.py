@@ -1,5 +1,9 @@
-from flask import Blueprint, redirect, render_template, request, send_from_directory, jsonify
+from flask import Blueprint, Response, current_app, redirect, render_template, request, send_from_directory, jsonify
+from flask_jwt_extended import jwt_required
 from App.controllers import create_user, initialize
+from App.controllers.identity_cache import get_identity_cache
+from App.instrumentation import get_metrics
+from App.database import db, pool_stats
 
 index_views = Blueprint('index_views', __name__, template_folder='../templates')
 
@@ -14,4 +18,21 @@ def init():
 
 @index_views.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status':'healthy'})
\ No newline at end of file
+    return jsonify({'status':'healthy'})
+
+@index_views.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(get_metrics(current_app).render(), mimetype='text/plain; version=0.0.4')
+
+@index_views.route('/api/diagnostics/identity-cache', methods=['GET'])
+def identity_cache_stats():
+    return jsonify(get_identity_cache(current_app).stats())
+
+@index_views.route('/api/diagnostics/pool', methods=['GET'])
+@jwt_required()
+def pool_diagnostics():
+    options = {
+        key: value for key, value in current_app.config['SQLALCHEMY_ENGINE_OPTIONS'].items() if key != 'connect_args'
+    }
+    pools = {bind or 'default': pool_stats(engine) for bind, engine in db.engines.items()}
+    return jsonify(pools=pools, engine_options=options)
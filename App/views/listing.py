@@ -0,0 +1,62 @@
+from flask import Response, current_app, jsonify, request, stream_with_context, url_for
+
+STREAM_FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+
+def as_is(item):
+    return item
+
+
+def stream_items(items, serialize, fmt, batch=100):
+    """Encode items as a JSON array or NDJSON, yielding one chunk per `batch` items"""
+    dumps = current_app.json.dumps
+    if fmt == 'ndjson':
+        chunk = []
+        for item in items:
+            chunk.append(dumps(serialize(item)) + '\n')
+            if len(chunk) >= batch:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+        return
+
+    yield '['
+    prefix, chunk = '', []
+    for item in items:
+        chunk.append(dumps(serialize(item)))
+        if len(chunk) >= batch:
+            yield prefix + ','.join(chunk)
+            prefix, chunk = ',', []
+    if chunk:
+        yield prefix + ','.join(chunk)
+    yield ']'
+
+
+def list_response(get_page, stream, serialize=as_is, **filters):
+    """Keyset-paginated (?after_id=&limit=) or streamed (?stream=json|ndjson) list endpoint.
+
+    Paging is opt-in: without after_id or limit the whole list is returned
+    as one JSON array, as before, read in keyset batches. Pages are plain
+    JSON arrays; the cursor for the next page is returned in the
+    X-Next-After-Id header and a Link rel="next" header.
+    """
+    fmt = request.args.get('stream')
+    if not fmt and 'after_id' not in request.args and 'limit' not in request.args:
+        return jsonify([serialize(item) for item in stream(**filters)])
+    if fmt:
+        if fmt not in STREAM_FORMATS:
+            return jsonify(message=f"stream must be one of {', '.join(STREAM_FORMATS)}"), 400
+        body = stream_with_context(stream_items(stream(**filters), serialize, fmt))
+        return Response(body, mimetype=STREAM_FORMATS[fmt])
+
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    items, next_after_id = get_page(after_id=after_id, limit=limit, **filters)
+    response = jsonify([serialize(item) for item in items])
+    if next_after_id is not None:
+        args = request.args.to_dict()
+        args['after_id'] = next_after_id
+        response.headers['X-Next-After-Id'] = str(next_after_id)
+        response.headers['Link'] = f'<{url_for(request.endpoint, **request.view_args, **args)}>; rel="next"'
+    return response
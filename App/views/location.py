@@ -0,0 +1,87 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, current_user
+from queue import Empty
+import json
+
+from App.controllers import LocationController
+
+location_views = Blueprint('location_views', __name__, template_folder='../templates')
+
+
+def sse_event(data, event="location"):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+'''
+API Routes
+'''
+
+@location_views.route('/api/drivers/<int:driver_id>/location', methods=['GET'])
+def get_driver_location_action(driver_id):
+    location, message = LocationController.get_driver_location(driver_id)
+    if not location:
+        return jsonify(message=message), 404
+    return jsonify(location)
+
+@location_views.route('/api/drivers/<int:driver_id>/location', methods=['POST'])
+@jwt_required()
+def update_driver_location_action(driver_id):
+    if current_user.id != driver_id:
+        return jsonify(message='drivers can only update their own location'), 403
+    data = request.json or {}
+    if not data.get('location'):
+        return jsonify(message='location is required'), 400
+    driver, message = LocationController.update_driver_location(driver_id, data['location'])
+    if not driver:
+        return jsonify(message=message), 400
+    return jsonify(message=message)
+
+@location_views.route('/api/drivers/nearest', methods=['GET'])
+def get_nearest_drivers_action():
+    lat, lon = request.args.get('lat', type=float), request.args.get('lon', type=float)
+    if lat is None or lon is None:
+        return jsonify(message='lat and lon are required'), 400
+    drivers, message = LocationController.get_nearest_drivers(
+        lat, lon, k=request.args.get('k', 5, type=int), max_km=request.args.get('max_km', type=float)
+    )
+    if drivers is None:
+        return jsonify(message=message), 400
+    return jsonify(drivers)
+
+@location_views.route('/api/drivers/<int:driver_id>/status', methods=['POST'])
+@jwt_required()
+def update_driver_status_action(driver_id):
+    if current_user.id != driver_id:
+        return jsonify(message='drivers can only update their own status'), 403
+    data = request.json or {}
+    driver, message = LocationController.update_driver_status(driver_id, data.get('status'))
+    if not driver:
+        return jsonify(message=message), 400
+    return jsonify(message=message)
+
+@location_views.route('/api/drivers/<int:driver_id>/location/stream', methods=['GET'])
+def stream_driver_location_action(driver_id):
+    # Only the initial snapshot reads the database; later events come from the hub
+    location, message = LocationController.get_driver_location(driver_id)
+    if not location:
+        return jsonify(message=message), 404
+    queue = LocationController.subscribe(driver_id)
+    heartbeat = current_app.config['LOCATION_STREAM_HEARTBEAT']
+    app = current_app._get_current_object()
+
+    def events():
+        try:
+            yield sse_event(location)
+            while True:
+                try:
+                    yield sse_event(queue.get(timeout=heartbeat))
+                except Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            with app.app_context():
+                LocationController.unsubscribe(driver_id, queue)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
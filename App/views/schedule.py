@@ -0,0 +1,59 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, current_user
+from datetime import timedelta
+
+from.listing import list_response
+
+from App.controllers import ScheduleController
+
+schedule_views = Blueprint('schedule_views', __name__, template_folder='../templates')
+
+
+'''
+API Routes
+'''
+
+@schedule_views.route('/api/schedules', methods=['GET'])
+def get_schedules_action():
+    return list_response(
+        ScheduleController.get_schedules_json_page, ScheduleController.stream_schedules_json,
+        driver_id=request.args.get('driver_id', type=int)
+    )
+
+@schedule_views.route('/api/schedules/upcoming', methods=['GET'])
+def get_upcoming_schedules_action():
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify(message='limit must be a positive integer'), 400
+    return jsonify(ScheduleController.get_upcoming_schedules_json(limit=limit))
+
+@schedule_views.route('/api/schedules/validate', methods=['POST'])
+@jwt_required()
+def validate_schedules_action():
+    data = request.json
+    proposed = data.get('schedules') if isinstance(data, dict) else data
+    if not isinstance(proposed, list):
+        return jsonify(message='expected a list of schedules'), 400
+    limit = current_app.config['SCHEDULE_VALIDATE_MAX_ITEMS']
+    if len(proposed) > limit:
+        return jsonify(message=f'at most {limit} schedules can be validated at once'), 400
+    results, message = ScheduleController.validate_schedules(
+        proposed, max_span=timedelta(hours=current_app.config['SCHEDULE_MAX_SPAN_HOURS'])
+    )
+    if results is None:
+        return jsonify(message=message), 400
+    return jsonify(message=message, results=results)
+
+@schedule_views.route('/api/schedules/<int:schedule_id>/route', methods=['GET'])
+@jwt_required()
+def get_schedule_route_action(schedule_id):
+    # The route lists residents' names and home addresses: only the schedule's driver may see it
+    schedule = ScheduleController.get_schedule_by_id(schedule_id)
+    if schedule is None:
+        return jsonify(message='Schedule not found'), 404
+    if schedule.driver_id != current_user.id:
+        return jsonify(message='drivers can only see routes of their own schedules'), 403
+    plan, message = ScheduleController.get_schedule_route(schedule_id)
+    if plan is None:
+        return jsonify(message=message), 404
+    return jsonify(plan)
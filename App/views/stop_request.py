@@ -0,0 +1,79 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, current_user
+
+from.listing import list_response
+
+from App.models import UserType
+from App.controllers import StopRequestController
+
+stop_request_views = Blueprint('stop_request_views', __name__, template_folder='../templates')
+
+
+'''
+API Routes
+'''
+
+@stop_request_views.route('/api/stop-requests', methods=['GET'])
+def get_stop_requests_action():
+    return list_response(
+        StopRequestController.get_stop_requests_json_page, StopRequestController.stream_stop_requests_json,
+        schedule_id=request.args.get('schedule_id', type=int),
+        resident_id=request.args.get('resident_id', type=int)
+    )
+
+@stop_request_views.route('/api/stop-requests', methods=['POST'])
+@jwt_required()
+def create_stop_request_action():
+    if current_user.user_type != UserType.RESIDENT:
+        return jsonify(message='only residents can request stops'), 403
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('schedule_id'), int):
+        return jsonify(message='schedule_id is required'), 400
+    stop_request, message = StopRequestController.create_stop_request(current_user.id, data['schedule_id'])
+    if not stop_request:
+        return jsonify(message=message), 400
+    return jsonify(stop_request.get_json()), 201
+
+@stop_request_views.route('/api/stop-requests/status', methods=['POST'])
+@jwt_required()
+def update_stop_request_statuses_action():
+    if current_user.user_type != UserType.DRIVER:
+        return jsonify(message='only drivers can update stop requests'), 403
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+        return jsonify(message='ids must be a list of stop request ids'), 400
+    outcomes, message = StopRequestController.update_stop_request_statuses(
+        data.get('status'), request_ids=data['ids'], driver_id=current_user.id
+    )
+    if outcomes is None:
+        return jsonify(message=message), 400
+    return jsonify(message=message, results=outcomes)
+
+@stop_request_views.route('/api/schedules/<int:schedule_id>/stop-requests/status', methods=['POST'])
+@jwt_required()
+def update_schedule_stop_request_statuses_action(schedule_id):
+    if current_user.user_type != UserType.DRIVER:
+        return jsonify(message='only drivers can update stop requests'), 403
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify(message='expected a JSON object with a status'), 400
+    outcomes, message = StopRequestController.update_stop_request_statuses(
+        data.get('status'), schedule_id=schedule_id, from_status=data.get('from_status'),
+        driver_id=current_user.id
+    )
+    if outcomes is None:
+        return jsonify(message=message), 400
+    return jsonify(message=message, results=outcomes)
+
+@stop_request_views.route('/api/schedules/<int:schedule_id>/eta', methods=['GET'])
+@jwt_required()
+def get_schedule_eta_action(schedule_id):
+    if current_user.user_type == UserType.RESIDENT:
+        eta, message = StopRequestController.get_stop_eta(schedule_id, current_user.id)
+    else:
+        eta, message = StopRequestController.get_schedule_etas(schedule_id)
+        if eta and eta['driver_id'] != current_user.id:
+            return jsonify(message='drivers can only see ETAs for their own schedules'), 403
+    if eta is None:
+        return jsonify(message=message), 404
+    return jsonify(eta)
@@ -2,20 +2,26 @@ from flask import Blueprint, render_template, jsonify, request, send_from_direct
 from flask_jwt_extended import jwt_required, current_user as jwt_current_user
 
 from.index import index_views
+from.listing import list_response
 
+from App.models import UserType
 from App.controllers import (
-    create_user,
-    get_all_users,
-    get_all_users_json,
-    jwt_required
+    UserController,
+    create_user
 )
 
 user_views = Blueprint('user_views', __name__, template_folder='../templates')
 
 @user_views.route('/users', methods=['GET'])
 def get_user_page():
-    users = get_all_users()
-    return render_template('users.html', users=users)
+    # Paging is opt-in here too: without after_id or limit every user is listed
+    if 'after_id' not in request.args and 'limit' not in request.args:
+        return render_template('users.html', users=UserController.get_all_users(), next_after_id=None)
+    users, next_after_id = UserController.get_users_page(
+        after_id=request.args.get('after_id', type=int),
+        limit=request.args.get('limit', type=int)
+    )
+    return render_template('users.html', users=users, next_after_id=next_after_id)
 
 @user_views.route('/users', methods=['POST'])
 def create_user_action():
@@ -26,8 +32,15 @@ def create_user_action():
 
 @user_views.route('/api/users', methods=['GET'])
 def get_users_action():
-    users = get_all_users_json()
-    return jsonify(users)
+    return list_response(UserController.get_users_json_page, UserController.stream_users_json)
+
+@user_views.route('/api/residents', methods=['GET'])
+def get_residents_action():
+    return list_response(UserController.get_users_json_page, UserController.stream_users_json, user_type=UserType.RESIDENT)
+
+@user_views.route('/api/drivers', methods=['GET'])
+def get_drivers_action():
+    return list_response(UserController.get_users_json_page, UserController.stream_users_json, user_type=UserType.DRIVER)
 
 @user_views.route('/api/users', methods=['POST'])
 def create_user_endpoint():
@@ -0,0 +1,94 @@
+"""
+Auth resolution benchmark for rendered pages.
+
+Renders /users and /identify anonymously and with a JWT, counting SQL
+statements and timing each request, once with the original template
+context processor (its own verify_jwt_in_request + db.session.get on every
+render, printing an exception for anonymous visitors) and once with the
+request-scoped resolver the app uses now.
+
+    python -m benchmarks.auth_resolution --requests 500
+"""
+import argparse, contextlib, io, os, tempfile, time
+
+from flask.globals import app_ctx
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import User, UserType
+from App.controllers import UserController
+
+
+def legacy_inject_user():
+    try:
+        verify_jwt_in_request()
+        identity = get_jwt_identity()
+        user_id = int(identity) if identity is not None else None
+        current_user = db.session.get(User, user_id) if user_id is not None else None
+        is_authenticated = current_user is not None
+    except Exception as e:
+        print(e)
+        is_authenticated = False
+        current_user = None
+    return dict(is_authenticated=is_authenticated, current_user=current_user)
+
+
+def use_legacy_context(app):
+    processors = app.template_context_processors[None]
+    processors[:] = [p for p in processors if p.__name__ != "inject_user"] + [legacy_inject_user]
+    # the original user_lookup_loader went to the database every time
+    app.config["IDENTITY_CACHE_SIZE"] = 0
+
+
+def measure(app, url, headers, requests):
+    client = app.test_client()
+    statements = []
+    listener = lambda *args: statements.append(1)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(requests):
+            assert client.get(url, headers=headers).status_code == 200
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", listener)
+    return len(statements) / requests, elapsed / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "PASSWORD_HASH_WORKERS": 0,
+                      "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000"})
+    create_db()
+    for n in range(args.users):
+        UserController.create_user(UserType.DRIVER, f"driver{n}", "pass", f"driver{n}@example.com", "Driver",
+                                   vehicle_type="Van", license_plate=f"BENCH{n}")
+    app_ctx.pop()  # from here every request gets its own app context and session, as under gunicorn
+    token = app.test_client().post("/api/login", json={"username": "driver0", "password": "pass"}).json["access_token"]
+
+    cases = [
+        ("/users anonymous", "/users", {}),
+        ("/users with JWT", "/users", {"Authorization": f"Bearer {token}"}),
+        ("/identify with JWT", "/identify", {"Authorization": f"Bearer {token}"}),
+    ]
+    legacy_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    app_ctx.pop()
+    use_legacy_context(legacy_app)
+
+    print(f"{'page':<22}{'legacy SQL/req':>16}{'SQL/req':>10}{'legacy ms':>12}{'ms':>8}")
+    for label, url, headers in cases:
+        legacy_queries, legacy_latency = measure(legacy_app, url, headers, args.requests)
+        queries, latency = measure(app, url, headers, args.requests)
+        print(f"{label:<22}{legacy_queries:>16.1f}{queries:>10.1f}{legacy_latency * 1000:>12.3f}{latency * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
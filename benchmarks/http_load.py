@@ -0,0 +1,301 @@
+"""
+End-to-end HTTP load test of gunicorn configurations.
+
+For each --configs entry (worker_class:workers) this seeds a fresh
+database, starts gunicorn with gunicorn_config.py on a free local port
+(overriding only the worker class and count) and runs --clients
+concurrent asyncio clients for --duration seconds. Residents log in, poll
+driver locations and upcoming schedules and request stops; drivers log
+in, ping their location and confirm stop requests on their schedules.
+Reports throughput and p50/p95/p99 latency per endpoint, then one line per
+configuration to compare them.
+
+    python -m benchmarks.http_load --configs gevent:4,gthread:4,sync:4 --clients 200 --duration 30
+    python -m benchmarks.http_load --postgres-url postgresql://localhost/breadvan_bench
+
+The PostgreSQL database is dropped and recreated: point it at a scratch database.
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, tempfile, time
+from collections import defaultdict
+from urllib.request import urlopen
+
+from flask.globals import app_ctx
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import User, UserType, DriverSchedule
+from App.controllers import SeedController
+
+PASSWORD = "password"
+DRIVER_SHARE = 0.1  # fraction of clients that are drivers
+
+# Think time between a client's requests, seconds
+RESIDENT_PAUSE = (0.2, 1.0)
+DRIVER_PAUSE = (0.5, 2.0)
+
+
+def seed(url, counts):
+    """Fresh schema and seeded data; returns the users and schedules the clients act as and on"""
+    create_app({"SQLALCHEMY_DATABASE_URI": url, "PASSWORD_HASH_WORKERS": 0})
+    try:
+        db.drop_all()
+        create_db()
+        _, message = SeedController.seed(password=PASSWORD, seed=1, **counts)
+        print(message)
+        users = db.session.execute(db.select(User.id, User.username, User.user_type)).all()
+        schedules = db.session.execute(db.select(DriverSchedule.id, DriverSchedule.driver_id)).all()
+        drivers = [(u.id, u.username) for u in users if u.user_type == UserType.DRIVER]
+        residents = [(u.id, u.username) for u in users if u.user_type == UserType.RESIDENT]
+        driver_schedules = defaultdict(list)
+        for schedule_id, driver_id in schedules:
+            driver_schedules[driver_id].append(schedule_id)
+        return drivers, residents, [s.id for s in schedules], driver_schedules
+    finally:
+        db.session.remove()
+        app_ctx.pop()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(worker_class, workers, port, url):
+    run_dir = tempfile.mkdtemp(prefix="http-load-")
+    env_vars = {
+        "FLASK_SQLALCHEMY_DATABASE_URI": url,
+        "FLASK_WORKER_RELAY_DIR": os.path.join(run_dir, "relay"),
+        "FLASK_METRICS_DIR": os.path.join(run_dir, "metrics"),
+    }
+    command = [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "--bind", f"127.0.0.1:{port}",
+        "--worker-class", worker_class, "--workers", str(workers), "--access-logfile", "/dev/null",
+    ]
+    if worker_class == "gthread":
+        command += ["--threads", "8"]
+    # -e replaces gunicorn_config.py's raw_env, so this run does not share its relay or metrics
+    for key, value in env_vars.items():
+        command += ["-e", f"{key}={value}"]
+    command.append("wsgi:app")
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited: {server.stderr.read().decode()[-2000:]}")
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not become ready in 60s")
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams"""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [f"{method} {path} HTTP/1.1", f"Host: 127.0.0.1:{self.port}", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if token:
+            headers.append(f"Authorization: Bearer {token}")
+        message = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+        for attempt in (0, 1):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+            try:
+                self.writer.write(message)
+                return await self._response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed an idle keep-alive connection: retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+
+    async def _response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.lower() == "close":
+                close = True
+        body = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, connection, endpoint, method, path, body=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, payload = await connection.request(method, path, body, token)
+        except (OSError, asyncio.IncompleteReadError):
+            connection.close()
+            status, payload = 0, b""
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][f"{status // 100}xx" if status else "error"] += 1
+        return status, payload
+
+
+async def login(recorder, connection, username):
+    status, payload = await recorder.call(connection, "POST /api/login", "POST", "/api/login",
+                                          {"username": username, "password": PASSWORD})
+    return json.loads(payload)["access_token"] if status == 200 else None
+
+
+async def resident(recorder, port, user, drivers, schedules, stop_at, rng):
+    connection = Connection(port)
+    token = await login(recorder, connection, user[1])
+    while token and time.monotonic() < stop_at:
+        roll = rng.random()
+        if roll < 0.6:
+            driver_id = rng.choice(drivers)[0]
+            await recorder.call(connection, "GET /api/drivers/<id>/location", "GET", f"/api/drivers/{driver_id}/location")
+        elif roll < 0.85:
+            await recorder.call(connection, "GET /api/schedules/upcoming", "GET", "/api/schedules/upcoming?limit=20")
+        else:
+            await recorder.call(connection, "POST /api/stop-requests", "POST", "/api/stop-requests",
+                                {"schedule_id": rng.choice(schedules)}, token)
+        await asyncio.sleep(rng.uniform(*RESIDENT_PAUSE))
+    connection.close()
+
+
+async def driver(recorder, port, user, schedule_ids, stop_at, rng):
+    connection = Connection(port)
+    token = await login(recorder, connection, user[1])
+    lat, lon = 10.6 + rng.random() * 0.1, -61.5 + rng.random() * 0.1
+    while token and time.monotonic() < stop_at:
+        if rng.random() < 0.85 or not schedule_ids:
+            lat, lon = lat + rng.uniform(-0.001, 0.001), lon + rng.uniform(-0.001, 0.001)
+            await recorder.call(connection, "POST /api/drivers/<id>/location", "POST", f"/api/drivers/{user[0]}/location",
+                                {"location": f"{lat:.5f},{lon:.5f}"}, token)
+        else:
+            await recorder.call(connection, "POST /api/schedules/<id>/stop-requests/status", "POST",
+                                f"/api/schedules/{rng.choice(schedule_ids)}/stop-requests/status",
+                                {"status": "confirmed", "from_status": "requested"}, token)
+        await asyncio.sleep(rng.uniform(*DRIVER_PAUSE))
+    connection.close()
+
+
+async def run_clients(port, clients, duration, ramp_up, data):
+    drivers, residents, schedules, driver_schedules = data
+    recorder = Recorder()
+    rng = random.Random(1)
+    stop_at = time.monotonic() + ramp_up + duration
+    tasks = []
+    driver_count = max(1, min(len(drivers), int(clients * DRIVER_SHARE)))
+    for n in range(clients):
+        if n < driver_count:
+            user = drivers[n]
+            coroutine = driver(recorder, port, user, driver_schedules[user[0]], stop_at, random.Random(n))
+        else:
+            coroutine = resident(recorder, port, rng.choice(residents), drivers, schedules, stop_at, random.Random(n))
+        tasks.append(asyncio.ensure_future(coroutine))
+        await asyncio.sleep(ramp_up / clients)  # spread logins out instead of one burst
+    await asyncio.gather(*tasks)
+    return recorder
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def report(label, recorder, elapsed):
+    print(f"\n{label}")
+    print(f"{'endpoint':<48}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    summary = {"endpoints": {}}
+    every = []
+    for endpoint in sorted(recorder.latencies):
+        latencies = sorted(recorder.latencies[endpoint])
+        every.extend(latencies)
+        row = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "statuses": dict(recorder.statuses[endpoint]),
+        }
+        summary["endpoints"][endpoint] = row
+        statuses = " ".join(f"{k}={v}" for k, v in sorted(row["statuses"].items()))
+        print(f"{endpoint:<48}{row['rps']:>8.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}  {statuses}")
+    every.sort()
+    summary.update({
+        "requests": len(every),
+        "rps": round(len(every) / elapsed, 2),
+        "p50_ms": round(percentile(every, 50) * 1000, 2),
+        "p95_ms": round(percentile(every, 95) * 1000, 2),
+        "p99_ms": round(percentile(every, 99) * 1000, 2),
+        "errors": sum(s.get("5xx", 0) + s.get("error", 0) for s in recorder.statuses.values()),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--configs", default="gevent:4,gthread:4,sync:4",
+                        help="comma separated worker_class:workers pairs")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load after ramp up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which clients start")
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--residents", type=int, default=5000)
+    parser.add_argument("--schedules", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--postgres-url", default=os.environ.get("BENCH_POSTGRES_URL"))
+    parser.add_argument("--output", help="write every configuration's results to this JSON file")
+    args = parser.parse_args()
+
+    counts = {"drivers": args.drivers, "residents": args.residents,
+              "schedules": args.schedules, "requests": args.requests}
+    results = {}
+    for config in args.configs.split(","):
+        worker_class, workers = config.split(":")
+        url = args.postgres_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+        data = seed(url, counts)
+        port = free_port()
+        server = start_gunicorn(worker_class, int(workers), port, url)
+        try:
+            started = time.monotonic()
+            recorder = asyncio.run(run_clients(port, args.clients, args.duration, args.ramp_up, data))
+            elapsed = time.monotonic() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        results[config] = report(f"{worker_class} x {workers} workers, {args.clients} clients", recorder, elapsed)
+
+    print(f"\n{'config':<16}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for config, summary in results.items():
+        print(f"{config:<16}{summary['rps']:>8.1f}{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}"
+              f"{summary['p99_ms']:>9.1f}{summary['errors']:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load test for live driver location fan-out.
+
+Starts --workers processes (gevent, like gunicorn_config.py), each holding
+--subscribers subscriber greenlets on one driver's location stream, wired
+together through the Unix socket worker relay. The parent publishes
+--updates location updates and every worker reports how many updates its
+subscribers received and the publish-to-receive latency.
+
+    python -m benchmarks.location_stream_load --workers 4 --subscribers 2000 --updates 50
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse, multiprocessing, os, statistics, tempfile, time
+
+import gevent
+
+from App.main import create_app
+from App.controllers.location_hub import get_location_hub
+
+DRIVER_ID = 1
+
+
+def make_app(relay_dir):
+    return create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "WORKER_RELAY_DIR": relay_dir})
+
+
+def worker(relay_dir, subscribers, updates, ready, results):
+    app = make_app(relay_dir)
+    hub = get_location_hub(app)
+    latencies = []
+
+    def subscriber():
+        queue = hub.subscribe(DRIVER_ID)
+        try:
+            for _ in range(updates):
+                payload = queue.get(timeout=30)
+                latencies.append(time.time() - payload["sent_at"])
+        finally:
+            hub.unsubscribe(DRIVER_ID, queue)
+
+    greenlets = [gevent.spawn(subscriber) for _ in range(subscribers)]
+    gevent.sleep(0)
+    ready.put(os.getpid())
+    gevent.joinall(greenlets)
+    results.put((os.getpid(), len(latencies), latencies))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--subscribers", type=int, default=1000, help="subscribers per worker")
+    parser.add_argument("--updates", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between updates")
+    args = parser.parse_args()
+
+    relay_dir = tempfile.mkdtemp(prefix="relay-bench-")
+    ctx = multiprocessing.get_context("fork")
+    ready, results = ctx.Queue(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(relay_dir, args.subscribers, args.updates, ready, results))
+             for _ in range(args.workers)]
+    for proc in procs:
+        proc.start()
+    for _ in procs:
+        ready.get(timeout=60)
+    time.sleep(1.0)  # let every worker's relay socket appear
+
+    hub = get_location_hub(make_app(relay_dir))
+    started = time.time()
+    for n in range(args.updates):
+        hub.publish(DRIVER_ID, {"driver_id": DRIVER_ID, "current_location": f"stop {n}", "sent_at": time.time()})
+        time.sleep(args.interval)
+
+    expected = args.subscribers * args.updates
+    all_latencies = []
+    print(f"{'worker':>8}{'received':>12}{'expected':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for _ in procs:
+        pid, received, latencies = results.get(timeout=120)
+        all_latencies.extend(latencies)
+        print(f"{pid:>8}{received:>12}{expected:>12}"
+              f"{percentile(latencies, 50) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}")
+    elapsed = time.time() - started
+    for proc in procs:
+        proc.join()
+
+    total = len(all_latencies)
+    print(f"\n{args.workers} workers x {args.subscribers} subscribers: "
+          f"{total}/{expected * args.workers} deliveries in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} deliveries/s), mean latency {statistics.mean(all_latencies) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
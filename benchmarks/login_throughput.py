@@ -0,0 +1,89 @@
+"""
+Login throughput benchmark.
+
+Runs --concurrency greenlets posting to /api/login in one gevent-patched
+process (what a gunicorn gevent worker sees) with passwords hashed inline
+and then in a pool of --workers hashing processes. Alongside, a ticker
+greenlet measures how long the event loop was blocked: with inline hashing
+every login stalls every other request on the worker.
+
+    python -m benchmarks.login_throughput --logins 200 --concurrency 20 --workers 4
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse, os, tempfile, time
+
+import gevent
+from gevent.event import Event
+from gevent.pool import Pool
+from sqlalchemy import text
+
+from App.main import create_app
+from App.database import db, create_db
+from App.hashing import get_hasher
+
+
+def seed(users, password):
+    hashes = get_hasher().hash_many([password] * users)
+    db.session.execute(text(
+        "INSERT INTO user (id, username, password, email, name, user_type) "
+        "VALUES (:id, :username, :password, :email, :name, 'RESIDENT')"),
+        [{"id": i, "username": f"user{i}", "password": hashes[i - 1], "email": f"user{i}@example.com",
+          "name": f"User {i}"} for i in range(1, users + 1)])
+    db.session.execute(text("INSERT INTO resident (id, home_address) VALUES (:id, 'Somewhere')"),
+        [{"id": i} for i in range(1, users + 1)])
+    db.session.commit()
+
+
+def run(app, users, logins, concurrency, password):
+    client = app.test_client()
+    stalls = []
+    done = Event()
+
+    def ticker(interval=0.005):
+        while not done.is_set():
+            before = time.perf_counter()
+            gevent.sleep(interval)
+            stalls.append(time.perf_counter() - before - interval)
+
+    def login(n):
+        response = client.post("/api/login", json={"username": f"user{n % users + 1}", "password": password})
+        assert response.status_code == 200, response.status_code
+
+    tick = gevent.spawn(ticker)
+    pool = Pool(concurrency)
+    started = time.perf_counter()
+    pool.map(login, range(logins))
+    elapsed = time.perf_counter() - started
+    done.set()
+    tick.join()
+    return logins / elapsed, max(stalls or [0.0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    password = "correct horse battery staple"
+    print(f"{'hashing':<20}{'logins/s':>12}{'max loop stall ms':>20}")
+    for label, workers in (("inline", 0), (f"pool of {args.workers}", args.workers)):
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                          "PASSWORD_HASH_METHOD": args.method, "PASSWORD_HASH_WORKERS": workers})
+        db.drop_all()
+        create_db()
+        seed(args.users, password)
+        get_hasher(app).verify(get_hasher(app).hash(password), password)  # warm the pool up
+        rate, stall = run(app, args.users, args.logins, args.concurrency, password)
+        print(f"{label:<20}{rate:>12.1f}{stall * 1000:>20.1f}")
+        get_hasher(app).close()
+
+
+if __name__ == "__main__":
+    main()
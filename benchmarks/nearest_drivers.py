@@ -0,0 +1,88 @@
+"""
+Nearest-available-driver lookup: grid index versus scanning every driver.
+
+Places --drivers available drivers at random around Trinidad, then times
+--queries k-nearest lookups through the DriverGrid, a NumPy haversine
+over every driver held in memory, and the old way of loading every
+driver row and parsing its location string.
+
+    python -m benchmarks.nearest_drivers --drivers 5000 --queries 2000 --k 5
+"""
+import argparse, random, statistics, time
+
+import numpy as np
+from flask.globals import app_ctx
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import Driver, User, UserType
+from App.controllers.driver_index import get_driver_grid
+from App.controllers.geo import haversine_km, parse_coordinates
+
+# Roughly the island of Trinidad
+LAT_RANGE, LON_RANGE = (10.05, 10.85), (-61.9, -60.9)
+
+
+def timed(queries, lookup):
+    times = []
+    for lat, lon in queries:
+        started = time.perf_counter()
+        lookup(lat, lon)
+        times.append((time.perf_counter() - started) * 1e6)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drivers", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--cell-degrees", type=float, default=0.01)
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "DRIVER_GRID_CELL_DEGREES": args.cell_degrees})
+    create_db()
+    rng = random.Random(1)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.drivers)]
+    ids = db.session.execute(db.insert(User.__table__).returning(User.__table__.c.id, sort_by_parameter_order=True), [
+        {"username": f"d{n}", "password": "x", "email": f"d{n}@example.com", "name": f"D{n}", "user_type": UserType.DRIVER}
+        for n in range(args.drivers)
+    ]).scalars().all()
+    db.session.execute(db.insert(Driver.__table__), [
+        {"id": driver_id, "vehicle_type": "Van", "license_plate": "X", "current_status": "available",
+         "current_location": f"{lat:.6f},{lon:.6f}", "current_lat": lat, "current_lon": lon}
+        for driver_id, (lat, lon) in zip(ids, points)
+    ])
+    db.session.commit()
+
+    grid = get_driver_grid(app)
+    grid.load()
+    queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+    lats, lons = np.array(points).T
+    id_array = np.array(ids)
+
+    def full_scan(lat, lon):
+        return id_array[np.argsort(haversine_km(lat, lon, lats, lons))[:args.k]]
+
+    def load_every_driver(lat, lon):
+        rows = db.session.execute(db.select(Driver.id, Driver.current_location)).all()
+        located = [(driver_id, parse_coordinates(location)) for driver_id, location in rows]
+        located = [(driver_id, c) for driver_id, c in located if c]
+        distances = haversine_km(lat, lon, np.array([c[0] for _, c in located]), np.array([c[1] for _, c in located]))
+        return [located[i][0] for i in np.argsort(distances)[:args.k]]
+
+    print(f"{args.drivers} drivers, {grid.stats()['cells']} occupied cells, k={args.k}")
+    print(f"{'lookup':<28}{'median us':>12}{'p99 us':>12}")
+    for label, lookup, sample in (
+        ("grid index", lambda lat, lon: grid.nearest(lat, lon, args.k), queries),
+        ("numpy scan of all drivers", full_scan, queries),
+        ("load every driver row", load_every_driver, queries[:50]),
+    ):
+        median, p99 = timed(sample, lookup)
+        print(f"{label:<28}{median:>12.1f}{p99:>12.1f}")
+    app_ctx.pop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+List serialization benchmark: ORM hydration + get_json() + stdlib json vs
+column projection + orjson.
+
+Seeds a throwaway SQLite database (same data as stop_request_indexes) and
+serializes every user, schedule and stop request both ways, reporting rows
+per second for each.
+
+    python -m benchmarks.serialization --residents 20000 --schedules 20000 --requests 100000
+"""
+import argparse, os, tempfile, time
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import User, DriverSchedule, StopRequest
+from App.controllers import UserController, ScheduleController, StopRequestController
+from benchmarks.stop_request_indexes import seed
+
+
+def orm_rows(model):
+    return [item.get_json() for item in db.session.scalars(db.select(model).order_by(model.id))]
+
+
+LISTINGS = {
+    "users": (lambda: orm_rows(User), lambda: list(UserController.stream_users_json())),
+    "schedules": (lambda: orm_rows(DriverSchedule), lambda: list(ScheduleController.stream_schedules_json())),
+    "stop requests": (lambda: orm_rows(StopRequest), lambda: list(StopRequestController.stream_stop_requests_json())),
+}
+
+
+def timed(fetch, dumps, repeat):
+    best, count = None, 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        rows = fetch()
+        dumps(rows)
+        elapsed = time.perf_counter() - start
+        best, count = min(best or elapsed, elapsed), len(rows)
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--residents", type=int, default=20000)
+    parser.add_argument("--schedules", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    create_db()
+    print(f"Seeding {args.residents} residents, {args.schedules} schedules and {args.requests} stop requests...")
+    seed(args.drivers, args.residents, args.schedules, args.requests)
+
+    stdlib_json = DefaultJSONProvider(app)
+    fast_json = current_app.json
+    if type(fast_json) is DefaultJSONProvider:
+        print("orjson is not installed; the fast path uses the stdlib encoder")
+
+    print(f"{'listing':<16}{'rows':>10}{'orm rows/s':>14}{'projected rows/s':>18}{'speedup':>10}")
+    for name, (orm_fetch, projected_fetch) in LISTINGS.items():
+        count, orm = timed(orm_fetch, stdlib_json.dumps, args.repeat)
+        projected_count, projected = timed(projected_fetch, fast_json.dumps, args.repeat)
+        assert count == projected_count
+        print(f"{name:<16}{count:>10}{count / orm:>14.0f}{count / projected:>18.0f}{orm / projected:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
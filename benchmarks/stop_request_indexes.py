@@ -0,0 +1,112 @@
+"""
+Scan vs index benchmark for the stop request / schedule hot paths.
+
+Seeds a throwaway SQLite database and times each lookup twice: once with
+SQLite's NOT INDEXED hint (the plan every query got before the indexes
+existed) and once with the planner free to use them.
+
+    python -m benchmarks.stop_request_indexes --schedules 20000 --requests 200000
+"""
+import argparse, os, random, tempfile, time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from App.main import create_app
+from App.database import db, create_db
+
+
+QUERIES = {
+    "create pre-check (resident, schedule)":
+        "SELECT id FROM stop_request {hint} WHERE resident_id = :resident_id AND schedule_id = :schedule_id",
+    "list by resident":
+        "SELECT id FROM stop_request {hint} WHERE resident_id = :resident_id",
+    "list by schedule and status":
+        "SELECT id FROM stop_request {hint} WHERE schedule_id = :schedule_id AND status = 'CONFIRMED'",
+    "schedules for driver":
+        "SELECT id FROM driver_schedule {hint} WHERE driver_id = :driver_id ORDER BY scheduled_start_time",
+    "upcoming schedules (next 100)":
+        "SELECT id FROM driver_schedule {hint} WHERE scheduled_start_time >= :now ORDER BY scheduled_start_time LIMIT 100",
+}
+
+
+def seed(drivers, residents, schedules, requests):
+    now = datetime.utcnow()
+    users = [
+        {"id": i, "username": f"user{i}", "password": "x", "email": f"user{i}@example.com",
+         "name": f"User {i}", "user_type": "DRIVER" if i <= drivers else "RESIDENT"}
+        for i in range(1, drivers + residents + 1)
+    ]
+    db.session.execute(text(
+        "INSERT INTO user (id, username, password, email, name, user_type) "
+        "VALUES (:id, :username, :password, :email, :name, :user_type)"), users)
+    db.session.execute(text(
+        "INSERT INTO driver (id, vehicle_type, license_plate, current_status) VALUES (:id, 'Van', 'BENCH', 'available')"),
+        [{"id": i} for i in range(1, drivers + 1)])
+    db.session.execute(text("INSERT INTO resident (id, home_address) VALUES (:id, 'Somewhere')"),
+        [{"id": i} for i in range(drivers + 1, drivers + residents + 1)])
+
+    db.session.execute(text("INSERT INTO street (id, name, normalized_name) VALUES (:id, :name, :normalized)"),
+        [{"id": n + 1, "name": f"Street {n}", "normalized": f"street {n}"} for n in range(500)])
+    rows = []
+    for i in range(1, schedules + 1):
+        start = now + timedelta(hours=random.randint(-24 * 365, 24 * 365))
+        rows.append({"id": i, "driver_id": random.randint(1, drivers), "street": f"Street {i % 500}",
+                     "street_id": i % 500 + 1, "start": start, "end": start + timedelta(hours=2)})
+    db.session.execute(text(
+        "INSERT INTO driver_schedule (id, driver_id, street, street_id, scheduled_start_time, scheduled_end_time) "
+        "VALUES (:id, :driver_id, :street, :street_id, :start, :end)"), rows)
+
+    pairs = set()
+    while len(pairs) < requests:
+        pairs.add((random.randint(drivers + 1, drivers + residents), random.randint(1, schedules)))
+    statuses = ["REQUESTED", "CONFIRMED", "REJECTED", "COMPLETED"]
+    db.session.execute(text(
+        "INSERT INTO stop_request (resident_id, schedule_id, request_time, status) "
+        "VALUES (:resident_id, :schedule_id, :now, :status)"),
+        [{"resident_id": r, "schedule_id": s, "now": now, "status": random.choice(statuses)} for r, s in pairs])
+    db.session.commit()
+
+
+def time_query(sql, params_list):
+    start = time.perf_counter()
+    for params in params_list:
+        db.session.execute(text(sql), params).fetchall()
+    return (time.perf_counter() - start) / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--residents", type=int, default=20000)
+    parser.add_argument("--schedules", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    create_db()
+    print(f"Seeding {args.schedules} schedules and {args.requests} stop requests...")
+    seed(args.drivers, args.residents, args.schedules, args.requests)
+    db.session.execute(text("ANALYZE"))
+
+    now = datetime.utcnow()
+    params = [{
+        "resident_id": random.randint(args.drivers + 1, args.drivers + args.residents),
+        "schedule_id": random.randint(1, args.schedules),
+        "driver_id": random.randint(1, args.drivers),
+        "now": now,
+    } for _ in range(args.lookups)]
+
+    print(f"{'query':<40}{'scan ms':>10}{'index ms':>10}{'speedup':>10}")
+    for name, sql in QUERIES.items():
+        scan = time_query(sql.format(hint="NOT INDEXED"), params)
+        indexed = time_query(sql.format(hint=""), params)
+        print(f"{name:<40}{scan * 1000:>10.3f}{indexed * 1000:>10.3f}{scan / indexed:>9.1f}x")
+        plan = db.session.execute(text("EXPLAIN QUERY PLAN " + sql.format(hint="")), params[0]).fetchall()
+        print("    plan: " + "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Controller micro-benchmark suite with a regression gate.
+
+For every database (a throwaway SQLite file, plus PostgreSQL when
+--postgres-url or BENCH_POSTGRES_URL is given) and every --scales entry,
+seeds fresh data with SeedController and times each UserController,
+ScheduleController, StopRequestController and LocationController
+operation. Results (median and p95 ms per operation) are written to
+--output; with --baseline, any operation whose median got slower than
+--threshold (and by more than --min-delta-ms) fails the run.
+
+    python -m benchmarks.suite --scales small,medium --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --scales small,medium --update-baseline benchmarks/baseline.json
+
+The PostgreSQL database is dropped and recreated: point it at a scratch database.
+"""
+import argparse, json, os, random, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+from flask.globals import app_ctx
+
+from App.main import create_app
+from App.database import db, create_db
+from App.models import UserType, StopRequestStatus
+from App.controllers import (
+    UserController, ScheduleController, StopRequestController, LocationController, SeedController
+)
+
+SCALES = {
+    "small": {"drivers": 10, "residents": 500, "schedules": 200, "requests": 2000},
+    "medium": {"drivers": 50, "residents": 5000, "schedules": 2000, "requests": 20000},
+    "large": {"drivers": 200, "residents": 50000, "schedules": 20000, "requests": 200000},
+}
+PASSWORD = "password"
+
+
+class Context:
+    """Ids of the seeded data plus the rows each write benchmark works through"""
+
+    def __init__(self, tag, rng):
+        self.tag = tag
+        self.rng = rng
+        self.driver_ids = UserController.get_users_page(limit=1000, user_type=UserType.DRIVER)[0]
+        self.driver_ids = [d.id for d in self.driver_ids]
+        self.resident_ids = [r.id for r in UserController.stream_users(UserType.RESIDENT)]
+        self.usernames = [r.username for r in UserController.get_users_page(limit=1000, user_type=UserType.RESIDENT)[0]]
+        self.schedule_ids = [s.id for s in ScheduleController.stream_schedules()]
+        self.request_ids = [r.id for r in StopRequestController.stream_stop_requests()]
+        # A driver and a far-off schedule of its own for the write benchmarks
+        driver, _ = UserController.create_user(
+            UserType.DRIVER, f"bench_driver_{tag}", PASSWORD, f"bench_driver_{tag}@example.com", "Bench Driver",
+            vehicle_type="Van", license_plate="BENCH"
+        )
+        self.driver_id = driver.id
+        self.slot = datetime.utcnow().replace(microsecond=0) + timedelta(days=3650)
+        schedule, _ = ScheduleController.create_schedule(driver.id, "Bench Street", self.slot, self.slot + timedelta(hours=1))
+        self.schedule_id = schedule.id
+        self.next_resident = 0
+
+    def pick(self, ids):
+        return self.rng.choice(ids)
+
+    def new_slot(self):
+        self.slot += timedelta(hours=4)
+        return self.slot, self.slot + timedelta(hours=1)
+
+    def new_resident(self):
+        self.next_resident += 1
+        return self.resident_ids[self.next_resident % len(self.resident_ids)]
+
+
+def ping(ctx, i):
+    return f"{10.6 + ctx.rng.random() * 0.1:.5f},{-61.5 + ctx.rng.random() * 0.1:.5f}"
+
+
+# name -> (callable(ctx, i), scans whole tables: run fewer times)
+OPERATIONS = {
+    "users.create_user": (lambda ctx, i: UserController.create_user(
+        UserType.RESIDENT, f"bench_{ctx.tag}_{i}", PASSWORD, f"bench_{ctx.tag}_{i}@example.com", "Bench",
+        home_address="1 Bench Street"), False),
+    "users.get_user_by_id": (lambda ctx, i: UserController.get_user_by_id(ctx.pick(ctx.resident_ids)), False),
+    "users.get_user_by_username": (lambda ctx, i: UserController.get_user_by_username(ctx.pick(ctx.usernames)), False),
+    "users.authenticate": (lambda ctx, i: UserController.authenticate(ctx.pick(ctx.usernames), PASSWORD), False),
+    "users.get_users_page": (lambda ctx, i: UserController.get_users_page(after_id=ctx.pick(ctx.resident_ids)), False),
+    "users.get_users_json_page": (lambda ctx, i: UserController.get_users_json_page(after_id=ctx.pick(ctx.resident_ids)), False),
+    "users.get_all_users_json": (lambda ctx, i: UserController.get_all_users_json(), True),
+    "schedules.create_schedule": (lambda ctx, i: ScheduleController.create_schedule(
+        ctx.driver_id, "Bench Street", *ctx.new_slot()), False),
+    "schedules.get_schedule_by_id": (lambda ctx, i: ScheduleController.get_schedule_by_id(
+        ctx.pick(ctx.schedule_ids), with_related=True), False),
+    "schedules.get_schedules_for_street": (lambda ctx, i: ScheduleController.get_schedules_for_street(
+        "Oak", with_related=True), False),
+    "schedules.get_schedules_for_driver": (lambda ctx, i: ScheduleController.get_schedules_for_driver(
+        ctx.pick(ctx.driver_ids)), False),
+    "schedules.search_streets": (lambda ctx, i: ScheduleController.search_streets("Mapel Stret"), False),
+    "schedules.get_schedules_json_page": (lambda ctx, i: ScheduleController.get_schedules_json_page(
+        driver_id=ctx.pick(ctx.driver_ids)), False),
+    "schedules.get_upcoming_schedules": (lambda ctx, i: ScheduleController.get_upcoming_schedules(), True),
+    "schedules.get_upcoming_schedules_json": (lambda ctx, i: ScheduleController.get_upcoming_schedules_json(), False),
+    "stops.create_stop_request": (lambda ctx, i: StopRequestController.create_stop_request(
+        ctx.new_resident(), ctx.schedule_id), False),
+    "stops.get_stop_requests_by_resident": (lambda ctx, i: StopRequestController.get_stop_requests_by_resident(
+        ctx.pick(ctx.resident_ids), with_related=True), False),
+    "stops.get_stop_requests_by_schedule": (lambda ctx, i: StopRequestController.get_stop_requests_by_schedule(
+        ctx.pick(ctx.schedule_ids), with_related=True), False),
+    "stops.get_stop_requests_json_page": (lambda ctx, i: StopRequestController.get_stop_requests_json_page(
+        schedule_id=ctx.pick(ctx.schedule_ids)), False),
+    "stops.update_stop_request_status": (lambda ctx, i: StopRequestController.update_stop_request_status(
+        ctx.pick(ctx.request_ids), StopRequestStatus.REJECTED), False),
+    "stops.update_stop_request_statuses": (lambda ctx, i: StopRequestController.update_stop_request_statuses(
+        StopRequestStatus.CONFIRMED, schedule_id=ctx.pick(ctx.schedule_ids), from_status=StopRequestStatus.REQUESTED), False),
+    "location.update_driver_location": (lambda ctx, i: LocationController.update_driver_location(
+        ctx.pick(ctx.driver_ids), ping(ctx, i)), False),
+    "location.get_driver_location": (lambda ctx, i: LocationController.get_driver_location(ctx.pick(ctx.driver_ids)), False),
+    "location.get_driver_trail": (lambda ctx, i: LocationController.get_driver_trail(ctx.pick(ctx.driver_ids)), False),
+}
+
+
+def run_scale(database, url, scale, repeat, rng):
+    counts = SCALES[scale]
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url, "PASSWORD_HASH_WORKERS": 0,
+                      "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000"})
+    try:
+        db.drop_all()
+        create_db()
+        started = time.perf_counter()
+        _, message = SeedController.seed(password=PASSWORD, seed=1, **counts)
+        print(f"[{database}/{scale}] {message} in {time.perf_counter() - started:.1f}s")
+        ctx = Context(f"{database}_{scale}", rng)
+        results = {}
+        for name, (operation, scans) in OPERATIONS.items():
+            times = []
+            runs = min(repeat, 5) if scans else repeat
+            for i in range(runs + 2):
+                db.session.remove()
+                begin = time.perf_counter()
+                operation(ctx, i)
+                if i >= 2:  # the first two calls warm caches and the connection
+                    times.append((time.perf_counter() - begin) * 1000)
+            times.sort()
+            results[f"{database}/{scale}/{name}"] = {
+                "median_ms": round(statistics.median(times), 4),
+                "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+            }
+            print(f"  {name:<40}{results[f'{database}/{scale}/{name}']['median_ms']:>10.3f} ms")
+        db.session.remove()
+        if database != "sqlite":
+            db.drop_all()
+        return results
+    finally:
+        app_ctx.pop()
+
+
+def regressions(results, baseline, threshold, min_delta_ms):
+    found = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        now, then = result["median_ms"], before["median_ms"]
+        if now > then * (1 + threshold) and now - then > min_delta_ms:
+            found.append((key, then, now))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="small,medium", help=f"comma separated, from {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--postgres-url", default=os.environ.get("BENCH_POSTGRES_URL"))
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", help="fail if any operation regressed against this file")
+    parser.add_argument("--update-baseline", help="write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="noise floor: ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    databases = [("sqlite", None)]
+    if args.postgres_url:
+        databases.append(("postgres", args.postgres_url))
+
+    rng = random.Random(1)
+    results = {}
+    for database, url in databases:
+        for scale in args.scales.split(","):
+            # A new SQLite file per scale, so page cache from the last one does not carry over
+            scale_url = url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}"
+            results.update(run_scale(database, scale_url, scale, args.repeat, rng))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    if args.update_baseline:
+        with open(args.update_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Updated baseline {args.update_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.threshold, args.min_delta_ms)
+        for key, then, now in found:
+            print(f"REGRESSION {key}: {then:.3f} ms -> {now:.3f} ms ({now / then - 1:+.0%})")
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
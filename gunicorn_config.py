@@ -1,5 +1,5 @@
 # gunicorn_config.py
-import multiprocessing
+import hashlib, multiprocessing, os, tempfile
 
 # The socket to bind.
 # "0.0.0.0" to bind to all interfaces. 8000 is the port number.
@@ -11,9 +11,45 @@ workers = 4
 # Use the 'gevent' worker type for async performance.
 worker_class = 'gevent'
 
+# Private to this user and this checkout, so deployments on one host never share it
+# (override with BREADVAN_RUNTIME_DIR). Workers exchange live updates through Unix
+# sockets in relay/, and write their metrics to metrics/ so any worker can serve
+# /metrics for all of them; the app refuses a relay directory others can reach.
+runtime_dir = os.environ.get('BREADVAN_RUNTIME_DIR') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(),
+    f"breadvan-{os.getuid()}-{hashlib.sha1(os.path.dirname(os.path.abspath(__file__)).encode()).hexdigest()[:8]}"
+)
+raw_env = [
+    f'FLASK_WORKER_RELAY_DIR={os.path.join(runtime_dir, "relay")}',
+    f'FLASK_METRICS_DIR={os.path.join(runtime_dir, "metrics")}'
+]
+
 # Log level
 loglevel = 'info'
 
 # Where to log to
 accesslog = '-'  # '-' means log to stdout
-errorlog = '-'  # '-' means log to stderr
\ No newline at end of file
+errorlog = '-'  # '-' means log to stderr
+
+# Server hooks
+
+def on_starting(server):
+    # Counters restart with the server; drop the previous run's worker snapshots and retired totals
+    import glob
+    os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+    for path in glob.glob(os.path.join(runtime_dir, 'metrics', '*.json')):
+        os.remove(path)
+
+def post_fork(server, worker):
+    # A connection opened before the fork (preload_app, or anything in the master touching
+    # the database) would be shared with the master; start the worker with empty pools
+    from App.database import dispose_engines
+    dispose_engines()
+
+def worker_exit(server, worker):
+    # Persist any driver locations still held by the write-behind buffer
+    from App.controllers.location_buffer import flush_location_buffers
+    flush_location_buffers()
+    # Fold this worker's counters into the retired totals so /metrics keeps them
+    from App.instrumentation import retire_metrics
+    retire_metrics()
@@ -0,0 +1,63 @@
+"""street catalog
+
+Revision ID: 5a0d185c2b24
+Revises: 77ff95464a62
+Create Date: 2026-10-18 12:40:46.283332
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from App.models.street import Street
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0d185c2b24'
+down_revision = '77ff95464a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('street',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('normalized_name', sa.String(length=200), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('normalized_name')
+    )
+    with op.batch_alter_table('driver_schedule', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('street_id', sa.Integer(), nullable=True))
+
+    # Backfill the catalog from the free-text streets already on schedules
+    bind = op.get_bind()
+    street_ids = {}
+    for (name,) in bind.execute(sa.text("SELECT DISTINCT street FROM driver_schedule")).all():
+        normalized_name = Street.normalize(name)
+        if normalized_name not in street_ids:
+            bind.execute(
+                sa.text("INSERT INTO street (name, normalized_name) VALUES (:name, :normalized_name)"),
+                {"name": name.strip(), "normalized_name": normalized_name}
+            )
+            street_ids[normalized_name] = bind.execute(
+                sa.text("SELECT id FROM street WHERE normalized_name = :normalized_name"),
+                {"normalized_name": normalized_name}
+            ).scalar_one()
+        bind.execute(
+            sa.text("UPDATE driver_schedule SET street_id = :street_id WHERE street = :name"),
+            {"street_id": street_ids[normalized_name], "name": name}
+        )
+
+    with op.batch_alter_table('driver_schedule', schema=None) as batch_op:
+        batch_op.alter_column('street_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_driver_schedule_street_id', ['street_id'], unique=False)
+        batch_op.create_foreign_key('fk_driver_schedule_street_id', 'street', ['street_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('driver_schedule', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_driver_schedule_street_id', type_='foreignkey')
+        batch_op.drop_index('ix_driver_schedule_street_id')
+        batch_op.drop_column('street_id')
+
+    op.drop_table('street')
@@ -0,0 +1,41 @@
+"""driver coordinates
+
+Revision ID: cd0ed1a1ed63
+Revises: 4c7554609fa4
+Create Date: 2026-10-18 13:16:10.303063
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from App.controllers.geo import parse_coordinates
+
+
+# revision identifiers, used by Alembic.
+revision = 'cd0ed1a1ed63'
+down_revision = '4c7554609fa4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('driver', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_lat', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('current_lon', sa.Float(), nullable=True))
+
+    # Backfill from locations already stored as "lat,lon" text
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, current_location FROM driver WHERE current_location IS NOT NULL")).all()
+    for driver_id, location in rows:
+        coordinates = parse_coordinates(location)
+        if coordinates:
+            bind.execute(
+                sa.text("UPDATE driver SET current_lat = :lat, current_lon = :lon WHERE id = :id"),
+                {"lat": coordinates[0], "lon": coordinates[1], "id": driver_id}
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('driver', schema=None) as batch_op:
+        batch_op.drop_column('current_lon')
+        batch_op.drop_column('current_lat')
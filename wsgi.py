@@ -14,15 +14,17 @@ logging.getLogger('flask_sqlalchemy').setLevel(logging.ERROR)
 # Suppress Flask-Admin warnings
 os.environ['WERKZEUG_RUN_MAIN'] = 'true'
 
-import click, pytest
+import click, pytest, signal
 from flask.cli import with_appcontext, AppGroup
 from App.database import db, get_migrate
 from App.main import create_app
 from App.models import User, Resident, Driver, UserType, StopRequest, StopRequestStatus, DriverSchedule
 from App.controllers import (
-    UserController, StopRequestController, ScheduleController
+    UserController, StopRequestController, ScheduleController, SeedController, GeocodingController
 )
 from App.controllers.location import LocationController
+from App.controllers.schedule import read_schedule_rows, parse_timestamp
+from App.controllers.outbox import get_outbox_worker, backlog as outbox_backlog
 from datetime import datetime, timedelta
 
 app = create_app()
@@ -76,6 +78,42 @@ def initialize():
     print("Database initialized with sample data!")
     print(f"Driver ID: {driver.id}, Resident ID: {resident.id}, Schedule ID: {schedule.id}")
 
+@app.cli.command("seed", help="Bulk inserts synthetic users, schedules and stop requests")
+@click.option("--drivers", default=10, help="Number of drivers")
+@click.option("--residents", default=100, help="Number of residents")
+@click.option("--schedules", default=100, help="Number of schedules, spread over the drivers")
+@click.option("--requests", default=500, help="Number of stop requests")
+@click.option("--password", default="password", help="Password for every seeded user")
+@click.option("--seed", type=int, help="Random seed, for repeatable data")
+def seed_command(drivers, residents, schedules, requests, password, seed):
+    counts, message = SeedController.seed(drivers, residents, schedules, requests, password=password, seed=seed)
+    if counts is None:
+        print(f"Error: {message}")
+        return
+    print(message)
+
+@app.cli.command("worker", help="Delivers outbox messages (side effects of stop request and location changes)")
+@click.option("--batch-size", type=int, help="Messages claimed per batch (default OUTBOX_BATCH_SIZE)")
+@click.option("--interval", type=float, help="Seconds to wait when the outbox is drained (default OUTBOX_POLL_INTERVAL)")
+@click.option("--once", is_flag=True, help="Deliver what is due now and exit")
+def worker_command(batch_size, interval, once):
+    worker = get_outbox_worker(app)
+    if batch_size:
+        worker.batch_size = batch_size
+    if once:
+        while worker.run_once() == worker.batch_size:
+            pass
+    else:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+        print(f"Outbox worker {worker.owner} started")
+        worker.run(interval or app.config["OUTBOX_POLL_INTERVAL"])
+    stats = worker.stats()
+    with app.app_context():
+        waiting = outbox_backlog()
+    print(f"Delivered: {stats['delivered']}, retried: {stats['retried']}, failed: {stats['failed']}")
+    print(f"Pending: {waiting['pending']}, failed permanently: {waiting['failed']}")
+
 '''
 User Commands
 '''
@@ -117,13 +155,13 @@ def create_driver_command(name, email, username, password, vehicle_type, license
 @click.argument("type", default="all")
 def list_users_command(type):
     if type == "residents":
-        users = UserController.get_all_residents()
+        users = UserController.stream_users(UserType.RESIDENT)
         print("Residents:")
     elif type == "drivers":
-        users = UserController.get_all_drivers()
+        users = UserController.stream_users(UserType.DRIVER)
         print("Drivers:")
     else:
-        users = UserController.get_all_users()
+        users = UserController.stream_users()
         print("All Users:")
     
     for user in users:
@@ -143,8 +181,8 @@ schedule_cli = AppGroup('schedule', help='Schedule commands')
 @click.argument("end_time")
 def create_schedule_command(driver_id, street, start_time, end_time):
     try:
-        start_dt = datetime.fromisoformat(start_time)
-        end_dt = datetime.fromisoformat(end_time)
+        start_dt = parse_timestamp(start_time)
+        end_dt = parse_timestamp(end_time)
         
         schedule, message = ScheduleController.create_schedule(driver_id, street, start_dt, end_dt)
         if schedule:
@@ -155,18 +193,76 @@ def create_schedule_command(driver_id, street, start_time, end_time):
     except ValueError:
         print("Error: Invalid datetime format. Use ISO format: YYYY-MM-DDTHH:MM:SS or YYYY-MM-DD HH:MM:SS")
 
+@schedule_cli.command("import", help="Bulk import schedules from a CSV or JSONL file")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=1000, help="Rows inserted per batch/commit")
+def import_schedules_command(file, chunk_size):
+    report, message = ScheduleController.import_schedules(file, chunk_size=chunk_size)
+    for line_no, reason in report["rejected"]:
+        print(f"Rejected line {line_no}: {reason}")
+    if "error" in report:
+        print(f"Error: {message}")
+        return
+    print(message)
+    print(f"Took {report['elapsed_seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)")
+
+@schedule_cli.command("validate", help="Check a CSV or JSONL schedule file for errors and overlaps without importing it")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+def validate_schedules_command(file):
+    line_numbers, rows = [], []
+    for line_no, row in read_schedule_rows(file):
+        line_numbers.append(line_no)
+        rows.append(row)
+    results, message = ScheduleController.validate_schedules(rows, labels=[f"line {n}" for n in line_numbers])
+    if results is None:
+        print(f"Error: {message}")
+        return
+    for line_no, result in zip(line_numbers, results):
+        if not result["valid"]:
+            print(f"Invalid line {line_no}: {result['reason']}")
+    print(message)
+
+@schedule_cli.command("route", help="Show the planned visiting order of a schedule's confirmed stops")
+@click.argument("schedule_id", type=int)
+def schedule_route_command(schedule_id):
+    plan, message = ScheduleController.get_schedule_route(schedule_id)
+    if plan is None:
+        print(f"Error: {message}")
+        return
+    if plan["start"]:
+        print(f"Start: driver at {plan['start']['lat']}, {plan['start']['lon']}")
+    for n, stop in enumerate(plan["stops"], 1):
+        print(f"{n}. Stop {stop['stop_request_id']}: {stop['resident_name']}, {stop['home_address']} "
+              f"(+{stop['leg_km']:.2f} km, {stop['cumulative_km']:.2f} km total)")
+    for stop in plan["unlocated"]:
+        print(f"Not routed (address not located): Stop {stop['stop_request_id']}, {stop['home_address']}")
+    print(f"{message}, {plan['total_km']:.2f} km")
+
 @schedule_cli.command("view-street", help="View schedules for a street")
 @click.argument("street")
 def view_schedules_street_command(street):
-    schedules = ScheduleController.get_schedules_for_street(street)
+    schedules = ScheduleController.get_schedules_for_street(street, with_related=True)
     if schedules:
         print(f"Schedules for {street}:")
         for schedule in schedules:
-            driver = UserController.get_user_by_id(schedule.driver_id)
-            driver_name = driver.name if driver else "Unknown"
+            driver_name = schedule.driver.name if schedule.driver else "Unknown"
             print(f"ID: {schedule.id}, Driver: {driver_name}, Start: {schedule.scheduled_start_time}, End: {schedule.scheduled_end_time}, Street: {schedule.street}")
     else:
         print(f"No schedules found for {street}")
+        suggestions = ScheduleController.search_streets(street, limit=5)
+        if suggestions:
+            print("Did you mean: " + ", ".join(s.name for s in suggestions))
+
+@schedule_cli.command("search-streets", help="Search the street catalog by prefix or fuzzy match")
+@click.argument("query")
+@click.option("--limit", default=10, help="Maximum number of streets to show")
+def search_streets_command(query, limit):
+    streets = ScheduleController.search_streets(query, limit)
+    if streets:
+        for street in streets:
+            print(f"ID: {street.id}, Street: {street.name}")
+    else:
+        print(f"No streets found matching {query}")
 
 @schedule_cli.command("view-driver", help="View schedules for a driver")
 @click.argument("driver_id", type=int)
@@ -201,17 +297,36 @@ def request_stop_command(resident_id, schedule_id):
 @stop_cli.command("list-resident", help="List stop requests for a resident")
 @click.argument("resident_id", type=int)
 def list_stops_resident_command(resident_id):
-    stop_requests = StopRequestController.get_stop_requests_by_resident(resident_id)
-    resident = UserController.get_user_by_id(resident_id)
-    if stop_requests and resident:
-        print(f"Stop requests for resident {resident.name}:")
+    stop_requests = StopRequestController.get_stop_requests_by_resident(resident_id, with_related=True)
+    if stop_requests:
+        print(f"Stop requests for resident {stop_requests[0].resident.name}:")
         for req in stop_requests:
-            schedule = ScheduleController.get_schedule_by_id(req.schedule_id)
-            street = schedule.street if schedule else "Unknown"
+            street = req.schedule.street if req.schedule else "Unknown"
             print(f"ID: {req.id}, Schedule ID: {req.schedule_id}, Street: {street}, Status: {req.status.value}, Requested: {req.request_time}")
     else:
         print(f"No stop requests found for resident ID {resident_id}")
 
+@stop_cli.command("update-status", help="Set the status of many stop requests at once")
+@click.argument("status", type=click.Choice([s.value for s in StopRequestStatus]))
+@click.option("--schedule-id", type=int, help="Update every request on this schedule")
+@click.option("--ids", help="Comma separated stop request ids")
+@click.option("--from-status", type=click.Choice([s.value for s in StopRequestStatus]), help="Only requests currently in this status")
+def update_stop_status_command(status, schedule_id, ids, from_status):
+    try:
+        request_ids = [int(i) for i in ids.split(",") if i.strip()] if ids else None
+    except ValueError:
+        print("Error: Stop request ids must be integers")
+        return
+    outcomes, message = StopRequestController.update_stop_request_statuses(
+        status, request_ids=request_ids, schedule_id=schedule_id, from_status=from_status
+    )
+    if outcomes is None:
+        print(f"Error: {message}")
+        return
+    for outcome in outcomes:
+        print(f"ID: {outcome['id']}, Outcome: {outcome['outcome']}, Status: {outcome['status'] or '-'}")
+    print(message)
+
 app.cli.add_command(stop_cli)
 
 '''
@@ -230,6 +345,31 @@ def update_location_command(driver_id, location):
     else:
         print(f"Error: {message}")
 
+@location_cli.command("status", help="Set a driver's status (available, busy or offline)")
+@click.argument("driver_id", type=int)
+@click.argument("status")
+def update_status_command(driver_id, status):
+    driver, message = LocationController.update_driver_status(driver_id, status)
+    if driver:
+        print(f"Driver {driver.name}: {message}")
+    else:
+        print(f"Error: {message}")
+
+@location_cli.command("nearest", help="List the available drivers closest to a point")
+@click.argument("lat", type=float)
+@click.argument("lon", type=float)
+@click.option("--k", default=5, help="Number of drivers to list")
+@click.option("--max-km", type=float, help="Only drivers within this distance")
+def nearest_drivers_command(lat, lon, k, max_km):
+    drivers, message = LocationController.get_nearest_drivers(lat, lon, k, max_km)
+    if drivers is None:
+        print(f"Error: {message}")
+        return
+    for driver in drivers:
+        print(f"Driver ID: {driver['driver_id']}, Distance: {driver['distance_km']:.3f} km, "
+              f"Location: {driver['lat']}, {driver['lon']}, Last Updated: {driver['location_updated_at'] or 'Never'}")
+    print(message)
+
 @location_cli.command("get", help="Get driver location")
 @click.argument("driver_id", type=int)
 def get_location_command(driver_id):
@@ -257,8 +397,61 @@ def list_all_locations_command():
     else:
         print("No driver locations found")
 
+@location_cli.command("trail", help="Show a driver's recorded location history")
+@click.argument("driver_id", type=int)
+@click.option("--since", help="Start of the window (ISO format, UTC); default one hour before --until")
+@click.option("--until", help="End of the window (ISO format, UTC); default now")
+def location_trail_command(driver_id, since, until):
+    try:
+        start = datetime.fromisoformat(since) if since else None
+        end = datetime.fromisoformat(until) if until else None
+    except ValueError:
+        print("Error: Invalid datetime format. Use ISO format: YYYY-MM-DDTHH:MM:SS or YYYY-MM-DD HH:MM:SS")
+        return
+    trail, message = LocationController.get_driver_trail(driver_id, start, end)
+    if trail is None:
+        print(f"Error: {message}")
+        return
+    for point in trail:
+        print(f"{point['timestamp']}: {point['lat']}, {point['lon']}")
+    print(message)
+
+@location_cli.command("prune", help="Drop location history older than the retention window")
+@click.option("--days", type=int, help="Retention in days (default LOCATION_HISTORY_RETENTION_DAYS)")
+def location_prune_command(days):
+    deleted, message = LocationController.prune_history(days)
+    print(message)
+
 app.cli.add_command(location_cli)
 
+'''
+Geocoding Commands
+'''
+
+geocode_cli = AppGroup('geocode', help='Geocoding commands')
+
+@geocode_cli.command("backfill", help="Geocode every resident's home address in chunks")
+@click.option("--chunk-size", default=500, help="Residents read and geocoded per batch")
+@click.option("--retry-missing", is_flag=True, help="Try again addresses no backend could place before")
+def geocode_backfill_command(chunk_size, retry_missing):
+    report, message = GeocodingController.backfill(chunk_size, retry_missing)
+    if report is None:
+        print(f"Error: {message}")
+        return
+    print(message)
+    print(f"Located: {report['located']}, unlocated: {report['unlocated']}")
+
+@geocode_cli.command("lookup", help="Show where an address geocodes to")
+@click.argument("address")
+def geocode_lookup_command(address):
+    place = GeocodingController.locate(address)
+    if place is None:
+        print(f"Error: No coordinates found for {address}")
+        return
+    print(f"{address}: {place[0]}, {place[1]}")
+
+app.cli.add_command(geocode_cli)
+
 '''
 Test Commands
 '''